@@ -0,0 +1,118 @@
+"""
+Run every benchmark, or the given ones, and compare the results of two commits.
+
+```shell
+python -m benchmarks run --save                   # .benchmarks/<commit>.json
+python -m benchmarks run capture_overhead classify
+python -m benchmarks compare <base commit>         # run now and compare against a saved commit
+python -m benchmarks compare <base commit> <head commit>
+```
+
+`compare` exits with 1 if a case is slower or larger than the base by more than `--threshold`.
+"""
+import typing
+
+import argparse
+import importlib
+import sys
+
+from benchmarks.utils import (
+    RESULTS_DIRECTORY,
+    Results,
+    compare_results,
+    load_results,
+    print_results,
+    save_results,
+)
+
+BENCHMARKS = (
+    "capture_overhead",
+    "call_site",
+    "classify",
+    "ignore_patterns",
+    "presenters",
+    "capture_memory",
+)
+
+
+def run_benchmarks(names: typing.Sequence[str]) -> Results:
+    results: Results = {}
+    for name in names:
+        module = importlib.import_module(f"benchmarks.{name}")
+        benchmark_results = module.run()  # type: ignore
+        print_results(module.TITLE, benchmark_results, module.UNIT)  # type: ignore
+        results[name] = {
+            "title": module.TITLE,  # type: ignore
+            "unit": module.UNIT,  # type: ignore
+            "results": benchmark_results,
+        }
+    return results
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    results_dir_parser = argparse.ArgumentParser(add_help=False)
+    results_dir_parser.add_argument(
+        "--results-dir",
+        default=RESULTS_DIRECTORY,
+        help="Directory of the saved results.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", parents=[results_dir_parser], help="Run benchmarks."
+    )
+    run_parser.add_argument(
+        "names",
+        nargs="*",
+        help=f"Benchmarks to run, by default all of {', '.join(BENCHMARKS)}.",
+    )
+    run_parser.add_argument(
+        "--save", action="store_true", help="Save the results of the current commit."
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare",
+        parents=[results_dir_parser],
+        help="Compare the results of two commits.",
+    )
+    compare_parser.add_argument("base", help="Saved commit or result file.")
+    compare_parser.add_argument(
+        "head",
+        nargs="?",
+        help="Saved commit or result file, by default benchmarks are run now.",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Ratio of change regarded as a regression, 0.1 by default.",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        unknown_names = set(args.names) - set(BENCHMARKS)
+        if unknown_names:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown_names))}")
+        results = run_benchmarks(args.names or BENCHMARKS)
+        if args.save:
+            print(f"saved {save_results(results, args.results_dir)}")
+        return 0
+
+    base = load_results(args.base, args.results_dir)
+    if args.head is None:
+        head = run_benchmarks([name for name in BENCHMARKS if name in base])
+    else:
+        head = load_results(args.head, args.results_dir)
+    print()
+    regressions = compare_results(base, head, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regressions over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Per-query overhead of the call-site lookup done in the execute hook.
+
+`inspect.stack()` is what `native_query_capture` used before [get_call_site][call_site.get_call_site].
+The query is issued under `STACK_DEPTH` extra frames to get close to the stack depth of a request going through middlewares and views.
+
+Usage: `python -m benchmarks.call_site`
+"""
+import typing
+
+import inspect
+import sysconfig
+
+from benchmarks.utils import measure, print_results, setup_django
+
+NUMBER = 500
+STACK_DEPTH = 30
+TITLE = "call site lookup"
+UNIT = "us"
+
+
+def legacy_call_site() -> typing.Tuple[str, str, int]:
+    python_library_directory = sysconfig.get_paths()["purelib"]
+    called_by = [
+        stack
+        for stack in inspect.stack()
+        if not stack.filename.startswith(python_library_directory)
+    ][0]
+    return called_by.filename, called_by.function, called_by.lineno
+
+
+def run() -> typing.Dict[str, float]:
+    setup_django()
+    from django.db import connection
+    from news.models import Reporter
+
+    from django_query_capture.call_site import get_call_site
+
+    Reporter.objects.create(full_name="target")
+
+    def query(depth: int = STACK_DEPTH) -> None:
+        if depth:
+            return query(depth - 1)
+        Reporter.objects.filter(pk=1).exists()
+
+    def make_hook(resolver: typing.Callable[[], typing.Any]):
+        def hook(execute, sql, params, many, context):
+            resolver()
+            return execute(sql, params, many, context)
+
+        return hook
+
+    baseline = measure(query, NUMBER)
+    results = {"no call-site lookup (query only)": baseline}
+    for name, resolver in (
+        ("inspect.stack()", legacy_call_site),
+        ("get_call_site()", get_call_site),
+    ):
+        with connection.execute_wrapper(make_hook(resolver)):
+            results[f"{name} overhead per query"] = measure(query, NUMBER) - baseline
+    return results
+
+
+if __name__ == "__main__":
+    print_results(TITLE, run(), UNIT)
@@ -0,0 +1,99 @@
+"""
+Memory held by captured queries after capturing `NUMBER` queries.
+
+The legacy record is the dict `native_query_capture` stored before [CapturedQuery][capture.CapturedQuery] became a slotted record:
+it had the eagerly rendered `sql` and kept the connection and the cursor alive through `context`.
+Every query opens its own cursor, like the ORM does.
+
+Usage: `python -m benchmarks.capture_memory`
+"""
+import typing
+
+import gc
+import tracemalloc
+
+from benchmarks.utils import print_results, setup_django
+
+NUMBER = 100_000
+TITLE = f"memory held by {NUMBER} captured queries"
+UNIT = "MiB"
+SQL = 'SELECT "news_reporter"."id" FROM "news_reporter" WHERE "news_reporter"."id" = %s'
+
+
+def legacy_save_queries(captured_queries: typing.List[typing.Dict[str, typing.Any]]):
+    from django_query_capture.call_site import get_call_site
+
+    def hook(execute, sql, params, many, context):
+        file_name, function_name, line_no = get_call_site()
+        result = execute(sql, params, many, context)
+        captured_queries.append(
+            {
+                "sql": sql % tuple(params) if params else sql,
+                "raw_sql": sql,
+                "raw_params": params,
+                "many": many,
+                "duration": 0.0,
+                "file_name": file_name,
+                "function_name": function_name,
+                "line_no": line_no,
+                "context": context,
+            }
+        )
+        return result
+
+    return hook
+
+
+def measure_memory(capture: typing.Callable[[], typing.Any]) -> int:
+    """
+    Returns:
+        bytes still allocated after `capture` returned, while its result is alive.
+    """
+    from django.db import connection
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = capture()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(result) == NUMBER
+    del result
+    connection.close()
+    return after - before
+
+
+def run_queries() -> None:
+    from django.db import connection
+
+    for i in range(NUMBER):
+        with connection.cursor() as cursor:
+            cursor.execute(SQL, [i])
+
+
+def run() -> typing.Dict[str, int]:
+    setup_django()
+    from django.db import connection
+
+    from django_query_capture import native_query_capture
+
+    def legacy() -> typing.List[typing.Dict[str, typing.Any]]:
+        captured_queries: typing.List[typing.Dict[str, typing.Any]] = []
+        with connection.execute_wrapper(legacy_save_queries(captured_queries)):
+            run_queries()
+        return captured_queries
+
+    def slotted() -> typing.List[typing.Any]:
+        with native_query_capture() as capture:
+            run_queries()
+        return capture.captured_queries
+
+    return {
+        "legacy dict record": measure_memory(legacy),
+        "CapturedQuery": measure_memory(slotted),
+    }
+
+
+if __name__ == "__main__":
+    print_results(TITLE, run(), UNIT)
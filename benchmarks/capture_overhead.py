@@ -0,0 +1,66 @@
+"""
+Per-query overhead of capturing, against the same query without any capture.
+
+The query is issued under `STACK_DEPTH` extra frames like in `call_site`.
+The idle dispatcher case is a connection that has been captured before, so [dispatch_query][capture.dispatch_query] stays installed without an active capture.
+Nested cases enter `DEPTH` [native_query_capture][capture.native_query_capture]s, e.g. a middleware, a decorator and a test around the same block.
+
+Usage: `python -m benchmarks.capture_overhead`
+"""
+import typing
+
+from contextlib import ExitStack
+
+from benchmarks.utils import measure, print_results, setup_django
+
+NUMBER = 500
+STACK_DEPTH = 30
+DEPTHS = (2, 4)
+TITLE = "capture overhead per query"
+UNIT = "us"
+
+
+def run() -> typing.Dict[str, float]:
+    setup_django()
+    from django.db import connection
+    from news.models import Reporter
+
+    from django_query_capture import native_query_capture, query_capture
+    from django_query_capture.capture import dispatch_query, install_query_dispatcher
+
+    Reporter.objects.create(full_name="target")
+
+    def query(depth: int = STACK_DEPTH) -> None:
+        if depth:
+            return query(depth - 1)
+        Reporter.objects.filter(pk=1).exists()
+
+    def measure_overhead(*captures: typing.ContextManager[typing.Any]) -> float:
+        with ExitStack() as exit_stack:
+            for capture in captures:
+                exit_stack.enter_context(capture)
+            return measure(query, NUMBER) - baseline
+
+    connection.ensure_connection()
+    if dispatch_query in connection.execute_wrappers:
+        connection.execute_wrappers.remove(dispatch_query)
+    # Warm up the statement cache and the query compiler before the baseline.
+    measure(query, NUMBER, repeat=1)
+    baseline = measure(query, NUMBER)
+    results = {"no capture (query only)": baseline}
+    install_query_dispatcher(connection)
+    results["idle dispatcher"] = measure_overhead()
+    results["native_query_capture"] = measure_overhead(native_query_capture())
+    results["query_capture"] = measure_overhead(query_capture(ignore_output=True))
+    results["query_capture streaming"] = measure_overhead(
+        query_capture(ignore_output=True, streaming=True)
+    )
+    for depth in DEPTHS:
+        results[f"{depth} nested native_query_capture"] = measure_overhead(
+            *(native_query_capture() for _ in range(depth))
+        )
+    return results
+
+
+if __name__ == "__main__":
+    print_results(TITLE, run(), UNIT)
@@ -0,0 +1,60 @@
+"""
+Time taken by [CapturedQueryClassifier][classify.CapturedQueryClassifier] to classify synthetic captures of `SIZES` queries.
+
+Queries have `SHAPES` distinct SQL and `PARAMS` distinct parameters per SQL, so that there are duplicates and similar queries,
+and one query in `SLOW_EVERY` is slower than SLOW_MIN_SECOND.
+
+Usage: `python -m benchmarks.classify`
+"""
+import typing
+
+from benchmarks.utils import measure, print_results, setup_django
+
+SIZES = (1_000, 10_000, 100_000)
+SHAPES = 50
+PARAMS = 20
+SLOW_EVERY = 1_000
+TITLE = "classify synthetic queries"
+UNIT = "ms"
+
+
+def make_captured_queries(number: int) -> typing.List[typing.Any]:
+    from django_query_capture.capture import CapturedQuery
+
+    return [
+        CapturedQuery(
+            raw_sql=f'SELECT "news_reporter"."id" FROM "news_reporter" WHERE "news_reporter"."id" = %s AND "shape" = {i % SHAPES}',
+            raw_params=[i % PARAMS],
+            many=False,
+            duration=2.0 if i % SLOW_EVERY == 0 else 0.001,
+            file_name=__file__,
+            function_name="make_captured_queries",
+            line_no=i % SHAPES,
+            alias="default",
+        )
+        for i in range(number)
+    ]
+
+
+def run() -> typing.Dict[str, float]:
+    setup_django()
+    from django_query_capture.classify import CapturedQueryClassifier
+
+    results = {}
+    for size in SIZES:
+        captured_queries = make_captured_queries(size)
+        repeat = 5 if size < 100_000 else 3
+        for streaming in (False, True):
+            name = f"{size} queries{' streaming' if streaming else ''}"
+            results[name] = measure(
+                lambda: CapturedQueryClassifier(
+                    captured_queries, streaming=streaming
+                )(),
+                1,
+                repeat=repeat,
+            )
+    return results
+
+
+if __name__ == "__main__":
+    print_results(TITLE, run(), UNIT)
@@ -0,0 +1,73 @@
+"""
+Time taken to check `PATTERNS` ignore patterns against a capture of `NUMBER` queries.
+
+The legacy check compiled every pattern for every query, like [CapturedQueryClassifier][classify.CapturedQueryClassifier] did before [IgnorePatternMatcher][classify.IgnorePatternMatcher].
+
+Usage: `python -m benchmarks.ignore_patterns`
+"""
+import typing
+
+import re
+
+from benchmarks.utils import measure, print_results, setup_django
+
+NUMBER = 50_000
+PATTERNS = [f'^SELECT .* FROM "ignored_table_{i}"' for i in range(18)] + [
+    "django_session",
+    "^SAVEPOINT",
+]
+TITLE = f"{len(PATTERNS)} ignore patterns on {NUMBER} queries"
+UNIT = "ms"
+
+
+def make_captured_queries() -> typing.List[typing.Any]:
+    from django_query_capture.capture import CapturedQuery
+
+    return [
+        CapturedQuery(
+            raw_sql=f'SELECT "news_reporter"."id" FROM "news_reporter" WHERE "news_reporter"."id" = %s AND "shape" = {i % 50}',
+            raw_params=[i],
+            many=False,
+            duration=0.0,
+            file_name=__file__,
+            function_name="make_captured_queries",
+            line_no=0,
+            alias="default",
+        )
+        for i in range(NUMBER)
+    ]
+
+
+def legacy_is_allow_pattern(query: str) -> bool:
+    return not list(
+        filter(
+            lambda pattern: re.compile(pattern).search(query),
+            PATTERNS,
+        )
+    )
+
+
+def run() -> typing.Dict[str, float]:
+    setup_django()
+    from django_query_capture.classify import IgnorePatternMatcher
+
+    captured_queries = make_captured_queries()
+
+    def legacy() -> None:
+        for captured_query in captured_queries:
+            legacy_is_allow_pattern(captured_query["raw_sql"])
+
+    def matcher() -> None:
+        # A new matcher every round, so that the verdict cache starts empty like a new process.
+        ignore_pattern_matcher = IgnorePatternMatcher(PATTERNS)
+        for captured_query in captured_queries:
+            ignore_pattern_matcher.is_ignored(captured_query["raw_sql"])
+
+    return {
+        "re.compile() per pattern per query": measure(legacy, 1, repeat=3),
+        "IgnorePatternMatcher": measure(matcher, 1, repeat=3),
+    }
+
+
+if __name__ == "__main__":
+    print_results(TITLE, run(), UNIT)
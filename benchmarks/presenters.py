@@ -0,0 +1,92 @@
+"""
+Time taken by each presenter to render the [ClassifiedQuery][classify.ClassifiedQuery] of a synthetic capture of `NUMBER` queries.
+
+The capture has slow, duplicate and similar queries over the thresholds, so that every table of the presenters is rendered.
+Terminal output goes to a `StringIO`, and `JsonLinesPresenter` writes to a temporary directory.
+The cold `PrettyPresenter` case clears the SQL formatting caches before each render, like the first request of a process.
+
+Usage: `python -m benchmarks.presenters`
+"""
+import typing
+
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+from benchmarks.classify import make_captured_queries
+from benchmarks.utils import measure, print_results, setup_django
+
+NUMBER = 1_000
+ROUNDS = 20
+TITLE = f"presenters on {NUMBER} queries"
+UNIT = "us"
+
+
+def run() -> typing.Dict[str, float]:
+    setup_django()
+    from django.test import override_settings
+
+    from django_query_capture.classify import CapturedQueryClassifier
+    from django_query_capture.export import get_json_lines_writer
+    from django_query_capture.presenter import (
+        JsonLinesPresenter,
+        OnlySlowQueryPresenter,
+        PrettyPresenter,
+        RawLinePresenter,
+        SimplePresenter,
+    )
+    from django_query_capture.utils import (
+        format_sql,
+        get_sql_formatter,
+        get_sql_lexer,
+        highlight_sql,
+    )
+
+    classified_query = CapturedQueryClassifier(make_captured_queries(NUMBER))()
+
+    def render(presenter_cls: typing.Type[typing.Any]) -> typing.Callable[[], None]:
+        def inner() -> None:
+            with redirect_stdout(io.StringIO()):
+                presenter_cls(classified_query).print()
+
+        return inner
+
+    def render_cold() -> None:
+        for cached in (format_sql, get_sql_lexer, get_sql_formatter, highlight_sql):
+            cached.cache_clear()
+        render(PrettyPresenter)()
+
+    results = {}
+    for presenter_cls in (
+        SimplePresenter,
+        RawLinePresenter,
+        OnlySlowQueryPresenter,
+        PrettyPresenter,
+    ):
+        results[presenter_cls.__name__] = measure(render(presenter_cls), ROUNDS)
+    results["PrettyPresenter cold"] = measure(render_cold, ROUNDS)
+
+    with tempfile.TemporaryDirectory() as directory, override_settings(
+        QUERY_CAPTURE={
+            "JSON_LINES": {
+                "PATH": os.path.join(directory, "query_capture.jsonl"),
+                "MAX_BYTES": None,
+                "ROTATE_INTERVAL": None,
+                "BACKUP_COUNT": 0,
+                "COMPRESS": False,
+                "BUFFER_SIZE": ROUNDS,
+                "FLUSH_INTERVAL": 60.0,
+                "REQUEST_ID_HEADER": "X-Request-ID",
+            }
+        }
+    ):
+        results[JsonLinesPresenter.__name__] = measure(
+            render(JsonLinesPresenter), ROUNDS
+        )
+        get_json_lines_writer().close()
+    return results
+
+
+if __name__ == "__main__":
+    print_results(TITLE, run(), UNIT)
@@ -0,0 +1,180 @@
+"""
+Helpers shared by the benchmark scripts.<br>
+Benchmarks run against the `tests/news` models on an in-memory SQLite database.<br>
+Results are saved as JSON by commit in `RESULTS_DIRECTORY`, so that two commits can be compared, see `benchmarks/__main__.py`.
+"""
+import typing
+
+import json
+import os
+import platform
+import subprocess  # nosec
+import sys
+import time
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIRECTORY = os.path.join(ROOT_DIRECTORY, "tests")
+RESULTS_DIRECTORY = os.path.join(ROOT_DIRECTORY, ".benchmarks")
+UNIT_SCALES = {"us": 1_000_000, "ms": 1_000, "MiB": 1 / 1024 / 1024}
+
+Results = typing.Dict[str, typing.Dict[str, typing.Any]]
+
+
+def setup_django() -> None:
+    """
+    Configure django with the `news` app and create its tables.
+    """
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if settings.configured:
+        return
+
+    sys.path.insert(0, TESTS_DIRECTORY)
+    settings.configure(
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+        },
+        SECRET_KEY="not very secret in benchmarks",
+        INSTALLED_APPS=("news",),
+        QUERY_CAPTURE={"PRESENTER": "django_query_capture.presenter.SimplePresenter"},
+    )
+    django.setup()
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+def measure(
+    func: typing.Callable[[], typing.Any], number: int, repeat: int = 5
+) -> float:
+    """
+    Args:
+        func: Function to measure.
+        number: How many times `func` is called in one round.
+        repeat: How many rounds are run, the fastest round is used.
+
+    Returns:
+        The seconds taken by one call of `func`.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / number
+
+
+def print_results(
+    title: str, results: typing.Dict[str, float], unit: str = "us"
+) -> None:
+    """
+    Args:
+        title: Name of the benchmark.
+        results: Measured seconds, or bytes for `MiB`, by case name.
+        unit: `us`, `ms` or `MiB`.
+    """
+    scale = UNIT_SCALES[unit]
+    print(title)
+    for name, seconds in results.items():
+        print(f"  {name:<40} {seconds * scale:>12.2f} {unit}")
+
+
+def get_commit() -> str:
+    """
+    Returns:
+        Short hash of `HEAD`, with `-dirty` if the tree has changes, or `unknown` outside git.
+    """
+    try:
+        commit = subprocess.check_output(  # nosec
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIRECTORY, text=True
+        ).strip()
+        dirty = subprocess.check_output(  # nosec
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT_DIRECTORY,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def save_results(results: Results, directory: str = RESULTS_DIRECTORY) -> str:
+    """
+    Args:
+        results: `{benchmark: {"title", "unit", "results"}}`.
+        directory: Directory to save to.
+
+    Returns:
+        Path of the saved file, named after [get_commit][benchmarks.utils.get_commit].
+    """
+    import django
+
+    commit = get_commit()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{commit}.json")
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "commit": commit,
+                "timestamp": time.time(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "machine": platform.machine(),
+                "benchmarks": results,
+            },
+            file,
+            indent=2,
+        )
+    return path
+
+
+def load_results(name: str, directory: str = RESULTS_DIRECTORY) -> Results:
+    """
+    Args:
+        name: Path of a result file, or a commit saved in `directory`.
+        directory: Directory results are saved to.
+
+    Returns:
+        The saved `benchmarks`.
+    """
+    path = name if os.path.exists(name) else os.path.join(directory, f"{name}.json")
+    with open(path) as file:
+        return json.load(file)["benchmarks"]
+
+
+def compare_results(
+    base: Results, head: Results, threshold: float = 0.1
+) -> typing.List[str]:
+    """
+    Print every case of both results with the change from `base` to `head`.
+
+    Args:
+        base: Results to compare against.
+        head: New results.
+        threshold: Ratio of change that is regarded as a regression, e.g. `0.1` for 10% slower or larger.
+
+    Returns:
+        Names of the cases that regressed.
+    """
+    regressions = []
+    for benchmark, head_benchmark in head.items():
+        base_benchmark = base.get(benchmark)
+        if base_benchmark is None:
+            continue
+        unit = head_benchmark["unit"]
+        scale = UNIT_SCALES[unit]
+        print(head_benchmark["title"])
+        for case, head_value in head_benchmark["results"].items():
+            base_value = base_benchmark["results"].get(case)
+            if base_value is None:
+                continue
+            change = (head_value - base_value) / base_value if base_value > 0 else 0.0
+            is_regression = change > threshold
+            if is_regression:
+                regressions.append(f"{benchmark}: {case}")
+            print(
+                f"  {case:<40} {base_value * scale:>12.2f} -> {head_value * scale:>12.2f} {unit}"
+                f" {change:>+8.1%}{'  REGRESSION' if is_regression else ''}"
+            )
+    return regressions
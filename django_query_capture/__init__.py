@@ -1,4 +1,4 @@
-from .capture import native_query_capture
+from .capture import PropagatingThreadPoolExecutor, native_query_capture
 from .classify import CapturedQueryClassifier
 from .decorators import query_capture
 from .middleware import QueryCaptureMiddleware
@@ -9,6 +9,7 @@ __all__ = [
     "BasePresenter",
     "query_capture",
     "native_query_capture",
+    "PropagatingThreadPoolExecutor",
     "QueryCaptureMiddleware",
     "RawLinePresenter",
     "PrettyPresenter",
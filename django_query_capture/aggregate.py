@@ -0,0 +1,233 @@
+"""
+Process-wide statistics by endpoint, collected by [QueryCaptureMiddleware][middleware.QueryCaptureMiddleware] when ENABLED of [AGGREGATE](../home/settings.md).<br>
+Each endpoint, the route and the method of the request, keeps counts, DB time and [LatencySketch][sketch.LatencySketch]es,
+so memory does not grow with the number of requests.
+
+```python
+from django_query_capture.aggregate import get_endpoint_aggregator
+
+for (route, method), endpoint_stats in get_endpoint_aggregator().snapshot(reset=True).items():
+    print(route, method, endpoint_stats.to_dict()["db_time_percentiles"])
+```
+"""
+import typing
+
+import threading
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_query_capture.capture import CapturedQuery
+from django_query_capture.settings import get_config
+from django_query_capture.sketch import LatencySketch
+
+UNRESOLVED_ROUTE = "<unresolved>"
+OTHER_ROUTE = "<other>"
+OTHER_FINGERPRINT = "<other>"
+
+EndpointKey = typing.Tuple[str, str]
+
+
+class EndpointStats:
+    """
+    Statistics of one endpoint.
+
+    - `request_count`: int
+    - `query_count`: int
+    - `db_time`: float, sum of the duration of every query.
+    - `request_db_time`: [LatencySketch][sketch.LatencySketch] of the DB time of each request.
+    - `request_query_count`: [LatencySketch][sketch.LatencySketch] of the number of queries of each request.
+    - `fingerprints`: [fingerprint][fingerprint.fingerprint] -> [LatencySketch][sketch.LatencySketch] of the duration of each query.
+      At most `max_fingerprints` are kept, the rest are counted in `<other>`.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_fingerprints: int = 100):
+        """
+        Args:
+            relative_accuracy: `relative_accuracy` of the sketches.
+            max_fingerprints: Maximum number of fingerprints to keep.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.max_fingerprints = max_fingerprints
+        self.request_count = 0
+        self.query_count = 0
+        self.db_time = 0.0
+        self.request_db_time = LatencySketch(relative_accuracy)
+        self.request_query_count = LatencySketch(relative_accuracy)
+        self.fingerprints: typing.Dict[str, LatencySketch] = {}
+
+    def _get_fingerprint_sketch(self, fingerprint: str) -> LatencySketch:
+        sketch = self.fingerprints.get(fingerprint)
+        if sketch is None:
+            if len(self.fingerprints) >= self.max_fingerprints:
+                fingerprint = OTHER_FINGERPRINT
+                sketch = self.fingerprints.get(fingerprint)
+            if sketch is None:
+                sketch = self.fingerprints[fingerprint] = LatencySketch(
+                    self.relative_accuracy
+                )
+        return sketch
+
+    def record(self, captured_queries: typing.Iterable[CapturedQuery]) -> None:
+        """
+        Args:
+            captured_queries: [CapturedQuery][capture.CapturedQuery]s of one request.
+        """
+        query_count = 0
+        db_time = 0.0
+        for captured_query in captured_queries:
+            duration = captured_query["duration"]
+            query_count += 1
+            db_time += duration
+            self._get_fingerprint_sketch(captured_query["fingerprint"]).add(duration)
+        self.request_count += 1
+        self.query_count += query_count
+        self.db_time += db_time
+        self.request_db_time.add(db_time)
+        self.request_query_count.add(query_count)
+
+    def merge(self, other: "EndpointStats") -> None:
+        """
+        Add the statistics of `other`, e.g. of another process.
+        """
+        self.request_count += other.request_count
+        self.query_count += other.query_count
+        self.db_time += other.db_time
+        self.request_db_time.merge(other.request_db_time)
+        self.request_query_count.merge(other.request_query_count)
+        for fingerprint, sketch in other.fingerprints.items():
+            self._get_fingerprint_sketch(fingerprint).merge(sketch)
+
+    def copy(self) -> "EndpointStats":
+        endpoint_stats = EndpointStats(self.relative_accuracy, self.max_fingerprints)
+        endpoint_stats.merge(self)
+        return endpoint_stats
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns:
+            JSON serializable summary with percentiles, fingerprints are sorted by total duration.
+        """
+        return {
+            "request_count": self.request_count,
+            "query_count": self.query_count,
+            "db_time": self.db_time,
+            "db_time_percentiles": self.request_db_time.percentiles(),
+            "query_count_percentiles": self.request_query_count.percentiles(),
+            "fingerprints": [
+                {
+                    "fingerprint": fingerprint,
+                    "count": sketch.count,
+                    "total_duration": sketch.sum,
+                    **sketch.percentiles(),
+                }
+                for fingerprint, sketch in sorted(
+                    self.fingerprints.items(), key=lambda item: -item[1].sum
+                )
+            ],
+        }
+
+
+class EndpointAggregator:
+    """
+    Thread-safe [EndpointStats][aggregate.EndpointStats] by `(route, method)`.<br>
+    At most `max_endpoints` endpoints are kept, the rest are counted in `(<other>, method)`.
+    """
+
+    def __init__(
+        self,
+        max_endpoints: int = 1000,
+        max_fingerprints: int = 100,
+        relative_accuracy: float = 0.01,
+    ):
+        """
+        Args:
+            max_endpoints: Maximum number of endpoints to keep.
+            max_fingerprints: Maximum number of fingerprints to keep per endpoint.
+            relative_accuracy: `relative_accuracy` of the sketches.
+        """
+        self.max_endpoints = max_endpoints
+        self.max_fingerprints = max_fingerprints
+        self.relative_accuracy = relative_accuracy
+        self._lock = threading.Lock()
+        self._endpoints: typing.Dict[EndpointKey, EndpointStats] = {}
+
+    def record(
+        self, route: str, method: str, captured_queries: typing.Iterable[CapturedQuery]
+    ) -> None:
+        """
+        Args:
+            route: e.g. `request.resolver_match.route`.
+            method: HTTP method.
+            captured_queries: [CapturedQuery][capture.CapturedQuery]s of one request.
+        """
+        key = (route, method)
+        with self._lock:
+            endpoint_stats = self._endpoints.get(key)
+            if endpoint_stats is None:
+                if len(self._endpoints) >= self.max_endpoints:
+                    key = (OTHER_ROUTE, method)
+                    endpoint_stats = self._endpoints.get(key)
+                if endpoint_stats is None:
+                    endpoint_stats = self._endpoints[key] = EndpointStats(
+                        self.relative_accuracy, self.max_fingerprints
+                    )
+            endpoint_stats.record(captured_queries)
+
+    def snapshot(self, reset: bool = False) -> typing.Dict[EndpointKey, EndpointStats]:
+        """
+        Args:
+            reset: Start over after taking the snapshot, e.g. to report every interval.
+
+        Returns:
+            Copy of [EndpointStats][aggregate.EndpointStats] by `(route, method)`.
+        """
+        with self._lock:
+            if reset:
+                endpoints, self._endpoints = self._endpoints, {}
+                return endpoints
+            return {
+                key: endpoint_stats.copy()
+                for key, endpoint_stats in self._endpoints.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints = {}
+
+
+@lru_cache(maxsize=None)
+def get_endpoint_aggregator() -> EndpointAggregator:
+    """
+    Returns:
+        [EndpointAggregator][aggregate.EndpointAggregator] of the process, configured by [AGGREGATE](../home/settings.md).
+    """
+    aggregate_config = get_config()["AGGREGATE"]
+    return EndpointAggregator(
+        max_endpoints=aggregate_config["MAX_ENDPOINTS"],
+        max_fingerprints=aggregate_config["MAX_FINGERPRINTS"],
+        relative_accuracy=aggregate_config["RELATIVE_ACCURACY"],
+    )
+
+
+def get_endpoint_key(request) -> EndpointKey:
+    """
+    Args:
+        request: `HttpRequest` that has been resolved.
+
+    Returns:
+        `(route, method)`, the route is the URL pattern such as `articles/<int:pk>/` rather than the path, so that the number of endpoints is bounded.
+    """
+    resolver_match = getattr(request, "resolver_match", None)
+    route = getattr(resolver_match, "route", None) or UNRESOLVED_ROUTE
+    return route, request.method
+
+
+@receiver(setting_changed)
+def clear_endpoint_aggregator(*, setting, **kwargs):
+    """
+    Build a new aggregator when overriding settings.
+    """
+    if setting == "QUERY_CAPTURE":
+        get_endpoint_aggregator.cache_clear()
@@ -0,0 +1,151 @@
+"""
+Adaptive latency baselines by [fingerprint][fingerprint.fingerprint], used when ENABLED of [BASELINE](../home/settings.md).<br>
+Each fingerprint keeps an exponentially weighted moving average and variance of its durations, so the baseline follows the query over time in constant memory.
+A query is anomalous when it is slower than its own history by `FACTOR` times the mean and `DEVIATIONS` standard deviations,
+e.g. a 5 ms query that regressed to 80 ms is flagged even though it is far below [SLOW_MIN_SECOND](../home/settings.md).
+"""
+import typing
+
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_query_capture.settings import get_config
+
+
+class QueryBaseline:
+    """
+    Exponentially weighted moving average and variance of the durations of one fingerprint.
+    """
+
+    __slots__ = ("mean", "variance", "count")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.count = 0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def add(self, duration: float, alpha: float) -> None:
+        """
+        Args:
+            duration: Seconds of the query.
+            alpha: Weight of the new duration, between 0 and 1.
+        """
+        self.count += 1
+        if self.count == 1:
+            self.mean = duration
+            return
+        diff = duration - self.mean
+        increment = alpha * diff
+        self.mean += increment
+        self.variance = (1 - alpha) * (self.variance + diff * increment)
+
+    def __repr__(self) -> str:
+        return f"<QueryBaseline count={self.count} mean={self.mean:.6f} stddev={self.stddev:.6f}>"
+
+
+class BaselineStore:
+    """
+    Thread-safe [QueryBaseline][baseline.QueryBaseline] by fingerprint, the least recently seen fingerprints are evicted over `max_fingerprints`.
+    """
+
+    def __init__(
+        self,
+        max_fingerprints: int = 10000,
+        alpha: float = 0.05,
+        factor: float = 3.0,
+        deviations: float = 3.0,
+        min_samples: int = 20,
+        min_duration: float = 0.001,
+    ):
+        """
+        Args:
+            max_fingerprints: Maximum number of fingerprints to keep.
+            alpha: Weight of each new duration, a larger value forgets the history faster.
+            factor: A query must be slower than this many times the mean to be anomalous.
+            deviations: A query must be slower than the mean by this many standard deviations to be anomalous.
+            min_samples: Queries of a fingerprint seen fewer times than this are never anomalous.
+            min_duration: Queries faster than this in seconds are never anomalous.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 and 1.")
+        self.max_fingerprints = max_fingerprints
+        self.alpha = alpha
+        self.factor = factor
+        self.deviations = deviations
+        self.min_samples = min_samples
+        self.min_duration = min_duration
+        self._lock = threading.Lock()
+        self._baselines: "OrderedDict[str, QueryBaseline]" = OrderedDict()
+
+    def observe(self, fingerprint: str, duration: float) -> typing.Optional[float]:
+        """
+        Add `duration` to the baseline of `fingerprint`, anomalous durations are added too so that the baseline adapts to a lasting change.
+
+        Args:
+            fingerprint: [fingerprint][fingerprint.fingerprint] of the query.
+            duration: Seconds of the query.
+
+        Returns:
+            The mean duration before this query if the query is anomalous, otherwise `None`. It is always positive.
+        """
+        with self._lock:
+            baseline = self._baselines.get(fingerprint)
+            if baseline is None:
+                baseline = self._baselines[fingerprint] = QueryBaseline()
+                if len(self._baselines) > self.max_fingerprints:
+                    self._baselines.popitem(last=False)
+            else:
+                self._baselines.move_to_end(fingerprint)
+            mean = baseline.mean
+            is_anomalous = (
+                baseline.count >= self.min_samples
+                # A zero mean, e.g. of timers with a coarse resolution, has no ratio to compare with.
+                and mean > 0
+                and duration >= self.min_duration
+                and duration > mean * self.factor
+                and duration > mean + self.deviations * baseline.stddev
+            )
+            baseline.add(duration, self.alpha)
+        return mean if is_anomalous else None
+
+    def get(self, fingerprint: str) -> typing.Optional[QueryBaseline]:
+        with self._lock:
+            return self._baselines.get(fingerprint)
+
+    def __len__(self) -> int:
+        return len(self._baselines)
+
+
+@lru_cache(maxsize=None)
+def get_baseline_store() -> BaselineStore:
+    """
+    Returns:
+        [BaselineStore][baseline.BaselineStore] of the process, configured by [BASELINE](../home/settings.md).
+    """
+    baseline_config = get_config()["BASELINE"]
+    return BaselineStore(
+        max_fingerprints=baseline_config["MAX_FINGERPRINTS"],
+        alpha=baseline_config["ALPHA"],
+        factor=baseline_config["FACTOR"],
+        deviations=baseline_config["DEVIATIONS"],
+        min_samples=baseline_config["MIN_SAMPLES"],
+        min_duration=baseline_config["MIN_DURATION"],
+    )
+
+
+@receiver(setting_changed)
+def clear_baseline_store(*, setting, **kwargs):
+    """
+    Build a new store when overriding settings.
+    """
+    if setting == "QUERY_CAPTURE":
+        get_baseline_store.cache_clear()
@@ -0,0 +1,121 @@
+"""
+Guess the place in the project code where a query occurred.<br>
+Instead of building the whole `inspect.stack()` for every query, frames are walked lazily from `sys._getframe()` and the walk stops at the first frame that is not library code.<br>
+Whether a file is library code is decided once and cached, so the walk is cheap even for deep stacks.
+"""
+import typing
+
+import os
+import site
+import sys
+import sysconfig
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_query_capture.settings import get_config
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class CallSite(typing.NamedTuple):
+    """
+    The place where the query occurred.
+    """
+
+    file_name: str
+    function_name: str
+    line_no: int
+
+
+UNKNOWN_CALL_SITE = CallSite("<unknown>", "<unknown>", 0)
+
+_is_library_file_cache: typing.Dict[str, bool] = {}
+
+
+@lru_cache
+def get_path_prefixes() -> typing.Tuple[typing.Tuple[str, ...], typing.Tuple[str, ...]]:
+    """
+    If [LIBRARY_PATH_PREFIXES](../home/settings.md) is not set, the site-packages and standard library directories are used,
+    including those of `site` such as `/usr/lib/python3/dist-packages` of Debian and the user site-packages.<br>
+    The directory of django_query_capture itself is always regarded as library code.
+
+    Returns:
+        library path prefixes and project path prefixes.
+    """
+    library_path_prefixes = get_config()["LIBRARY_PATH_PREFIXES"]
+    if library_path_prefixes is None:
+        paths = sysconfig.get_paths()
+        library_path_prefixes = [
+            paths[name]
+            for name in ("purelib", "platlib", "stdlib", "platstdlib")
+            if name in paths
+        ]
+        # `site` of old virtualenvs has neither function.
+        if hasattr(site, "getsitepackages"):
+            library_path_prefixes.extend(site.getsitepackages())
+        if hasattr(site, "getusersitepackages"):
+            library_path_prefixes.append(site.getusersitepackages())
+    return (
+        tuple({*library_path_prefixes, PACKAGE_DIRECTORY}),
+        tuple(get_config()["PROJECT_PATH_PREFIXES"]),
+    )
+
+
+def is_library_file(file_name: str) -> bool:
+    """
+    Args:
+        file_name: `co_filename` of the code object.
+
+    Returns:
+        `True` if the file is library code. A path in [PROJECT_PATH_PREFIXES](../home/settings.md) is never library code.
+    """
+    try:
+        return _is_library_file_cache[file_name]
+    except KeyError:
+        pass
+
+    library_path_prefixes, project_path_prefixes = get_path_prefixes()
+    if file_name.startswith(project_path_prefixes):
+        result = False
+    else:
+        # Frozen modules such as `<frozen importlib._bootstrap>` are regarded as library code too.
+        result = file_name.startswith(library_path_prefixes) or file_name.startswith(
+            "<frozen"
+        )
+    _is_library_file_cache[file_name] = result
+    return result
+
+
+def get_call_site() -> CallSite:
+    """
+    Walk up the frames of the current thread and return the first frame that is not library code.
+
+    Returns:
+        [CallSite][call_site.CallSite] of the first project frame, or `UNKNOWN_CALL_SITE` if there is none.
+    """
+    frame: typing.Optional[typing.Any] = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if not is_library_file(code.co_filename):
+            return CallSite(code.co_filename, code.co_name, frame.f_lineno)
+        frame = frame.f_back
+    return UNKNOWN_CALL_SITE
+
+
+def clear_call_site_cache() -> None:
+    """
+    Forget the cached verdicts, for example when the path prefixes were changed.
+    """
+    _is_library_file_cache.clear()
+    get_path_prefixes.cache_clear()
+
+
+@receiver(setting_changed)
+def update_call_site_cache(*, setting, **kwargs):
+    """
+    Refresh the cached verdicts when overriding settings.
+    """
+    if setting == "QUERY_CAPTURE":
+        clear_call_site_cache()
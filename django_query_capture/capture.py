@@ -1,17 +1,40 @@
 """
-This module is a code that expands and holds data by hooking whenever a query occurs in django.
+This module is a code that expands and holds data by hooking whenever a query occurs in django.<br>
+Active captures are kept in a `ContextVar`, so under ASGI each request only sees its own queries,
+including queries run on other threads by `sync_to_async`.
 """
 
 import typing
 
-import inspect
+import asyncio
+import contextvars
+import decimal
+import functools
+import heapq
+import sys
+import threading
 import time
-from contextlib import ContextDecorator, ExitStack
-from distutils.sysconfig import get_python_lib
+import types
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ContextDecorator
+from contextvars import ContextVar
 
-from django.db import connection
+from django.db import connections
 from django.db.backends.dummy.base import DatabaseWrapper
+from django.db.backends.signals import connection_created
 from django.db.backends.utils import CursorWrapper
+from django.dispatch import receiver
+
+from django_query_capture.baseline import get_baseline_store
+from django_query_capture.call_site import get_call_site
+from django_query_capture.fingerprint import fingerprint
+from django_query_capture.settings import get_config
+
+T = typing.TypeVar("T")
+
+if typing.TYPE_CHECKING:
+    from django_query_capture.classify import CapturedQueryClassifier
 
 
 class CapturedQueryContext(typing.TypedDict):
@@ -20,55 +43,574 @@ class CapturedQueryContext(typing.TypedDict):
     """
 
     connection: DatabaseWrapper
-    cursor: CursorWrapper
+    cursor: typing.Optional[CursorWrapper]
+
+
+class CapturedQuery(typing.Mapping[str, typing.Any]):
+    """
+    A `data class` that adds the time and place of occurrence to the data that comes out when you capture Query in django.<br>
+    It is a compact record with `__slots__`, and it can be read like a dict with the keys below, e.g. `captured_query["duration"]`.
+    Unlike a dict, records are equal only to themselves, and they are hashable.
+
+    - `sql`: str, SQL to which parameters are applied. It is rendered only when it is read for the first time, and the result is kept.
+      On backends whose rendering reads the state of the cursor, the attribute it reads is kept right after the query, see `CURSOR_STATE_ATTRIBUTES`.
+    - `raw_sql`: str, interned so that repeated queries share the string.
+    - `fingerprint`: str, [fingerprint][fingerprint.fingerprint] of `raw_sql` that groups `Similar` queries.
+    - `raw_params`: a list/tuple/dict of parameters, or a list of them if `many` is `True`.
+    - `many`: bool
+    - `duration`: float
+    - `file_name`: str
+    - `function_name`: str
+    - `line_no`: int
+    - `alias`: str, alias of the database connection.
+    - `thread_id`: int, `threading.get_ident()` of the thread that ran the query.
+    - `started_at`: float, `time.monotonic()` when the query started, to compare queries run in parallel.
+    - `rows_fetched`: int, rows read from the cursor after the query, counted with ENABLED of [FETCH](../home/settings.md).
+    - `fetch_duration`: float, seconds spent in `fetchone`/`fetchmany`/`fetchall` and iteration after the query, measured with ENABLED of [FETCH](../home/settings.md).
+    - `rows_affected`: int or `None`, `cursor.rowcount` after the query with ENABLED of [FETCH](../home/settings.md), `None` if the database doesn't report it.
+    - `baseline_duration`: float or `None`, mean duration of the fingerprint before the query if the query deviated from it, with ENABLED of [BASELINE](../home/settings.md).
+    - `context`: [CapturedQueryContext][capture.CapturedQueryContext], the connection that ran the query and the cursor are held weakly, so captured queries don't keep them alive.
+      `connection` is the connection of the thread that ran the query, even when it is read on another thread, and falls back to `connections[alias]` of the reading thread once it has been garbage collected.
+    """
+
+    __slots__ = (
+        "raw_sql",
+        "raw_params",
+        "many",
+        "duration",
+        "file_name",
+        "function_name",
+        "line_no",
+        "alias",
+        "thread_id",
+        "started_at",
+        "rows_fetched",
+        "fetch_duration",
+        "rows_affected",
+        "baseline_duration",
+        "_connection_ref",
+        "_cursor_ref",
+        "_cursor_state",
+        "_sql",
+    )
+    KEYS = (
+        "sql",
+        "raw_sql",
+        "fingerprint",
+        "raw_params",
+        "many",
+        "duration",
+        "file_name",
+        "function_name",
+        "line_no",
+        "alias",
+        "thread_id",
+        "started_at",
+        "rows_fetched",
+        "fetch_duration",
+        "rows_affected",
+        "baseline_duration",
+        "context",
+    )
+    _KEY_SET = frozenset(KEYS)
+    # Records are compared and hashed by identity, `Mapping.__eq__` would render `sql` and resolve `context` of both.
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __init__(
+        self,
+        raw_sql: str,
+        raw_params: typing.Any,
+        many: bool,
+        duration: float,
+        file_name: str,
+        function_name: str,
+        line_no: int,
+        alias: str,
+        cursor: typing.Optional[CursorWrapper] = None,
+        connection: typing.Optional[DatabaseWrapper] = None,
+        thread_id: typing.Optional[int] = None,
+        started_at: float = 0.0,
+    ):
+        self.raw_sql = sys.intern(raw_sql)
+        self.raw_params = raw_params
+        self.many = many
+        self.duration = duration
+        self.file_name = sys.intern(file_name)
+        self.function_name = sys.intern(function_name)
+        self.line_no = line_no
+        self.alias = sys.intern(alias)
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.started_at = started_at
+        self.rows_fetched = 0
+        self.fetch_duration = 0.0
+        self.rows_affected: typing.Optional[int] = None
+        self.baseline_duration: typing.Optional[float] = None
+        self._connection_ref: typing.Optional[
+            typing.Callable[[], typing.Optional[DatabaseWrapper]]
+        ] = (weakref.ref(connection) if connection is not None else None)
+        try:
+            self._cursor_ref: typing.Optional[
+                typing.Callable[[], typing.Optional[CursorWrapper]]
+            ] = (weakref.ref(cursor) if cursor is not None else None)
+        except TypeError:
+            self._cursor_ref = None
+        self._cursor_state: typing.Any = None
+        self._sql: typing.Optional[str] = None
+
+    @property
+    def sql(self) -> str:
+        if self._sql is None:
+            context = self.context
+            if self._cursor_state is not None:
+                # The cursor may have run other queries since, `last_executed_query` reads the state it had after this one.
+                cursor_state_attribute = CURSOR_STATE_ATTRIBUTES[
+                    context["connection"].vendor
+                ]
+                context = {
+                    **context,
+                    "cursor": types.SimpleNamespace(
+                        **{cursor_state_attribute: self._cursor_state}
+                    ),
+                }
+            self._sql = render_sql(self.raw_sql, self.raw_params, self.many, context)
+        return self._sql
+
+    @property
+    def fingerprint(self) -> str:
+        return fingerprint(self.raw_sql)
+
+    @property
+    def context(self) -> CapturedQueryContext:
+        connection = (
+            self._connection_ref() if self._connection_ref is not None else None
+        )
+        return {
+            "connection": connection
+            if connection is not None
+            else connections[self.alias],
+            "cursor": self._cursor_ref() if self._cursor_ref is not None else None,
+        }
+
+    def __getitem__(self, key: str) -> typing.Any:
+        if key not in self._KEY_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._KEY_SET
+
+    def __repr__(self) -> str:
+        return f"<CapturedQuery {self.alias}: {self.raw_sql!r} {self.duration:.6f}s>"
+
+
+# `last_executed_query` of these backends reads the statement the cursor ran last from this attribute, e.g. the bytes of `cursor.query` on PostgreSQL,
+# so it is kept right after the query, before the cursor runs another one, and decoded only when `sql` is read.
+CURSOR_STATE_ATTRIBUTES = {
+    "postgresql": "query",
+    "mysql": "_executed",
+    "oracle": "statement",
+}
+
+
+def quote_param(value: typing.Any) -> str:
+    """
+    Args:
+        value: One parameter of a query.
+
+    Returns:
+        SQL literal of `value`, used when the backend can't render the query.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"X'{bytes(value).hex()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def render_sql(
+    sql: str,
+    params: typing.Any,
+    many: bool,
+    context: CapturedQueryContext,
+) -> str:
+    """
+    Render SQL with the parameters applied, in the way the database backend does with `connection.ops.last_executed_query`.
+
+    Args:
+        sql: SQL to which parameters are not applied.
+        params: Parameters to be used for SQL.
+        many: If `True`, `params` is a sequence of parameters for `executemany()`, then `sql` is returned as it is.
+        context: [CapturedQueryContext][capture.CapturedQueryContext]
+
+    Returns:
+        SQL to which parameters are applied. If the backend can't render it, the parameters are quoted by [quote_param][capture.quote_param],
+        and if that fails too, `sql` is returned.
+    """
+    if many or not params:
+        return sql
+    try:
+        rendered_sql = context["connection"].ops.last_executed_query(
+            context["cursor"], sql, params
+        )
+    except Exception:  # The connection may be closed or the backend may not support it.
+        rendered_sql = None
+    if rendered_sql is None:
+        try:
+            rendered_sql = sql % (
+                {key: quote_param(value) for key, value in params.items()}
+                if isinstance(params, dict)
+                else tuple(quote_param(value) for value in params)
+            )
+        except (TypeError, ValueError, KeyError):
+            rendered_sql = sql
+    return rendered_sql
+
+
+def get_database_aliases(
+    databases: typing.Optional[typing.Iterable[str]] = None,
+) -> typing.List[str]:
+    """
+    Args:
+        databases: Aliases of the databases to capture.
+
+    Returns:
+        `databases` if it is given, otherwise [DATABASE_ALIASES](../home/settings.md), and if that is `None` too, all aliases in `django.db.connections`.
+    """
+    if databases is None:
+        databases = get_config()["DATABASE_ALIASES"]
+    if databases is None:
+        databases = connections
+    return list(databases)
+
+
+active_captures: "ContextVar[typing.Tuple[native_query_capture, ...]]" = ContextVar(
+    "django_query_capture_active_captures", default=()
+)
+
+
+class FetchTrackingCursor:
+    """
+    Proxy of the database cursor of a `CursorWrapper`, installed by [dispatch_query][capture.dispatch_query] with ENABLED of [FETCH](../home/settings.md).<br>
+    Rows and time of `fetchone`, `fetchmany`, `fetchall` and iteration are added to the [CapturedQuery][capture.CapturedQuery] of the last query of the cursor if it was captured,
+    which is shared by every capture, everything else is passed to the database cursor.
+    """
+
+    def __init__(self, cursor: typing.Any):
+        self.cursor = cursor
+        self.captured_query: typing.Optional["CapturedQuery"] = None
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.cursor, name)
+
+    def _record(self, rows: int, started_at: float) -> None:
+        captured_query = self.captured_query
+        if captured_query is not None:
+            captured_query.rows_fetched += rows
+            captured_query.fetch_duration += time.monotonic() - started_at
+
+    def fetchone(self) -> typing.Any:
+        started_at = time.monotonic()
+        row = self.cursor.fetchone()
+        self._record(1 if row is not None else 0, started_at)
+        return row
+
+    def fetchmany(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        started_at = time.monotonic()
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self._record(len(rows), started_at)
+        return rows
+
+    def fetchall(self) -> typing.Any:
+        started_at = time.monotonic()
+        rows = self.cursor.fetchall()
+        self._record(len(rows), started_at)
+        return rows
+
+    def __iter__(self) -> typing.Iterator[typing.Any]:
+        iterator = iter(self.cursor)
+        while True:
+            started_at = time.monotonic()
+            try:
+                row = next(iterator)
+            except StopIteration:
+                self._record(0, started_at)
+                return
+            self._record(1, started_at)
+            yield row
+
 
+def track_fetches(
+    context: typing.Mapping[str, typing.Any]
+) -> typing.Optional[FetchTrackingCursor]:
+    """
+    Install a [FetchTrackingCursor][capture.FetchTrackingCursor] on the cursor of `context` before a captured query.
+
+    Returns:
+        The [FetchTrackingCursor][capture.FetchTrackingCursor], `None` if there is no cursor.
+    """
+    cursor_wrapper = context.get("cursor")
+    if cursor_wrapper is None:
+        return None
+    cursor = cursor_wrapper.cursor
+    if isinstance(cursor, FetchTrackingCursor):
+        return cursor
+    fetch_tracking_cursor = cursor_wrapper.cursor = FetchTrackingCursor(cursor)
+    return fetch_tracking_cursor
+
+
+def dispatch_query(execute, sql, params, many, context):
+    """
+    https://docs.djangoproject.com/en/3.2/topics/db/instrumentation/
+
+    The `execute_wrapper` installed once on every connection.<br>
+    When [native_query_capture][capture.native_query_capture]s of the database are active in the current context,
+    the call site is looked up and the query is timed once, and the same [CapturedQuery][capture.CapturedQuery] is handed to every one of them, the outermost capture first,
+    so nesting captures costs one method call per capture. Otherwise the query runs as is.<br>
+    With ENABLED of [FETCH](../home/settings.md), the cursor is wrapped by [FetchTrackingCursor][capture.FetchTrackingCursor] so that the rows read after the query are measured too.<br>
+    With ENABLED of [BASELINE](../home/settings.md), the duration is added to the [BaselineStore][baseline.BaselineStore] once, however many captures are nested.
 
-class CapturedQuery(typing.TypedDict):
+    Args:
+        execute: a callable, which should be invoked with the rest of the parameters in order to execute the query.
+        sql: a str, the SQL query to be sent to the database.
+        params: a list/tuple of parameter values for the SQL command, or a list/tuple of lists/tuples if the wrapped call is executemany().
+        many: a bool indicating whether the ultimately invoked call is execute() or executemany() (and whether params is expected to be a sequence of values, or a sequence of sequences of values).
+        context: a dictionary with further data about the context of invocation. This includes the connection and cursor.
+
+    Returns:
+        Returns the result of `execute`.
     """
-    A `data class` that adds the time and place of occurrence to the data that comes out when you capture Query in django.
+    cursor = getattr(context.get("cursor"), "cursor", None)
+    if isinstance(cursor, FetchTrackingCursor):
+        # Every query forgets the query tracked by the cursor, so the rows of a query that is not captured aren't added to it.
+        cursor.captured_query = None
+    captures = active_captures.get()
+    if not captures:
+        return execute(sql, params, many, context)
+    alias = context["connection"].alias
+    captures = tuple(capture for capture in captures if alias in capture.aliases)
+    if not captures:
+        return execute(sql, params, many, context)
+
+    config = get_config()
+    fetch_tracking_cursor = (
+        track_fetches(context) if config["FETCH"]["ENABLED"] else None
+    )
+    file_name, function_name, line_no = get_call_site()
+    thread_id = threading.get_ident()
+    start_timestamp = time.monotonic()
+    result = execute(sql, params, many, context)
+    duration = time.monotonic() - start_timestamp
+    captured_query = CapturedQuery(
+        raw_sql=sql,
+        raw_params=params,
+        many=many,
+        duration=duration,
+        file_name=file_name,
+        function_name=function_name,
+        line_no=line_no,
+        alias=alias,
+        cursor=context["cursor"],
+        connection=context["connection"],
+        thread_id=thread_id,
+        started_at=start_timestamp,
+    )
+    if fetch_tracking_cursor is not None:
+        fetch_tracking_cursor.captured_query = captured_query
+        rowcount = getattr(fetch_tracking_cursor, "rowcount", -1)
+        if rowcount is not None and rowcount >= 0:
+            captured_query.rows_affected = rowcount
+    if config["BASELINE"]["ENABLED"]:
+        captured_query.baseline_duration = get_baseline_store().observe(
+            captured_query.fingerprint, duration
+        )
+    cursor_state_attribute = CURSOR_STATE_ATTRIBUTES.get(context["connection"].vendor)
+    if cursor_state_attribute is not None:
+        captured_query._cursor_state = getattr(
+            context["cursor"], cursor_state_attribute, None
+        )
+    for capture in captures:
+        capture._save_query(captured_query)
+    return result
+
+
+def install_query_dispatcher(connection: DatabaseWrapper) -> None:
     """
+    Install [dispatch_query][capture.dispatch_query] on `connection` if it is not installed yet.<br>
+    It is put first, so `connection.execute_wrapper` blocks of other code, which pop the last wrapper on exit, never remove it.
 
-    sql: str
-    raw_sql: str
-    raw_params: str
-    many: bool
-    duration: float
-    file_name: str
-    function_name: str
-    line_no: int
-    context: CapturedQueryContext
+    Args:
+        connection: `connections[alias]`, there is one per thread.
+    """
+    if dispatch_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, dispatch_query)
 
 
-class native_query_capture(ContextDecorator):
+@receiver(connection_created)
+def install_query_dispatcher_on_connect(*, connection, **kwargs):
+    """
+    Connections of threads started by `sync_to_async` or thread pools are created after the capture is entered, so the dispatcher is installed when they connect.
+    """
+    install_query_dispatcher(connection)
+
+
+def propagate_capture(fn: typing.Callable[..., T]) -> typing.Callable[..., T]:
+    """
+    Bind `fn` to a copy of the current context if a capture with `propagate_threads` is active,
+    so that its queries are captured when it runs on another thread, e.g. `threading.Thread(target=propagate_capture(fn))`.
+
+    Args:
+        fn: Function to run on another thread.
+
+    Returns:
+        `fn` run in a copy of the current context, or `fn` itself outside such captures.
+    """
+    if not any(capture.propagate_threads for capture in active_captures.get()):
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class PropagatingThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    `ThreadPoolExecutor` whose functions submitted inside a capture with `propagate_threads` run in a copy of its context,
+    so their queries are captured too, see [propagate_capture][capture.propagate_capture].<br>
+    Functions submitted to other executors are not captured.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(propagate_capture(fn), *args, **kwargs)
+
+
+class CaptureContextDecorator(ContextDecorator):
+    """
+    `ContextDecorator` that also wraps coroutine functions, so that async views can be decorated.<br>
+    Every call of a decorated function enters a new capture built with the same arguments,
+    so concurrent calls, e.g. of an async view awaited by `asyncio.gather` or of a view run on several threads, don't share their queries.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls)
+        instance._init_args = (args, kwargs)
+        return instance
+
+    def _recreate_cm(self):
+        args, kwargs = self._init_args
+        return type(self)(*args, **kwargs)
+
+    def __call__(self, func):
+        if not asyncio.iscoroutinefunction(func):
+            return super().__call__(func)
+
+        @functools.wraps(func)
+        async def inner(*args, **kwargs):
+            with self._recreate_cm():
+                return await func(*args, **kwargs)
+
+        return inner
+
+
+class native_query_capture(CaptureContextDecorator):
     """
     This is the `ContextDecorator` that extends django's `connection.execute_wrapper`.<br>
-    measure the time of the query and guess where the query occurred.<br>
+    The query is timed and where it occurred is guessed once by [dispatch_query][capture.dispatch_query], however many captures are nested.<br>
+    It is registered in a `ContextVar` while it is entered, so it captures the queries of the current context only, see [dispatch_query][capture.dispatch_query].<br>
+    Queries of other threads, e.g. `sync_to_async` or [PropagatingThreadPoolExecutor][capture.PropagatingThreadPoolExecutor] with `propagate_threads`, are appended to a buffer per thread without a lock,
+    and the buffers are merged in order of `started_at` at `__exit__`.
+    With a streaming classifier, they are classified on arrival under a lock instead, so memory stays bounded by its BUFFER_SIZE and TOP_K.
+    Worker threads must finish inside the block: the buffers are detached at `__exit__`, and queries they run after it are discarded.<br>
     the main attribute is [self.captured_queries][capture.CapturedQuery], [native_query_capture][capture.native_query_capture] returns data from some captured_queries.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        databases: typing.Optional[typing.Iterable[str]] = None,
+        classifier: typing.Optional["CapturedQueryClassifier"] = None,
+        propagate_threads: typing.Optional[bool] = None,
+    ):
         """
-        `self._exit_stack`: `ExitStack` was used to wrap `connection.execute_wrapper`.<br>
-        `self.captured_queries`: Used to store captured queries and expanded data.
+        `self.captured_queries`: Used to store captured queries and expanded data.<br>
+        `self.classifier`: [CapturedQueryClassifier][classify.CapturedQueryClassifier] fed with every captured query, so `self.classifier()` returns live statistics.
+
+        Args:
+            databases: Aliases of the databases to capture, by default [DATABASE_ALIASES](../home/settings.md) or all databases.
+            classifier: [CapturedQueryClassifier][classify.CapturedQueryClassifier] to feed. Its `captured_queries` is used to store captured queries, which is a bounded `deque` in streaming mode.
+            propagate_threads: Capture queries of functions submitted to [PropagatingThreadPoolExecutor][capture.PropagatingThreadPoolExecutor] inside the block, by default [PROPAGATE_THREADS](../home/settings.md).
         """
-        self._exit_stack = ExitStack().__enter__()
-        self.captured_queries: typing.List[CapturedQuery] = []
+        self.databases = databases
+        self.aliases: typing.FrozenSet[str] = frozenset()
+        self.propagate_threads = (
+            get_config()["PROPAGATE_THREADS"]
+            if propagate_threads is None
+            else propagate_threads
+        )
+        self._thread_id: typing.Optional[int] = None
+        self._thread_buffers: typing.Optional[
+            typing.Dict[int, typing.List[CapturedQuery]]
+        ] = None
+        self.classifier = classifier
+        self._streaming_lock = (
+            threading.Lock()
+            if classifier is not None and classifier.streaming
+            else None
+        )
+        self.captured_queries: typing.MutableSequence[CapturedQuery] = (
+            classifier.captured_queries if classifier is not None else []
+        )
 
     def __enter__(self) -> "native_query_capture":
         """
-        Use exit_stack to perform `connection.execute_wrapper.__enter__`.
+        Make sure [dispatch_query][capture.dispatch_query] is installed on every database to capture, and add yourself to the active captures of the current context.
 
         Returns:
             Returns yourself with the property of [self.captured_queries][capture.CapturedQuery] so that you can check captured queries in real time.
         """
-        self._exit_stack.enter_context(connection.execute_wrapper(self._save_queries))
+        self.aliases = frozenset(get_database_aliases(self.databases))
+        for alias in self.aliases:
+            install_query_dispatcher(connections[alias])
+        self._thread_id = threading.get_ident()
+        self._thread_buffers = {}
+        active_captures.set(active_captures.get() + (self,))
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Close exit_stack to call `connection.execute_wrapper.__exit___`.
+        Remove yourself from the active captures of the current context, and merge the queries of other threads.<br>
+        The buffers are detached, so threads that are still running, e.g. submitted with `propagate_threads` and not waited for, can't add queries anymore.
+        """
+        active_captures.set(
+            tuple(capture for capture in active_captures.get() if capture is not self)
+        )
+        self._thread_id = None
+        self.merge_thread_buffers()
+
+    def merge_thread_buffers(self) -> None:
+        """
+        Append the queries buffered by other threads to [self.captured_queries][capture.CapturedQuery] in order of `started_at`, and classify them.<br>
+        Each buffer is already in order, since a thread runs one query at a time.
+        After `__exit__`, the buffers are not replaced, so later queries of other threads are discarded.
         """
-        self._exit_stack.close()
+        thread_buffers = self._thread_buffers or {}
+        self._thread_buffers = {} if self._thread_id is not None else None
+        for captured_query in heapq.merge(
+            *thread_buffers.values(),
+            key=lambda captured_query: captured_query.started_at,
+        ):
+            self._append(captured_query)
+
+    def _append(self, captured_query: CapturedQuery) -> None:
+        self.captured_queries.append(captured_query)
+        if self.classifier is not None:
+            self.classifier.classify(captured_query)
 
     def __len__(self) -> int:
         """
@@ -77,47 +619,28 @@ class native_query_capture(ContextDecorator):
         """
         return len(self.captured_queries)
 
-    def _save_queries(self, execute, sql, params, many, context):
+    def _save_query(self, captured_query: CapturedQuery) -> None:
         """
-        https://docs.djangoproject.com/en/3.2/topics/db/instrumentation/
-
-        It is a function used as a callback for execute_wrapper and receives a factor of `connection.execute_wrapper`.<br>
-        measure the time of the query with the data provided by `connection.execute_wrapper`, track and store the query-generated CallStack.
+        Store a query handed by [dispatch_query][capture.dispatch_query].<br>
+        Queries of the thread that entered the capture are appended and classified right away, queries of other threads are buffered until `__exit__`,
+        and discarded after it. With a streaming classifier, every query is appended and classified right away under a lock.
 
         Args:
-            execute: a callable, which should be invoked with the rest of the parameters in order to execute the query.
-            sql: a str, the SQL query to be sent to the database.
-            params: a list/tuple of parameter values for the SQL command, or a list/tuple of lists/tuples if the wrapped call is executemany().
-            many: a bool indicating whether the ultimately invoked call is execute() or executemany() (and whether params is expected to be a sequence of values, or a sequence of sequences of values).
-            context: a dictionary with further data about the context of invocation. This includes the connection and cursor.
-
-        Returns:
-            Returns the result of the exit for the basic operation of `connection.execute_wrapper`.
+            captured_query: [CapturedQuery][capture.CapturedQuery] shared by every active capture.
         """
-        python_library_directory = get_python_lib()
-        called_by = [
-            stack
-            for stack in inspect.stack()
-            if not stack.filename.startswith(python_library_directory)
-        ][0]
-        file_name = called_by.filename
-        function_name = called_by.function
-        line_no = called_by.lineno
-        start_timestamp = time.monotonic()
-        result = execute(sql, params, many, context)
-        duration = time.monotonic() - start_timestamp
-        self.captured_queries.append(
-            {
-                "sql": sql % tuple(params) if params else sql,
-                "raw_sql": sql,
-                "raw_params": params,
-                "many": many,
-                "duration": duration,
-                "file_name": file_name,
-                "function_name": function_name,
-                "line_no": line_no,
-                "context": context,
-            }
-        )
-
-        return result
+        thread_id = captured_query.thread_id
+        if self._streaming_lock is not None:
+            # Buffers would grow with the block, so every query goes to the bounded classifier on arrival.
+            with self._streaming_lock:
+                if self._thread_id is not None:
+                    self._append(captured_query)
+            return
+        if thread_id == self._thread_id:
+            self._append(captured_query)
+            return
+        thread_buffers = self._thread_buffers
+        if thread_buffers is None:
+            # The capture has exited, and the query of a thread that outlived it is dropped.
+            return
+        # Only this thread appends to its buffer, and `dict.setdefault` is atomic, so no lock is needed.
+        thread_buffers.setdefault(thread_id, []).append(captured_query)
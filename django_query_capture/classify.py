@@ -2,41 +2,173 @@
 If [native_query_capture][capture.native_query_capture] has received data, it serves to refine the data into the necessary data.
 
 ???+ warning "HashableCapturedQuery"
-    In order to use `collection.Counter`, it was necessary to change the dict form to a hashable dict form.<br>
-    So, to classify `Duplicate` and `Similar`, we convert [CapturedQuery][capture.CapturedQuery] dict into HashableDict form and use it as Counter's key.<br>
+    In order to use `collection.Counter`, it was necessary to make [CapturedQuery][capture.CapturedQuery] hashable.<br>
+    So, to classify `Duplicate` and `Similar`, we wrap [CapturedQuery][capture.CapturedQuery] with a hashable wrapper and use it as Counter's key.<br>
     If there is a better way, feel free to leave it as an issue or PR.
 """
 
 import typing
 
 import re
-from collections import Counter
-from functools import cached_property
+from collections import Counter, deque
+from functools import lru_cache
 
 from django_query_capture.capture import CapturedQuery
 from django_query_capture.settings import get_config
+from django_query_capture.streaming import SpaceSavingCounter, TopK
 
+if typing.TYPE_CHECKING:
+    from django_query_capture.explain import QueryPlan
 
-class DuplicateHashableCapturedQuery(typing.Dict[str, typing.Any]):
-    def __hash__(self):
-        return hash(self["sql"])
+HashableT = typing.TypeVar("HashableT", bound=typing.Hashable)
 
-    def __eq__(self, other):
-        return self["sql"] == self["sql"]
 
+def make_hashable(value: typing.Any) -> typing.Hashable:
+    """
+    Convert parameters of a query into a hashable value, so that they can be compared without rendering SQL.
+
+    Args:
+        value: list, tuple, dict or a single value of the parameters.
+
+    Returns:
+        Hashable value, unhashable values are replaced with their `repr`.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, make_hashable(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(make_hashable(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+IGNORE_VERDICT_CACHE_SIZE = 4096
+
+
+class IgnorePatternMatcher:
+    """
+    All ignore patterns are compiled once into a single alternation, unless a pattern has groups or global flags, and verdicts are kept in a bounded LRU cache keyed by `raw_sql`,
+    so that a query seen before is decided with one dict lookup.
+    """
+
+    def __init__(self, patterns: typing.Sequence[str]):
+        """
+        Args:
+            patterns: REGEX string list, a query that matches any of them is ignored.
+        """
+        self.patterns = tuple(patterns)
+        self.regexes: typing.List[typing.Pattern[str]] = []
+        if self.patterns:
+            regexes = [re.compile(pattern) for pattern in self.patterns]
+            if any(regex.groups for regex in regexes):
+                # Groups are renumbered in an alternation, so a backreference such as `\1` would point at a group of another pattern.
+                self.regexes = regexes
+            else:
+                try:
+                    self.regexes = [
+                        re.compile(
+                            "|".join(f"(?:{pattern})" for pattern in self.patterns)
+                        )
+                    ]
+                except re.error:
+                    # Patterns with global flags such as `(?i)` can't be combined, so they are searched one by one.
+                    self.regexes = regexes
+        self.is_ignored = lru_cache(maxsize=IGNORE_VERDICT_CACHE_SIZE)(self._is_ignored)
+
+    def _is_ignored(self, query: str) -> bool:
+        return any(regex.search(query) for regex in self.regexes)
+
+
+@lru_cache(maxsize=32)
+def get_ignore_pattern_matcher(
+    patterns: typing.Tuple[str, ...]
+) -> IgnorePatternMatcher:
+    """
+    Args:
+        patterns: REGEX string tuple, usually [IGNORE_SQL_PATTERNS](../home/settings.md).
+
+    Returns:
+        [IgnorePatternMatcher][classify.IgnorePatternMatcher] shared by every classifier with the same patterns.
+    """
+    return IgnorePatternMatcher(patterns)
+
+
+class HashableCapturedQuery(typing.Mapping[str, typing.Any]):
+    """
+    Wrap [CapturedQuery][capture.CapturedQuery] to be used as a key of `Counter`, it can be read like the wrapped query.
+    """
+
+    __slots__ = ("captured_query", "hash_key", "_hash")
+
+    def __init__(self, captured_query: CapturedQuery):
+        if isinstance(captured_query, HashableCapturedQuery):
+            captured_query = captured_query.captured_query
+        self.captured_query = captured_query
+        self.hash_key = self.get_hash_key(captured_query)
+        self._hash = hash(self.hash_key)
+
+    @staticmethod
+    def get_hash_key(captured_query: CapturedQuery) -> typing.Hashable:
+        raise NotImplementedError
+
+    def __getitem__(self, key: str) -> typing.Any:
+        return self.captured_query[key]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.captured_query)
+
+    def __len__(self) -> int:
+        return len(self.captured_query)
 
-class SimilarHashableCapturedQuery(typing.Dict[str, typing.Any]):
     def __hash__(self):
-        return hash(self["raw_sql"])
+        return self._hash
 
     def __eq__(self, other):
-        return self["raw_sql"] == self["raw_sql"]
+        return self.hash_key == other.hash_key
+
+
+class DuplicateHashableCapturedQuery(HashableCapturedQuery):
+    """
+    Queries with the same `raw_sql` and `raw_params` are the same `Duplicate`.
+    """
+
+    __slots__ = ()
+
+    @staticmethod
+    def get_hash_key(captured_query: CapturedQuery) -> typing.Hashable:
+        return captured_query["raw_sql"], make_hashable(captured_query["raw_params"])
+
+
+class SimilarHashableCapturedQuery(HashableCapturedQuery):
+    """
+    Queries with the same [fingerprint][fingerprint.fingerprint] are the same `Similar`.
+    """
+
+    __slots__ = ()
+
+    @staticmethod
+    def get_hash_key(captured_query: CapturedQuery) -> typing.Hashable:
+        return captured_query["fingerprint"]
+
+
+class AliasStats(typing.TypedDict):
+    """
+    `read`, `writes`, `total` and `total_duration` of one database alias.
+    """
+
+    read: int
+    writes: int
+    total: int
+    total_duration: float
 
 
 class ClassifiedQuery(typing.TypedDict):
     """
     This is the result of Classifier refining list of [CapturedQuery][capture.CapturedQuery].
-    You can freely make output this data from the `Presenter`.
+    You can freely make output this data from the `Presenter`.<br>
+    `query_plans` is empty unless [query_capture][decorators.query_capture] filled it with [explain_classified_query][explain.explain_classified_query], by [get_query_plan_key][explain.get_query_plan_key].
     """
 
     read: int
@@ -44,6 +176,8 @@ class ClassifiedQuery(typing.TypedDict):
     total: int
     total_duration: float
     slow_captured_queries: typing.List[CapturedQuery]
+    unbounded_captured_queries: typing.List[CapturedQuery]
+    anomalous_captured_queries: typing.List[CapturedQuery]
     duplicates_counter: typing.Counter[CapturedQuery]
     duplicates_counter_over_threshold: typing.Counter[CapturedQuery]
     similar_counter: typing.Counter[CapturedQuery]
@@ -56,31 +190,157 @@ class ClassifiedQuery(typing.TypedDict):
     ]
     has_over_threshold: bool
     captured_queries: typing.List[CapturedQuery]
+    alias_stats: typing.Dict[str, AliasStats]
+    query_plans: typing.Dict[str, "QueryPlan"]
+
+
+class QueryCounter(typing.Generic[HashableT]):
+    """
+    Exact counter of hashable queries.<br>
+    The first query of each key is kept, because it is what the `Counter` holds as a key and what presenters print,
+    and keys that went over the threshold are tracked as they go over, so nothing has to be scanned at the end.
+    """
+
+    def __init__(self, min_count: typing.Optional[int] = None):
+        """
+        Args:
+            min_count: Keys counted more than this are over the threshold.
+        """
+        self.min_count = min_count
+        self.counter: typing.Counter[HashableT] = Counter()
+        self._first_keys: typing.Dict[HashableT, HashableT] = {}
+        # `dict` is used as an ordered set, keys are in the order they went over the threshold.
+        self._over_threshold: typing.Dict[HashableT, None] = {}
+
+    def add(self, key: HashableT) -> typing.Tuple[HashableT, int]:
+        """
+        Args:
+            key: Key to count once.
+
+        Returns:
+            The first key that is equal to `key` and its count.
+        """
+        count = self.counter[key] + 1
+        self.counter[key] = count
+        if count == 1:
+            self._first_keys[key] = key
+        else:
+            key = self._first_keys[key]
+        if self.min_count is not None and count > self.min_count:
+            self._over_threshold[key] = None
+        return key, count
+
+    def is_over_threshold(self, key: HashableT) -> bool:
+        return key in self._over_threshold
+
+    def over_threshold(self) -> typing.Iterator[typing.Tuple[HashableT, int]]:
+        """
+        Returns:
+            Keys counted more than `min_count` and their counts.
+        """
+        for key in self._over_threshold:
+            yield key, self.counter[key]
 
 
 class CapturedQueryClassifier:
     """
     This is the result of Classifier refining list of [CapturedQuery][capture.CapturedQuery].
-    You can freely make output this data from the `Presenter`.
+    You can freely make output this data from the `Presenter`.<br>
+    It is an online classifier, every [CapturedQuery][capture.CapturedQuery] is classified once by [classify][classify.CapturedQueryClassifier.classify] as it arrives,
+    so the statistics are ready at any time without going over all queries again.<br>
+    In streaming mode, memory stays constant: only the last queries are kept in a ring buffer, the slowest queries in a heap,
+    and duplicates and similar queries are counted approximately with [SpaceSavingCounter][streaming.SpaceSavingCounter].
     """
 
     def __init__(
         self,
-        captured_queries: typing.List[CapturedQuery],
+        captured_queries: typing.Optional[typing.List[CapturedQuery]] = None,
         ignore_patterns: typing.Optional[typing.List[str]] = None,
+        streaming: typing.Optional[bool] = None,
+        print_thresholds: typing.Optional[typing.Mapping[str, typing.Any]] = None,
     ):
         """
         Args:
-            captured_queries: A list of [CapturedQuery][capture.CapturedQuery] collected by [native_query_capture][capture.native_query_capture].
+            captured_queries: A list of [CapturedQuery][capture.CapturedQuery] collected by [native_query_capture][capture.native_query_capture].<br>
+                Queries already in the list are classified right away, and queries appended later must be passed to [classify][classify.CapturedQueryClassifier.classify].
             ignore_patterns: REGEX string list that will not be used for classification among [CapturedQuery][capture.CapturedQuery].
+            streaming: Whether to use streaming mode, by default ENABLED of [STREAMING](../home/settings.md).
+                `captured_queries` becomes a `deque` that keeps only the last BUFFER_SIZE queries.
+            print_thresholds: Thresholds to classify with, by default [PRINT_THRESHOLDS](../home/settings.md), e.g. those of [get_route_config][settings.get_route_config].
         """
         self.ignore_patterns = ignore_patterns or get_config()["IGNORE_SQL_PATTERNS"]
-        self.captured_queries = captured_queries
-        self.filtered_captured_queries = [
-            captured_query
-            for captured_query in captured_queries
-            if self.is_allow_pattern(captured_query["sql"])
+        self.ignore_pattern_matcher = get_ignore_pattern_matcher(
+            tuple(self.ignore_patterns)
+        )
+
+        if print_thresholds is None:
+            print_thresholds = get_config()["PRINT_THRESHOLDS"]
+        self.slow_min_second: typing.Optional[float] = print_thresholds[
+            "SLOW_MIN_SECOND"
+        ]
+        duplicate_min_count: typing.Optional[int] = print_thresholds[
+            "DUPLICATE_MIN_COUNT"
         ]
+        similar_min_count: typing.Optional[int] = print_thresholds["SIMILAR_MIN_COUNT"]
+
+        fetch_config = get_config()["FETCH"]
+        self.unbounded_min_rows: typing.Optional[int] = (
+            fetch_config["UNBOUNDED_MIN_ROWS"] if fetch_config["ENABLED"] else None
+        )
+
+        streaming_config = get_config()["STREAMING"]
+        self.streaming = streaming_config["ENABLED"] if streaming is None else streaming
+        self.captured_queries: typing.MutableSequence[CapturedQuery]
+        self.duplicates: typing.Union[
+            QueryCounter[DuplicateHashableCapturedQuery],
+            SpaceSavingCounter[DuplicateHashableCapturedQuery],
+        ]
+        self.similars: typing.Union[
+            QueryCounter[SimilarHashableCapturedQuery],
+            SpaceSavingCounter[SimilarHashableCapturedQuery],
+        ]
+        self._slow_captured_queries: typing.Union[
+            typing.List[CapturedQuery], TopK[CapturedQuery]
+        ]
+        self._anomalous_captured_queries: typing.Union[
+            typing.List[CapturedQuery], TopK[CapturedQuery]
+        ]
+        if self.streaming:
+            self.captured_queries = deque(maxlen=streaming_config["BUFFER_SIZE"])
+            self.duplicates = SpaceSavingCounter(
+                streaming_config["TOP_K"], duplicate_min_count
+            )
+            self.similars = SpaceSavingCounter(
+                streaming_config["TOP_K"], similar_min_count
+            )
+            self._slow_captured_queries = TopK(streaming_config["TOP_K"])
+            self._anomalous_captured_queries = TopK(streaming_config["TOP_K"])
+        else:
+            self.captured_queries = []
+            self.duplicates = QueryCounter(duplicate_min_count)
+            self.similars = QueryCounter(similar_min_count)
+            self._slow_captured_queries = []
+            self._anomalous_captured_queries = []
+
+        self.read_count = 0
+        self.writes_count = 0
+        self.total_count = 0
+        self.total_duration = 0.0
+        self.alias_stats: typing.Dict[str, AliasStats] = {}
+        self._most_common_duplicate: typing.Union[
+            typing.Tuple[CapturedQuery, int], typing.Tuple[None, None]
+        ] = (None, None)
+        self._most_common_similar: typing.Union[
+            typing.Tuple[CapturedQuery, int], typing.Tuple[None, None]
+        ] = (None, None)
+
+        if captured_queries is not None:
+            if self.streaming:
+                self.captured_queries.extend(captured_queries)
+            else:
+                self.captured_queries = captured_queries
+            for captured_query in captured_queries:
+                self.classify(captured_query)
 
     def __call__(self) -> ClassifiedQuery:
         return {
@@ -89,6 +349,8 @@ class CapturedQueryClassifier:
             "total": self.total_count,
             "total_duration": self.total_duration,
             "slow_captured_queries": self.slow_captured_queries,
+            "unbounded_captured_queries": self.unbounded_captured_queries,
+            "anomalous_captured_queries": self.anomalous_captured_queries,
             "duplicates_counter": self.duplicates_counter,
             "duplicates_counter_over_threshold": self.duplicates_counter_over_threshold,
             "similar_counter": self.similar_counter,
@@ -96,149 +358,166 @@ class CapturedQueryClassifier:
             "most_common_duplicate": self.most_common_duplicate,
             "most_common_similar": self.most_common_similar,
             "has_over_threshold": self.has_over_threshold,
-            "captured_queries": self.captured_queries,
+            "captured_queries": list(self.captured_queries)
+            if self.streaming
+            else typing.cast(typing.List[CapturedQuery], self.captured_queries),
+            "alias_stats": self.alias_stats,
+            "query_plans": {},
         }
 
     def is_allow_pattern(self, query: str) -> bool:
         """
         Args:
-            query: It's simply a sql string.
+            query: SQL to which parameters are not applied, so that SQL doesn't have to be rendered.
 
         Returns:
             It is a list of [CapturedQuery][capture.CapturedQuery] that is not caught in ignore_patterns, that is, a classification target.
         """
-        return not list(
-            filter(
-                lambda pattern: re.compile(pattern).search(query),
-                self.ignore_patterns,
-            )
-        )
+        if not self.ignore_pattern_matcher.patterns:
+            return True
+        return not self.ignore_pattern_matcher.is_ignored(query)
 
-    @property
-    def read_count(self) -> int:
+    def classify(self, captured_query: CapturedQuery) -> None:
         """
-        Returns:
-            number of `SELECT` statement
+        Update every statistic with one query. Queries caught in ignore_patterns are skipped.
+
+        Args:
+            captured_query: [CapturedQuery][capture.CapturedQuery] that has just been captured.
         """
-        return sum(
-            1
-            for capture_query in self.filtered_captured_queries
-            if capture_query["raw_sql"].startswith("SELECT")
+        raw_sql = captured_query["raw_sql"]
+        if not self.is_allow_pattern(raw_sql):
+            return
+
+        duration = captured_query["duration"]
+        is_read = raw_sql.startswith("SELECT")
+        self.total_count += 1
+        self.total_duration += duration
+        if is_read:
+            self.read_count += 1
+        else:
+            self.writes_count += 1
+
+        alias = captured_query["alias"]
+        try:
+            alias_stats = self.alias_stats[alias]
+        except KeyError:
+            alias_stats = self.alias_stats[alias] = {
+                "read": 0,
+                "writes": 0,
+                "total": 0,
+                "total_duration": 0.0,
+            }
+        if is_read:
+            alias_stats["read"] += 1
+        else:
+            alias_stats["writes"] += 1
+        alias_stats["total"] += 1
+        alias_stats["total_duration"] += duration
+
+        if self.slow_min_second is not None and duration > self.slow_min_second:
+            if isinstance(self._slow_captured_queries, TopK):
+                self._slow_captured_queries.add(duration, captured_query)
+            else:
+                self._slow_captured_queries.append(captured_query)
+
+        baseline_duration = captured_query["baseline_duration"]
+        if baseline_duration is not None:
+            if isinstance(self._anomalous_captured_queries, TopK):
+                self._anomalous_captured_queries.add(
+                    duration / baseline_duration, captured_query
+                )
+            else:
+                self._anomalous_captured_queries.append(captured_query)
+
+        duplicate, count = self.duplicates.add(
+            DuplicateHashableCapturedQuery(captured_query)
         )
+        if count > (self._most_common_duplicate[1] or 0):
+            self._most_common_duplicate = (duplicate, count)
+
+        similar, count = self.similars.add(SimilarHashableCapturedQuery(captured_query))
+        if count > (self._most_common_similar[1] or 0):
+            self._most_common_similar = (similar, count)
 
     @property
-    def writes_count(self) -> int:
+    def slow_captured_queries(self) -> typing.List[CapturedQuery]:
         """
         Returns:
-            number of not `SELECT` statement ( `INSERT`, `UPDATE`, `DELETE` )
+            [CapturedQuery][capture.CapturedQuery] list with time exceeding [SLOW_MIN_SECOND](../home/settings.md), in streaming mode only the slowest TOP_K of them.
         """
-        return sum(
-            1
-            for capture_query in self.filtered_captured_queries
-            if not capture_query["raw_sql"].startswith("SELECT")
-        )
+        if isinstance(self._slow_captured_queries, TopK):
+            return self._slow_captured_queries.items()
+        return self._slow_captured_queries
 
     @property
-    def total_count(self) -> int:
+    def anomalous_captured_queries(self) -> typing.List[CapturedQuery]:
         """
         Returns:
-            The number of all queries.
+            [CapturedQuery][capture.CapturedQuery] list that deviated from the baseline of its fingerprint, see [BASELINE](../home/settings.md).
+            `baseline_duration` of each query is the mean it deviated from. In streaming mode only the TOP_K that deviated the most.
         """
-        return len(self.filtered_captured_queries)
+        if isinstance(self._anomalous_captured_queries, TopK):
+            return self._anomalous_captured_queries.items()
+        return self._anomalous_captured_queries
 
     @property
-    def total_duration(self) -> float:
+    def unbounded_captured_queries(self) -> typing.List[CapturedQuery]:
         """
-        Returns:
-           The total time the query was executed.
-        """
-        return sum(
-            capture_query["duration"]
-            for capture_query in self.filtered_captured_queries
-        )
+        Rows are fetched after a query is classified, so it goes over the queries that are kept when it is read, e.g. when the block has exited.
 
-    @cached_property
-    def slow_captured_queries(self) -> typing.List[CapturedQuery]:
-        """
         Returns:
-            [CapturedQuery][capture.CapturedQuery] list with time exceeding [SLOW_MIN_SECOND](home/settings)
+            [CapturedQuery][capture.CapturedQuery] list that fetched more than [UNBOUNDED_MIN_ROWS](../home/settings.md) rows, which should use `.iterator()` or pagination.
+            It is empty unless ENABLED of [FETCH](../home/settings.md).
         """
-        results = []
-        slow_min_second = get_config()["PRINT_THRESHOLDS"]["SLOW_MIN_SECOND"]
-        if slow_min_second is not None:
-            for captured_query in self.filtered_captured_queries:
-                if captured_query["duration"] > slow_min_second:
-                    results.append(captured_query)
-
-        return results
+        return list(self._iter_unbounded_captured_queries())
+
+    def _iter_unbounded_captured_queries(self) -> typing.Iterator[CapturedQuery]:
+        if self.unbounded_min_rows is None:
+            return
+        for captured_query in self.captured_queries:
+            if (
+                captured_query.rows_fetched > self.unbounded_min_rows
+                and self.is_allow_pattern(captured_query.raw_sql)
+            ):
+                yield captured_query
 
-    @cached_property
+    @property
     def duplicates_counter(self) -> typing.Counter[CapturedQuery]:
         """
         Returns:
             `Counter` that counts the number of `Duplicate` in all queries except ignore_patterns.
         """
-        counter: typing.Counter[CapturedQuery] = Counter()
-        for captured_query in self.filtered_captured_queries:
-            counter[DuplicateHashableCapturedQuery(captured_query)] += 1  # type: ignore
+        return self.duplicates.counter  # type: ignore
 
-        return counter
-
-    @cached_property
-    def duplicates_counter_over_threshold(self) -> typing.Counter[CapturedQuery]:
+    @property
+    def similar_counter(self) -> typing.Counter[CapturedQuery]:
         """
         Returns:
-            CaptureQuery Counter that exceeds [DUPLICATE_MIN_COUNT](../home/settings.md) among [duplicates_counter][classify.CapturedQueryClassifier.duplicates_counter].
+            `Counter` that counts the number of `Similar` in all queries except ignore_patterns.
         """
-        counter: typing.Counter[CapturedQuery] = Counter()
-        duplicate_min_count: typing.Optional[int] = get_config()["PRINT_THRESHOLDS"][
-            "DUPLICATE_MIN_COUNT"
-        ]
-        if duplicate_min_count is not None:
-            for captured_query, count in self.duplicates_counter.items():
-                if count > duplicate_min_count:
-                    counter[captured_query] = count
-
-        return counter
+        return self.similars.counter  # type: ignore
 
-    @cached_property
-    def similar_counter(self) -> typing.Counter[CapturedQuery]:
+    @property
+    def duplicates_counter_over_threshold(self) -> typing.Counter[CapturedQuery]:
         """
         Returns:
-            `Counter` that counts the number of `Similar` in all queries except ignore_patterns.
+            CaptureQuery Counter that exceeds [DUPLICATE_MIN_COUNT](../home/settings.md) among [duplicates_counter][classify.CapturedQueryClassifier.duplicates_counter].
         """
-        counter: typing.Counter[CapturedQuery] = Counter()
-        for captured_query in self.filtered_captured_queries:
+        return Counter(dict(self.duplicates.over_threshold()))
 
-            counter[SimilarHashableCapturedQuery(captured_query)] += 1  # type: ignore
-
-        return counter
-
-    @cached_property
+    @property
     def similar_counter_over_threshold(self) -> typing.Counter[CapturedQuery]:
         """
         Returns:
             [CaptureQuery][capture.CapturedQuery] `Counter` that exceeds [SIMILAR_MIN_COUNT](../home/settings.md) among [duplicates_counter][classify.CapturedQueryClassifier.duplicates_counter], it doesn't overlap with Duplicates.
         """
         counter: typing.Counter[CapturedQuery] = Counter()
-        similar_min_count: typing.Optional[int] = get_config()["PRINT_THRESHOLDS"][
-            "SIMILAR_MIN_COUNT"
-        ]
-        duplicate_min_count: typing.Optional[int] = get_config()["PRINT_THRESHOLDS"][
-            "DUPLICATE_MIN_COUNT"
-        ]
-        if similar_min_count is not None:
-            for captured_query, count in self.similar_counter.items():
-                if duplicate_min_count is not None:
-                    if (
-                        self.duplicates_counter[
-                            DuplicateHashableCapturedQuery(captured_query)  # type: ignore
-                        ]
-                        > duplicate_min_count
-                    ):
-                        continue
-                if count > similar_min_count:
-                    counter[captured_query] = count
+        for similar, count in self.similars.over_threshold():
+            if self.duplicates.is_over_threshold(
+                DuplicateHashableCapturedQuery(similar)
+            ):
+                continue
+            counter[similar] = count
 
         return counter
 
@@ -250,10 +529,7 @@ class CapturedQueryClassifier:
         Returns:
             most frequent `Counter` among [duplicates_counter][classify.CapturedQueryClassifier.duplicates_counter].
         """
-        try:
-            return self.duplicates_counter.most_common(1)[0]
-        except IndexError:
-            return None, None
+        return self._most_common_duplicate
 
     @property
     def most_common_similar(
@@ -263,22 +539,22 @@ class CapturedQueryClassifier:
         Returns:
             most frequent `Counter` among [duplicates_counter][classify.CapturedQueryClassifier.similar_counter].
         """
-        try:
-            return self.similar_counter.most_common(1)[0]
-        except IndexError:
-            return None, None
+        return self._most_common_similar
 
     @property
     def has_over_threshold(self) -> bool:
         """
         Returns:
             [SLOW_MIN_SECOND, DUPLICATE_MIN_COUNT, SIMILAR_MIN_COUNT](../home/settings.md)<br>
-            If any of the three has exceeded the threshold, return `True`.
+            If any of the three has exceeded the threshold, a query deviated from its [BASELINE](../home/settings.md),
+            or a query fetched more than [UNBOUNDED_MIN_ROWS](../home/settings.md) rows, return `True`.
         """
         if (
-            self.similar_counter_over_threshold
-            or self.duplicates_counter_over_threshold
-            or self.slow_captured_queries
+            any(True for _ in self.similars.over_threshold())
+            or any(True for _ in self.duplicates.over_threshold())
+            or self._slow_captured_queries
+            or self._anomalous_captured_queries
+            or any(True for _ in self._iter_unbounded_captured_queries())
         ):
             return True
         return False
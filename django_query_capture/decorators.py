@@ -4,31 +4,47 @@ It is a module responsible for both query capture, classification, and output.
 """
 import typing
 
-from contextlib import ContextDecorator, ExitStack
+from contextlib import ExitStack
 
 from django.utils.module_loading import import_string
 
-from django_query_capture.capture import native_query_capture
+from django_query_capture.capture import CaptureContextDecorator, native_query_capture
 from django_query_capture.classify import CapturedQueryClassifier
+from django_query_capture.explain import explain_classified_query
+from django_query_capture.output import present
 from django_query_capture.presenter import BasePresenter
 from django_query_capture.settings import get_config
 
 
-class query_capture(ContextDecorator):
+class query_capture(CaptureContextDecorator):
     def __init__(
         self,
         ignore_output: bool = False,
         ignore_patterns: typing.Optional[typing.List[str]] = None,
+        databases: typing.Optional[typing.Iterable[str]] = None,
+        streaming: typing.Optional[bool] = None,
+        propagate_threads: typing.Optional[bool] = None,
+        print_thresholds: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+        presenter: typing.Optional[str] = None,
     ):
         """
         Args:
             ignore_output: Flag to prevent output.
             ignore_patterns: A list of patterns to ignore IGNORE_SQL_PATTERNS of settings.
+            databases: Aliases of the databases to capture, by default DATABASE_ALIASES of settings or all databases.
+            streaming: Keep memory constant for long blocks such as management commands, by default ENABLED of STREAMING of settings.
+            propagate_threads: Capture queries of functions submitted to `PropagatingThreadPoolExecutor` inside the block, by default PROPAGATE_THREADS of settings.
+            print_thresholds: Thresholds of the block, by default PRINT_THRESHOLDS of settings.
+            presenter: Import path of the Presenter, by default PRESENTER of settings.
         """
         self.ignore_output = ignore_output
+        self.databases = databases
+        self.streaming = streaming
+        self.propagate_threads = propagate_threads
+        self.print_thresholds = print_thresholds
         self.ignore_patterns = ignore_patterns or get_config()["IGNORE_SQL_PATTERNS"]
         self.presenter_cls: typing.Type[BasePresenter] = import_string(
-            get_config()["PRESENTER"]
+            presenter or get_config()["PRESENTER"]
         )
 
     def __enter__(self) -> native_query_capture:
@@ -39,20 +55,30 @@ class query_capture(ContextDecorator):
             [native_query_capture][capture.native_query_capture]
         """
         self._exit_stack = ExitStack().__enter__()
-        self.native_query_capture = native_query_capture()
+        self.captured_query_classifier = CapturedQueryClassifier(
+            ignore_patterns=self.ignore_patterns,
+            streaming=self.streaming,
+            print_thresholds=self.print_thresholds,
+        )
+        self.native_query_capture = native_query_capture(
+            databases=self.databases,
+            classifier=self.captured_query_classifier,
+            propagate_threads=self.propagate_threads,
+        )
         self._exit_stack.enter_context(self.native_query_capture)
         return self.native_query_capture
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         r"""
         Call [native_query_capture.\_\_exit\_\_][capture.native_query_capture.__exit__].<br>
-        Run the [CapturedQueryClassifier][classify.CapturedQueryClassifier] to extract meaningful data and transfer the data to the Presenter.<br>
-        Presenter can be changed in settings, and if [BasePresenter][presenter.base.BasePresenter] is inherited and implemented, the desired output can be generated.
+        The [CapturedQueryClassifier][classify.CapturedQueryClassifier] has already classified every query as it was captured or merged from other threads, so meaningful data is taken out of it and transferred to the Presenter.<br>
+        Presenter can be changed in settings, and if [BasePresenter][presenter.base.BasePresenter] is inherited and implemented, the desired output can be generated.<br>
+        With ASYNC_OUTPUT of settings, the Presenter runs on a background thread, see [present][output.present].<br>
+        With ENABLED of EXPLAIN of settings, the cached plans of the slow and similar queries are added unless `ignore_output` is set, and the missing ones are explained in the background, see [explain_classified_query][explain.explain_classified_query].
         """
-        self.classifier = CapturedQueryClassifier(
-            self.native_query_capture.captured_queries,
-            ignore_patterns=self.ignore_patterns,
-        )()
-        if not self.ignore_output:
-            self.presenter_cls(self.classifier).print()
         self._exit_stack.close()
+        self.classifier = self.captured_query_classifier()
+        if get_config()["EXPLAIN"]["ENABLED"] and not self.ignore_output:
+            self.classifier["query_plans"] = explain_classified_query(self.classifier)
+        if not self.ignore_output:
+            present(self.presenter_cls, self.classifier)
@@ -0,0 +1,228 @@
+"""
+Query plans of slow and over-threshold similar queries, collected when ENABLED of [EXPLAIN](../home/settings.md).<br>
+Plans are taken with `connection.ops.explain_query_prefix()`, e.g. `EXPLAIN QUERY PLAN` on SQLite, on the alias of the query,
+and cached by alias and [fingerprint][fingerprint.fingerprint] for TTL seconds, so each statement is explained once.<br>
+A capture only reads plans from the cache: the missing ones are explained on a background thread for the next captures,
+so `EXPLAIN` never adds latency to a request, also runs on an event loop, e.g. behind the async path of [QueryCaptureMiddleware][middleware.QueryCaptureMiddleware],
+and its queries are never captured.
+"""
+import typing
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+
+from django_query_capture.capture import CapturedQuery, active_captures
+from django_query_capture.classify import ClassifiedQuery
+from django_query_capture.settings import get_config
+
+FULL_SCAN_REGEXES = {
+    "sqlite": re.compile(
+        r"\bSCAN (?!CONSTANT ROW)(?!.*\bUSING (?:COVERING )?INDEX\b)", re.IGNORECASE
+    ),
+    "postgresql": re.compile(r"\bSeq Scan\b"),
+    "mysql": re.compile(r"\bALL\b"),
+    "oracle": re.compile(r"\bTABLE ACCESS FULL\b"),
+}
+
+
+class QueryPlan(typing.TypedDict):
+    """
+    - `fingerprint`: [fingerprint][fingerprint.fingerprint] of the query.
+    - `alias`: Database alias the query ran on.
+    - `plan`: Lines of the plan, each row of the result joined with spaces like `QuerySet.explain()`.
+    - `full_scans`: Lines of the plan that scan a whole table.
+    """
+
+    fingerprint: str
+    alias: str
+    plan: typing.List[str]
+    full_scans: typing.List[str]
+
+
+class ExplainCache:
+    """
+    Thread-safe cache of [QueryPlan][explain.QueryPlan] by fingerprint, entries expire after `ttl` seconds and the least recently used are evicted over `max_size`.<br>
+    A query that can't be explained is cached as `None`, so it is not retried until it expires.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: typing.Optional[float] = 3600):
+        """
+        Args:
+            max_size: Maximum number of plans to keep.
+            ttl: Seconds a plan is kept, `None` keeps plans until they are evicted.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, typing.Tuple[float, typing.Optional[QueryPlan]]]" = (
+            OrderedDict()
+        )
+
+    def get(self, key: str) -> typing.Tuple[bool, typing.Optional[QueryPlan]]:
+        """
+        Returns:
+            Whether `key` is cached, and its plan.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, query_plan = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, query_plan
+
+    def set(self, key: str, query_plan: typing.Optional[QueryPlan]) -> None:
+        expires_at = (
+            time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        )
+        with self._lock:
+            self._entries[key] = (expires_at, query_plan)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache(maxsize=None)
+def get_explain_cache() -> ExplainCache:
+    """
+    Returns:
+        [ExplainCache][explain.ExplainCache] of the process, configured by [EXPLAIN](../home/settings.md).
+    """
+    explain_config = get_config()["EXPLAIN"]
+    return ExplainCache(explain_config["CACHE_SIZE"], explain_config["TTL"])
+
+
+@receiver(setting_changed)
+def clear_explain_cache(*, setting, **kwargs):
+    """
+    Build a new cache when overriding settings.
+    """
+    if setting == "QUERY_CAPTURE":
+        get_explain_cache.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_explain_executor() -> ThreadPoolExecutor:
+    """
+    Returns:
+        Single background thread of the process that explains the queries missing from the cache.
+        It keeps its own connection to each database it explains on.
+    """
+    return ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="django-query-capture-explain"
+    )
+
+
+def get_query_plan_key(captured_query: CapturedQuery) -> str:
+    """
+    Returns:
+        Key of the plan of `captured_query` in the cache and in `query_plans` of [ClassifiedQuery][classify.ClassifiedQuery], queries of the same shape on two aliases have their own plans.
+    """
+    return f'{captured_query["alias"]}:{captured_query["fingerprint"]}'
+
+
+def explain_query(captured_query: CapturedQuery) -> typing.Optional[QueryPlan]:
+    """
+    Run `EXPLAIN` of the query on its alias, outside of every active capture.<br>
+    It runs on the connection of this thread for the alias of the query, because connections can't be shared between threads.<br>
+    The query runs in a savepoint when it is in a transaction, so a failing `EXPLAIN` doesn't break the transaction,
+    and any error is swallowed, so that a plan lookup never fails the block.
+
+    Args:
+        captured_query: [CapturedQuery][capture.CapturedQuery] that is a `SELECT` run with `execute()`.
+
+    Returns:
+        [QueryPlan][explain.QueryPlan], `None` if the database can't explain the query.
+    """
+    alias = captured_query["alias"]
+    connection = connections[alias]
+    if (
+        captured_query["many"]
+        or not captured_query["raw_sql"].startswith("SELECT")
+        or not connection.features.supports_explaining_query_execution
+    ):
+        return None
+
+    token = active_captures.set(())
+    try:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {captured_query["raw_sql"]}',
+                captured_query["raw_params"],
+            )
+            rows = cursor.fetchall()
+    except Exception:  # e.g. `DatabaseError`, a plan lookup never fails.
+        return None
+    finally:
+        active_captures.reset(token)
+
+    plan = [
+        row if isinstance(row, str) else " ".join(str(column) for column in row)
+        for row in rows
+    ]
+    full_scan_regex = FULL_SCAN_REGEXES.get(connection.vendor)
+    return {
+        "fingerprint": captured_query["fingerprint"],
+        "alias": alias,
+        "plan": plan,
+        "full_scans": [line for line in plan if full_scan_regex.search(line)]
+        if full_scan_regex is not None
+        else [],
+    }
+
+
+def explain_and_cache(
+    explain_cache: ExplainCache, key: str, captured_query: CapturedQuery
+) -> None:
+    """
+    Explain `captured_query` on the background thread, unless it has been cached since it was submitted.
+    """
+    if not explain_cache.get(key)[0]:
+        explain_cache.set(key, explain_query(captured_query))
+
+
+def explain_classified_query(
+    classified_query: ClassifiedQuery,
+) -> typing.Dict[str, QueryPlan]:
+    """
+    Args:
+        classified_query: [ClassifiedQuery][classify.ClassifiedQuery] of a block that has exited.
+
+    Returns:
+        Cached [QueryPlan][explain.QueryPlan] by [get_query_plan_key][explain.get_query_plan_key] of the slow queries, the queries that deviated from their baseline and the similar queries over the threshold.<br>
+        The others are explained by [get_explain_executor][explain.get_explain_executor] for the next captures, so no query runs here.
+    """
+    explain_cache = get_explain_cache()
+    query_plans: typing.Dict[str, QueryPlan] = {}
+    keys: typing.Set[str] = set()
+    for captured_query in (
+        *classified_query["slow_captured_queries"],
+        *classified_query["anomalous_captured_queries"],
+        *classified_query["similar_counter_over_threshold"],
+    ):
+        key = get_query_plan_key(captured_query)
+        if key in keys:
+            continue
+        keys.add(key)
+        is_cached, query_plan = explain_cache.get(key)
+        if not is_cached:
+            get_explain_executor().submit(
+                explain_and_cache, explain_cache, key, captured_query
+            )
+        elif query_plan is not None:
+            query_plans[key] = query_plan
+    return query_plans
@@ -0,0 +1,329 @@
+"""
+Export of [ClassifiedQuery][classify.ClassifiedQuery] as JSON Lines, used by [JsonLinesPresenter][presenter.json_lines.JsonLinesPresenter].<br>
+Records are encoded with `orjson` if it is installed, otherwise with `json`, and written in batches to a file rotated by size and time,
+see [JSON_LINES](../home/settings.md).
+"""
+import typing
+
+import atexit
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_query_capture.capture import CapturedQuery
+from django_query_capture.classify import ClassifiedQuery
+from django_query_capture.settings import get_config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+RECORD_VERSION = 1
+
+request_id: "ContextVar[typing.Optional[str]]" = ContextVar(
+    "django_query_capture_request_id", default=None
+)
+
+
+def dumps(value: typing.Any) -> bytes:
+    """
+    Args:
+        value: JSON serializable value, other values are converted with `str`.
+
+    Returns:
+        Compact JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def serialize_captured_query(
+    captured_query: CapturedQuery, with_sql: bool = False
+) -> typing.Dict[str, typing.Any]:
+    """
+    Args:
+        captured_query: [CapturedQuery][capture.CapturedQuery]
+        with_sql: Add `raw_sql`, it is left out of every query so that records stay small.
+
+    Returns:
+        `fingerprint`, `duration`, the call site, `alias`, `thread_id`, the rows fetched and affected by the query and its `baseline_duration`.
+    """
+    serialized = {
+        "fingerprint": captured_query["fingerprint"],
+        "duration": captured_query["duration"],
+        "file_name": captured_query["file_name"],
+        "function_name": captured_query["function_name"],
+        "line_no": captured_query["line_no"],
+        "alias": captured_query["alias"],
+        "thread_id": captured_query["thread_id"],
+        "rows_fetched": captured_query["rows_fetched"],
+        "fetch_duration": captured_query["fetch_duration"],
+        "rows_affected": captured_query["rows_affected"],
+        "baseline_duration": captured_query["baseline_duration"],
+    }
+    if with_sql:
+        serialized["raw_sql"] = captured_query["raw_sql"]
+    return serialized
+
+
+def serialize_classified_query(
+    classified_query: ClassifiedQuery,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Args:
+        classified_query: [ClassifiedQuery][classify.ClassifiedQuery]
+
+    Returns:
+        One JSON Lines record with the statistics, the queries over the thresholds with their SQL, and every query.
+    """
+    return {
+        "version": RECORD_VERSION,
+        "timestamp": time.time(),
+        "pid": os.getpid(),
+        "request_id": request_id.get(),
+        "read": classified_query["read"],
+        "writes": classified_query["writes"],
+        "total": classified_query["total"],
+        "total_duration": classified_query["total_duration"],
+        "has_over_threshold": classified_query["has_over_threshold"],
+        "alias_stats": classified_query["alias_stats"],
+        "slow": [
+            serialize_captured_query(captured_query, with_sql=True)
+            for captured_query in classified_query["slow_captured_queries"]
+        ],
+        "anomalies": [
+            serialize_captured_query(captured_query, with_sql=True)
+            for captured_query in classified_query["anomalous_captured_queries"]
+        ],
+        "unbounded": [
+            serialize_captured_query(captured_query, with_sql=True)
+            for captured_query in classified_query["unbounded_captured_queries"]
+        ],
+        "duplicates": [
+            {**serialize_captured_query(captured_query, with_sql=True), "count": count}
+            for captured_query, count in classified_query[
+                "duplicates_counter_over_threshold"
+            ].items()
+        ],
+        "similars": [
+            {**serialize_captured_query(captured_query, with_sql=True), "count": count}
+            for captured_query, count in classified_query[
+                "similar_counter_over_threshold"
+            ].items()
+        ],
+        "queries": [
+            serialize_captured_query(captured_query)
+            for captured_query in classified_query["captured_queries"]
+        ],
+    }
+
+
+class RotatingJsonLinesWriter:
+    """
+    Append records to `path` in batches.<br>
+    Encoded records are buffered, and written when `buffer_size` records are waiting or `flush_interval` seconds passed since the last write.<br>
+    When the file is larger than `max_bytes` or older than `rotate_interval` seconds, it is renamed to `path.1` and older files are shifted up to `path.{backup_count}`,
+    like `logging.handlers.RotatingFileHandler`, and with `backup_count` of 0 it is emptied. With `compress`, rotated files are gzipped.<br>
+    The file is only renamed while records are written, the backups are shifted and compressed after the lock is released, so other threads keep writing meanwhile.<br>
+    Rotation is checked when the writer flushes, not on a timer: a file that outlived `rotate_interval` is rotated before the next records are written,
+    so they start a new file, and `flush()` rotates it without records, e.g. from a periodic task of a quiet process.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: typing.Optional[int] = None,
+        rotate_interval: typing.Optional[float] = None,
+        backup_count: int = 5,
+        compress: bool = False,
+        buffer_size: int = 100,
+        flush_interval: float = 1.0,
+    ):
+        """
+        Args:
+            path: File to write, `{pid}` is replaced with the process id so that processes don't share a file.
+            max_bytes: Rotate when the file is larger than this, `None` never rotates by size.
+            rotate_interval: Rotate when the file is older than this in seconds, `None` never rotates by time.
+            backup_count: Number of rotated files to keep.
+            compress: gzip rotated files.
+            buffer_size: Number of records to buffer before writing.
+            flush_interval: Seconds after which buffered records are written on the next record.
+        """
+        self.path_template = path
+        self._pid: typing.Optional[int] = None
+        self._path = ""
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer: typing.List[bytes] = []
+        self._lock = threading.Lock()
+        self._file: typing.Optional[typing.BinaryIO] = None
+        self._opened_at = 0.0
+        self._last_flush = time.monotonic()
+        # (path, renamed path) of the rotated files whose backups are not shifted yet, in order of rotation.
+        self._rotated_paths: typing.Deque[typing.Tuple[str, str]] = deque()
+        self._rotation_lock = threading.Lock()
+
+    def _check_process(self) -> None:
+        pid = os.getpid()
+        if pid != self._pid:
+            # The writer is inherited by a forked worker, which writes its own file.
+            # The parent writes the records it buffered, and keeps the file it opened.
+            self._pid = pid
+            self._path = os.path.abspath(self.path_template.format(pid=pid))
+            self._buffer = []
+            self._file = None
+            self._rotated_paths = deque()
+            self._rotation_lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        self._check_process()
+        return self._path
+
+    def write(self, record: typing.Any) -> None:
+        """
+        Args:
+            record: JSON serializable record.
+        """
+        line = dumps(record) + b"\n"
+        with self._lock:
+            self._check_process()
+            self._buffer.append(line)
+            if (
+                len(self._buffer) >= self.buffer_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self._flush()
+        self._finish_rotations()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+        self._finish_rotations()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._finish_rotations()
+
+    def _open(self, path: str) -> typing.BinaryIO:
+        if self._file is None:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(path, "ab")
+            self._opened_at = time.time()
+        return self._file
+
+    def _should_rotate(self, file: typing.BinaryIO) -> bool:
+        if self.max_bytes is not None and file.tell() >= self.max_bytes:
+            return True
+        return (
+            self.rotate_interval is not None
+            and time.time() - self._opened_at >= self.rotate_interval
+        )
+
+    def _flush(self) -> None:
+        path = self.path
+        self._last_flush = time.monotonic()
+        if self._file is not None and self._should_rotate(self._file):
+            self._rotate()
+        if not self._buffer:
+            return
+        file = self._open(path)
+        file.write(b"".join(self._buffer))
+        file.flush()
+        self._buffer = []
+        if self._should_rotate(file):
+            self._rotate()
+
+    def _get_backup_path(self, path: str, index: int) -> str:
+        return f"{path}.{index}" + (".gz" if self.compress else "")
+
+    def _rotate(self) -> None:
+        file = typing.cast(typing.BinaryIO, self._file)
+        if self.backup_count <= 0:
+            # Like `RotatingFileHandler`, the file is emptied when no backup is kept.
+            file.seek(0)
+            file.truncate()
+            self._opened_at = time.time()
+            return
+        file.close()
+        self._file = None
+        rotated_path = f"{self._path}.{uuid.uuid4().hex}.rotating"
+        os.replace(self._path, rotated_path)
+        self._rotated_paths.append((self._path, rotated_path))
+
+    def _finish_rotations(self) -> None:
+        """
+        Shift the backups and move, or gzip, the rotated files to `path.1` in order of rotation, without holding the lock of the writes.
+        """
+        if not self._rotated_paths:
+            return
+        with self._rotation_lock:
+            while True:
+                with self._lock:
+                    if not self._rotated_paths:
+                        return
+                    path, rotated_path = self._rotated_paths.popleft()
+                for index in range(self.backup_count - 1, 0, -1):
+                    backup_path = self._get_backup_path(path, index)
+                    if os.path.exists(backup_path):
+                        os.replace(backup_path, self._get_backup_path(path, index + 1))
+                if self.compress:
+                    with open(rotated_path, "rb") as source, gzip.open(
+                        self._get_backup_path(path, 1), "wb"
+                    ) as target:
+                        shutil.copyfileobj(source, target)
+                    os.remove(rotated_path)
+                else:
+                    os.replace(rotated_path, self._get_backup_path(path, 1))
+
+
+@lru_cache(maxsize=None)
+def get_json_lines_writer() -> RotatingJsonLinesWriter:
+    """
+    Returns:
+        [RotatingJsonLinesWriter][export.RotatingJsonLinesWriter] of the process configured by [JSON_LINES](../home/settings.md), it is closed at interpreter exit.
+    """
+    json_lines_config = get_config()["JSON_LINES"]
+    writer = RotatingJsonLinesWriter(
+        path=json_lines_config["PATH"],
+        max_bytes=json_lines_config["MAX_BYTES"],
+        rotate_interval=json_lines_config["ROTATE_INTERVAL"],
+        backup_count=json_lines_config["BACKUP_COUNT"],
+        compress=json_lines_config["COMPRESS"],
+        buffer_size=json_lines_config["BUFFER_SIZE"],
+        flush_interval=json_lines_config["FLUSH_INTERVAL"],
+    )
+    atexit.register(writer.close)
+    return writer
+
+
+@receiver(setting_changed)
+def close_json_lines_writer(*, setting, **kwargs):
+    """
+    Close the writer and build a new one when overriding settings.
+    """
+    if setting == "QUERY_CAPTURE":
+        if get_json_lines_writer.cache_info().currsize:
+            get_json_lines_writer().close()
+        get_json_lines_writer.cache_clear()
@@ -0,0 +1,60 @@
+"""
+Fingerprint of SQL, used to group `Similar` queries.<br>
+Queries that differ only in literals, parameters, the length of `IN (...)`/`VALUES (...)` lists, whitespace, comments and identifier quoting have the same fingerprint.
+
+```python
+fingerprint('SELECT "id" FROM "news_reporter" WHERE "id" IN (%s, %s, %s)')
+# 'select id from news_reporter where id in (?+)'
+fingerprint("SELECT id FROM news_reporter  WHERE id = 5 AND full_name = 'ashe'")
+# 'select id from news_reporter where id = ? and full_name = ?'
+```
+"""
+import typing
+
+import re
+from functools import lru_cache
+
+FINGERPRINT_CACHE_SIZE = 4096
+
+TOKEN_REGEX = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<quoted>"(?P<double>(?:[^"]|"")*)"|`(?P<back>(?:[^`]|``)*)`)
+    |(?P<placeholder>%\([^)]*\)s|%s|\?|\$\d+|(?<![:\w]):\w+)
+    |(?P<number>(?<![\w.])(?:0x[0-9a-f]+|\d+(?:\.\d*)?(?:e[+-]?\d+)?|\.\d+(?:e[+-]?\d+)?)(?![\w.]))
+    |(?P<space>\s+)
+    """,
+    re.VERBOSE | re.IGNORECASE | re.DOTALL,
+)
+VALUE_LIST_REGEX = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+REPEATED_VALUE_LIST_REGEX = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+
+
+def _replace_token(match: typing.Match[str]) -> str:
+    kind = match.lastgroup
+    if kind == "space":
+        return " "
+    if kind == "comment":
+        return " "
+    if kind == "quoted":
+        value = match.group("double")
+        if value is None:
+            value = match.group("back")
+        return value.lower()
+    return "?"
+
+
+@lru_cache(maxsize=FINGERPRINT_CACHE_SIZE)
+def fingerprint(sql: str) -> str:
+    """
+    Args:
+        sql: SQL to which parameters are not applied, usually `raw_sql` of [CapturedQuery][capture.CapturedQuery].
+
+    Returns:
+        Normalized SQL, literals and parameters become `?`, and lists of them become `(?+)`.
+    """
+    normalized = TOKEN_REGEX.sub(_replace_token, sql).strip().lower()
+    normalized = VALUE_LIST_REGEX.sub("(?+)", normalized)
+    normalized = REPEATED_VALUE_LIST_REGEX.sub("(?+)", normalized)
+    return re.sub(r" {2,}", " ", normalized)
@@ -0,0 +1,121 @@
+import glob
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from tabulate import tabulate
+
+from django_query_capture.report import SORT_KEYS, build_report
+from django_query_capture.settings import get_config
+from django_query_capture.utils import truncate_string
+
+
+class Command(BaseCommand):
+    help = "Rank the queries of JSON Lines files written by JsonLinesPresenter by total DB time, count or p95."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="JSON Lines files or glob patterns, gzip files end with .gz.",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=SORT_KEYS,
+            default="total_duration",
+            help="Rank by this value.",
+        )
+        parser.add_argument(
+            "--top", type=int, default=20, help="Number of queries to show."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of processes, every CPU by default.",
+        )
+        parser.add_argument(
+            "--relative-accuracy",
+            type=float,
+            default=0.01,
+            help="Relative error of the percentiles.",
+        )
+        parser.add_argument(
+            "--format", choices=("table", "json"), default="table", dest="output_format"
+        )
+
+    def handle(self, *args, **options):
+        paths = []
+        for pattern in options["paths"]:
+            matched_paths = sorted(glob.glob(pattern))
+            if not matched_paths:
+                raise CommandError(f"No file matches {pattern}.")
+            paths.extend(matched_paths)
+
+        query_report = build_report(
+            paths,
+            workers=options["workers"],
+            relative_accuracy=options["relative_accuracy"],
+        )
+        fingerprint_reports = query_report.top(options["sort"], options["top"])
+
+        if options["output_format"] == "json":
+            self.stdout.write(
+                json.dumps(
+                    {
+                        "records": query_report.record_count,
+                        "queries": query_report.query_count,
+                        "total_duration": query_report.total_duration,
+                        "invalid_lines": query_report.invalid_line_count,
+                        "fingerprints": [
+                            {
+                                "fingerprint": fingerprint_report.fingerprint,
+                                "raw_sql": fingerprint_report.raw_sql,
+                                "call_site": fingerprint_report.call_site,
+                                "count": fingerprint_report.count,
+                                "total_duration": fingerprint_report.total_duration,
+                                **fingerprint_report.sketch.percentiles(),
+                            }
+                            for fingerprint_report in fingerprint_reports
+                        ],
+                    }
+                )
+            )
+            return
+
+        self.stdout.write(
+            f"{query_report.record_count} records, {query_report.query_count} queries "
+            f"in {query_report.total_duration:.2f} seconds from {len(paths)} files"
+        )
+        if query_report.invalid_line_count:
+            self.stderr.write(
+                f"{query_report.invalid_line_count} invalid lines were skipped."
+            )
+        self.stdout.write(
+            tabulate(
+                [
+                    [
+                        rank,
+                        fingerprint_report.count,
+                        f"{fingerprint_report.total_duration:.3f}",
+                        *(
+                            f"{value * 1000:.2f}"
+                            for value in fingerprint_report.sketch.percentiles().values()
+                        ),
+                        fingerprint_report.call_site,
+                        truncate_string(fingerprint_report.fingerprint, 80),
+                    ]
+                    for rank, fingerprint_report in enumerate(fingerprint_reports, 1)
+                ],
+                [
+                    "rank",
+                    "count",
+                    "total_duration",
+                    "p50 (ms)",
+                    "p95 (ms)",
+                    "p99 (ms)",
+                    "call_site",
+                    "fingerprint",
+                ],
+                tablefmt=get_config()["PRETTY"]["TABLE_FORMAT"],
+            )
+        )
@@ -0,0 +1,694 @@
+"""
+OpenMetrics exposition of the statistics of [QueryCaptureMiddleware][middleware.QueryCaptureMiddleware], when ENABLED of [METRICS](../home/settings.md).<br>
+Metrics are pre-aggregated in a [MetricsRegistry][metrics.MetricsRegistry], and each metric keeps at most `MAX_SERIES` label sets,
+further label sets are counted with every label set to `other`.<br>
+With `MULTIPROCESS_DIR`, e.g. under gunicorn, each process writes its registry to a file in the directory,
+and [metrics_view][metrics.metrics_view] and [metrics_app][metrics.metrics_app] merge the files of every process.
+[mark_process_dead][metrics.mark_process_dead] merges the files of exited processes into one file, so the directory does not grow with restarted workers.
+
+```python
+# urls.py
+from django_query_capture.metrics import metrics_view
+
+urlpatterns = [path("metrics", metrics_view)]
+```
+"""
+import typing
+
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from django_query_capture.capture import CapturedQuery
+from django_query_capture.classify import ClassifiedQuery
+from django_query_capture.settings import get_config
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRIC_PREFIX = "django_query_capture_"
+OTHER_LABEL_VALUE = "other"
+MULTIPROCESS_FILE_PREFIX = "django_query_capture_"
+MULTIPROCESS_DEAD_FILE = f"{MULTIPROCESS_FILE_PREFIX}dead.json"
+VERBS = frozenset(
+    (
+        "SELECT",
+        "INSERT",
+        "UPDATE",
+        "DELETE",
+        "WITH",
+        "SAVEPOINT",
+        "RELEASE",
+        "ROLLBACK",
+        "BEGIN",
+        "COMMIT",
+    )
+)
+
+LabelValues = typing.Tuple[str, ...]
+
+
+@lru_cache(maxsize=4096)
+def get_verb(raw_sql: str) -> str:
+    """
+    Args:
+        raw_sql: SQL of the query.
+
+    Returns:
+        The first keyword of `raw_sql` such as `SELECT`, or `OTHER`, so that the label has a few values only.
+    """
+    words = raw_sql.split(None, 1)
+    verb = words[0].upper() if words else ""
+    return verb if verb in VERBS else "OTHER"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(
+    label_names: typing.Sequence[str],
+    label_values: typing.Sequence[str],
+    extra: str = "",
+) -> str:
+    labels = [
+        f'{name}="{escape_label_value(value)}"'
+        for name, value in zip(label_names, label_values)
+    ]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base of the metrics of [MetricsRegistry][metrics.MetricsRegistry], values are kept by label values.
+    """
+
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: typing.Sequence[str],
+        max_series: int,
+    ):
+        """
+        Args:
+            name: Name without the prefix and the suffix, e.g. `queries`.
+            documentation: `# HELP` of the metric.
+            label_names: Names of the labels.
+            max_series: Maximum number of label sets, further label sets are counted in `other`.
+        """
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.max_series = max_series
+        self.values: typing.Dict[LabelValues, typing.Any] = {}
+
+    def get_series_key(self, label_values: LabelValues) -> LabelValues:
+        if label_values in self.values or len(self.values) < self.max_series:
+            return label_values
+        return (OTHER_LABEL_VALUE,) * len(self.label_names)
+
+    def expose(self) -> typing.List[str]:
+        raise NotImplementedError
+
+    def to_dict(self) -> typing.List[typing.Any]:
+        return [
+            [list(label_values), value] for label_values, value in self.values.items()
+        ]
+
+    def merge_dict(self, data: typing.List[typing.Any]) -> None:
+        raise NotImplementedError
+
+
+class CounterMetric(Metric):
+    type = "counter"
+
+    def inc(self, label_values: LabelValues, amount: float = 1) -> None:
+        key = self.get_series_key(label_values)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def merge_dict(self, data: typing.List[typing.Any]) -> None:
+        for label_values, value in data:
+            self.inc(tuple(label_values), value)
+
+    def expose(self) -> typing.List[str]:
+        return [
+            f"{self.name}_total{format_labels(self.label_names, label_values)} {format_value(value)}"
+            for label_values, value in self.values.items()
+        ]
+
+
+class HistogramMetric(Metric):
+    """
+    Values are `[count of each bucket..., count of +Inf, sum]`, the counts are not cumulative until exposed.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: typing.Sequence[str],
+        max_series: int,
+        buckets: typing.Sequence[float],
+    ):
+        """
+        Args:
+            name: Name without the prefix and the suffix, e.g. `queries`.
+            documentation: `# HELP` of the metric.
+            label_names: Names of the labels.
+            max_series: Maximum number of label sets, further label sets are counted in `other`.
+            buckets: Upper bounds of the buckets in ascending order, `+Inf` is added.
+        """
+        super().__init__(name, documentation, label_names, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def _get_values(self, label_values: LabelValues) -> typing.List[float]:
+        key = self.get_series_key(label_values)
+        values = self.values.get(key)
+        if values is None:
+            values = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        return values
+
+    def observe(self, label_values: LabelValues, value: float) -> None:
+        values = self._get_values(label_values)
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                break
+        else:
+            index = len(self.buckets)
+        values[index] += 1
+        values[-1] += value
+
+    def merge_dict(self, data: typing.List[typing.Any]) -> None:
+        for label_values, other_values in data:
+            if len(other_values) != len(self.buckets) + 2:
+                continue
+            values = self._get_values(tuple(label_values))
+            for index, value in enumerate(other_values):
+                values[index] += value
+
+    def expose(self) -> typing.List[str]:
+        lines = []
+        for label_values, values in self.values.items():
+            cumulative_count = 0
+            for upper_bound, count in zip(self.buckets + (math.inf,), values):
+                cumulative_count += count
+                le = f'le="{format_value(upper_bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{format_labels(self.label_names, label_values, le)} {cumulative_count}"
+                )
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_count{labels} {cumulative_count}")
+            lines.append(f"{self.name}_sum{labels} {format_value(values[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Pre-aggregated metrics of captured requests.
+
+    - `queries`: counter by `alias`, `verb`, `endpoint` and `method`.
+    - `query_duration_seconds`: histogram of the duration of each query by `alias`.
+    - `request_db_time_seconds`: histogram of the DB time of each request by `endpoint` and `method`.
+    - `requests`, `duplicate_queries`, `similar_queries`, `slow_queries`: counters by `endpoint` and `method`.
+      Duplicate and similar queries count every query that repeats an earlier one.
+    """
+
+    def __init__(self, max_series: int = 1000, buckets: typing.Sequence[float] = ()):
+        """
+        Args:
+            max_series: Maximum number of label sets of each metric.
+            buckets: Upper bounds of the buckets of histograms.
+        """
+        self._lock = threading.Lock()
+        endpoint_labels = ("endpoint", "method")
+        self.queries = CounterMetric(
+            "queries",
+            "Captured queries.",
+            ("alias", "verb") + endpoint_labels,
+            max_series,
+        )
+        self.query_duration_seconds = HistogramMetric(
+            "query_duration_seconds",
+            "Duration of each query.",
+            ("alias",),
+            max_series,
+            buckets,
+        )
+        self.request_db_time_seconds = HistogramMetric(
+            "request_db_time_seconds",
+            "Duration of every query of a request.",
+            endpoint_labels,
+            max_series,
+            buckets,
+        )
+        self.requests = CounterMetric(
+            "requests", "Captured requests.", endpoint_labels, max_series
+        )
+        self.duplicate_queries = CounterMetric(
+            "duplicate_queries",
+            "Queries that repeat an earlier query of the request with the same parameters.",
+            endpoint_labels,
+            max_series,
+        )
+        self.similar_queries = CounterMetric(
+            "similar_queries",
+            "Queries that repeat an earlier query of the request with other parameters.",
+            endpoint_labels,
+            max_series,
+        )
+        self.slow_queries = CounterMetric(
+            "slow_queries",
+            "Queries slower than SLOW_MIN_SECOND.",
+            endpoint_labels,
+            max_series,
+        )
+        self.metrics: typing.Dict[str, Metric] = {
+            metric.name: metric
+            for metric in (
+                self.queries,
+                self.query_duration_seconds,
+                self.request_db_time_seconds,
+                self.requests,
+                self.duplicate_queries,
+                self.similar_queries,
+                self.slow_queries,
+            )
+        }
+
+    def record(
+        self,
+        endpoint: str,
+        method: str,
+        classified_query: ClassifiedQuery,
+        captured_queries: typing.Iterable[CapturedQuery],
+    ) -> None:
+        """
+        Args:
+            endpoint: Route of the request, see [get_endpoint_key][aggregate.get_endpoint_key].
+            method: HTTP method.
+            classified_query: [ClassifiedQuery][classify.ClassifiedQuery] of the request.
+            captured_queries: [CapturedQuery][capture.CapturedQuery]s of the request that are not ignored.
+        """
+        endpoint_label_values = (endpoint, method)
+        with self._lock:
+            db_time = 0.0
+            for captured_query in captured_queries:
+                alias = captured_query["alias"]
+                duration = captured_query["duration"]
+                db_time += duration
+                self.queries.inc(
+                    (alias, get_verb(captured_query["raw_sql"]), endpoint, method)
+                )
+                self.query_duration_seconds.observe((alias,), duration)
+            self.request_db_time_seconds.observe(endpoint_label_values, db_time)
+            self.requests.inc(endpoint_label_values)
+            self.duplicate_queries.inc(
+                endpoint_label_values,
+                sum(
+                    count - 1
+                    for count in classified_query["duplicates_counter"].values()
+                    if count > 1
+                ),
+            )
+            self.similar_queries.inc(
+                endpoint_label_values,
+                sum(
+                    count - 1
+                    for count in classified_query["similar_counter"].values()
+                    if count > 1
+                ),
+            )
+            self.slow_queries.inc(
+                endpoint_label_values, len(classified_query["slow_captured_queries"])
+            )
+
+    def reset(self) -> None:
+        """
+        Empty every metric, e.g. in a forked process, where the lock may have been held by another thread of the parent.
+        """
+        self._lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric.values = {}
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {name: metric.to_dict() for name, metric in self.metrics.items()}
+
+    def merge_dict(self, data: typing.Mapping[str, typing.Any]) -> None:
+        """
+        Args:
+            data: Result of [to_dict][metrics.MetricsRegistry.to_dict], e.g. of another process.
+        """
+        with self._lock:
+            for name, metric_data in data.items():
+                metric = self.metrics.get(name)
+                if metric is not None:
+                    metric.merge_dict(metric_data)
+
+    def expose(self) -> str:
+        """
+        Returns:
+            Metrics in the OpenMetrics text format.
+        """
+        lines = []
+        with self._lock:
+            for metric in self.metrics.values():
+                lines.append(f"# TYPE {metric.name} {metric.type}")
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.extend(metric.expose())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def write_json_atomically(directory: str, path: str, data: typing.Any) -> None:
+    """
+    Replace `path` with `data`, so a scrape never reads half a file.
+    """
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix=".tmp_", suffix=".json"
+    )
+    with os.fdopen(file_descriptor, "w") as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
+
+
+def is_process_file(file_name: str) -> bool:
+    return (
+        file_name.startswith(MULTIPROCESS_FILE_PREFIX)
+        and file_name.endswith(".json")
+        and file_name != MULTIPROCESS_DEAD_FILE
+    )
+
+
+class MultiProcessWriter:
+    """
+    Write the registry of the process to `MULTIPROCESS_DIR`, at most every `flush_interval` seconds and at interpreter exit.<br>
+    A record within `flush_interval` of the last write schedules a write at the end of the interval,
+    so a process that goes idle does not leave its last requests out of the exposition.<br>
+    The file is named by the pid and a random token of the process, so a process that reuses the pid of an exited process never replaces its counters.
+    """
+
+    def __init__(
+        self, registry: MetricsRegistry, directory: str, flush_interval: float
+    ):
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._last_flush = -math.inf
+        self._lock = threading.Lock()
+        self._timer: typing.Optional[threading.Timer] = None
+        self._pid: typing.Optional[int] = None
+        self._path = ""
+
+    def _check_process(self) -> None:
+        # The pid is read on every write, the writer may be inherited by a forked worker.
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            # The timer thread of the parent does not exist in a forked worker.
+            self._timer = None
+            self._path = os.path.join(
+                self.directory,
+                f"{MULTIPROCESS_FILE_PREFIX}{pid}_{uuid.uuid4().hex}.json",
+            )
+
+    @property
+    def path(self) -> str:
+        self._check_process()
+        return self._path
+
+    def maybe_flush(self) -> None:
+        remaining = self._last_flush + self.flush_interval - time.monotonic()
+        if remaining <= 0:
+            self.flush()
+            return
+        with self._lock:
+            self._check_process()
+            if self._timer is None:
+                self._timer = threading.Timer(remaining, self._flush_later)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_later(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def flush(self) -> None:
+        with self._lock:
+            path = self.path
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._last_flush = time.monotonic()
+            write_json_atomically(self.directory, path, self.registry.to_dict())
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def reset(self) -> None:
+        """
+        Forget the lock and the timer of the parent in a forked process, the file is renamed by the next write.
+        """
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_flush = -math.inf
+
+
+def read_dead_file(directory: str, registry: MetricsRegistry) -> typing.Set[str]:
+    """
+    Merge the file of [mark_process_dead][metrics.mark_process_dead] into `registry`.
+
+    Returns:
+        Names of the process files that are merged in the file, they are skipped until they are removed.
+    """
+    try:
+        with open(os.path.join(directory, MULTIPROCESS_DEAD_FILE)) as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return set()
+    registry.merge_dict(data["metrics"])
+    return set(data["merged"])
+
+
+def get_dead_file_stat(directory: str) -> typing.Optional[typing.Tuple[int, int]]:
+    try:
+        stat = os.stat(os.path.join(directory, MULTIPROCESS_DEAD_FILE))
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def collect_multiprocess(directory: str) -> MetricsRegistry:
+    """
+    Args:
+        directory: `MULTIPROCESS_DIR`.
+
+    Returns:
+        [MetricsRegistry][metrics.MetricsRegistry] that merged the files of every process, including exited processes so that counters never go down.
+    """
+    metrics_config = get_config()["METRICS"]
+    while True:
+        # Read again if an exited process is merged meanwhile, its file may be removed before it is read.
+        dead_file_stat = get_dead_file_stat(directory)
+        registry = MetricsRegistry(
+            metrics_config["MAX_SERIES"], metrics_config["DURATION_BUCKETS"]
+        )
+        merged_file_names = read_dead_file(directory, registry)
+        for file_name in sorted(os.listdir(directory)):
+            if not is_process_file(file_name) or file_name in merged_file_names:
+                continue
+            try:
+                with open(os.path.join(directory, file_name)) as file:
+                    registry.merge_dict(json.load(file))
+            except (OSError, ValueError):
+                continue
+        if get_dead_file_stat(directory) == dead_file_stat:
+            return registry
+
+
+def mark_process_dead(pid: int, directory: typing.Optional[str] = None) -> None:
+    """
+    Merge the files of an exited process into the file of every exited process and remove them, like `mark_process_dead` of `prometheus_client`.<br>
+    Call it from one process only, e.g. the `child_exit` hook of gunicorn.
+
+    ```python
+    # gunicorn.conf.py
+    from django_query_capture.metrics import mark_process_dead
+
+    def child_exit(server, worker):
+        mark_process_dead(worker.pid)
+    ```
+
+    Args:
+        pid: pid of the exited process.
+        directory: `MULTIPROCESS_DIR` of the settings by default.
+    """
+    if directory is None:
+        directory = get_config()["METRICS"]["MULTIPROCESS_DIR"]
+    metrics_config = get_config()["METRICS"]
+    registry = MetricsRegistry(
+        metrics_config["MAX_SERIES"], metrics_config["DURATION_BUCKETS"]
+    )
+    merged_file_names = read_dead_file(directory, registry)
+    file_names = set(os.listdir(directory))
+    process_prefix = f"{MULTIPROCESS_FILE_PREFIX}{pid}_"
+    dead_file_names = [
+        file_name
+        for file_name in sorted(file_names)
+        if is_process_file(file_name)
+        and file_name.startswith(process_prefix)
+        and file_name not in merged_file_names
+    ]
+    if not dead_file_names:
+        return
+    for file_name in dead_file_names:
+        try:
+            with open(os.path.join(directory, file_name)) as file:
+                registry.merge_dict(json.load(file))
+        except (OSError, ValueError):
+            continue
+    write_json_atomically(
+        directory,
+        os.path.join(directory, MULTIPROCESS_DEAD_FILE),
+        {
+            # Removed files need not be skipped anymore.
+            "merged": sorted(merged_file_names & file_names) + dead_file_names,
+            "metrics": registry.to_dict(),
+        },
+    )
+    for file_name in dead_file_names:
+        try:
+            os.remove(os.path.join(directory, file_name))
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def get_metrics_registry() -> MetricsRegistry:
+    """
+    Returns:
+        [MetricsRegistry][metrics.MetricsRegistry] of the process, configured by [METRICS](../home/settings.md).
+    """
+    metrics_config = get_config()["METRICS"]
+    return MetricsRegistry(
+        metrics_config["MAX_SERIES"], metrics_config["DURATION_BUCKETS"]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_multiprocess_writer() -> typing.Optional[MultiProcessWriter]:
+    """
+    Returns:
+        [MultiProcessWriter][metrics.MultiProcessWriter] of the process if `MULTIPROCESS_DIR` is set.
+    """
+    metrics_config = get_config()["METRICS"]
+    if not metrics_config["MULTIPROCESS_DIR"]:
+        return None
+    writer = MultiProcessWriter(
+        get_metrics_registry(),
+        metrics_config["MULTIPROCESS_DIR"],
+        metrics_config["FLUSH_INTERVAL"],
+    )
+    atexit.register(writer.close)
+    return writer
+
+
+def reset_after_fork() -> None:
+    """
+    Empty the registry inherited by a forked worker, e.g. from a gunicorn master with `preload_app`.
+    Otherwise the worker writes the counts of the parent to its own file, and they are counted again by every worker.
+    """
+    if get_metrics_registry.cache_info().currsize:
+        get_metrics_registry().reset()
+    if get_multiprocess_writer.cache_info().currsize:
+        writer = get_multiprocess_writer()
+        if writer is not None:
+            writer.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+
+def record_request(
+    endpoint: str,
+    method: str,
+    classified_query: ClassifiedQuery,
+    captured_queries: typing.Iterable[CapturedQuery],
+) -> None:
+    """
+    Record a captured request in [get_metrics_registry()][metrics.get_metrics_registry], and write it for other processes if `MULTIPROCESS_DIR` is set.
+    """
+    get_metrics_registry().record(endpoint, method, classified_query, captured_queries)
+    writer = get_multiprocess_writer()
+    if writer is not None:
+        writer.maybe_flush()
+
+
+def generate_latest() -> str:
+    """
+    Returns:
+        The OpenMetrics text of the process, or of every process if `MULTIPROCESS_DIR` is set.
+    """
+    writer = get_multiprocess_writer()
+    if writer is None:
+        return get_metrics_registry().expose()
+    writer.flush()
+    return collect_multiprocess(writer.directory).expose()
+
+
+def metrics_view(request) -> HttpResponse:
+    """
+    Django view that returns [generate_latest()][metrics.generate_latest].
+    """
+    return HttpResponse(generate_latest(), content_type=CONTENT_TYPE)
+
+
+def metrics_app(environ, start_response) -> typing.List[bytes]:
+    """
+    WSGI app that returns [generate_latest()][metrics.generate_latest], e.g. to serve the metrics on another port.
+    """
+    body = generate_latest().encode("utf-8")
+    start_response(
+        "200 OK",
+        [("Content-Type", CONTENT_TYPE), ("Content-Length", str(len(body)))],
+    )
+    return [body]
+
+
+@receiver(setting_changed)
+def clear_metrics_registry(*, setting, **kwargs):
+    """
+    Build a new registry when overriding settings.
+    """
+    if setting == "QUERY_CAPTURE":
+        get_metrics_registry.cache_clear()
+        get_multiprocess_writer.cache_clear()
@@ -1,17 +1,257 @@
 """
 Middleware using [query_capture][decorators.query_capture] available in django
 """
+import typing
+
+import asyncio
+import random
+import re
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import Resolver404, resolve
+
 from django_query_capture import query_capture
+from django_query_capture.aggregate import (
+    UNRESOLVED_ROUTE,
+    get_endpoint_aggregator,
+    get_endpoint_key,
+)
+from django_query_capture.export import request_id
+from django_query_capture.metrics import record_request
+from django_query_capture.output import present
+from django_query_capture.settings import get_config, get_route_config
+
+
+@lru_cache(maxsize=32)
+def compile_url_sample_rates(
+    url_sample_rates: typing.Tuple[typing.Tuple[str, float], ...]
+) -> typing.List[typing.Tuple[typing.Pattern[str], float]]:
+    """
+    Args:
+        url_sample_rates: Pairs of URL regex and sample rate from [URL_SAMPLE_RATES](../home/settings.md).
+
+    Returns:
+        Compiled pairs, in the same order.
+    """
+    return [(re.compile(pattern), rate) for pattern, rate in url_sample_rates]
+
+
+def get_header_meta_key(header: str) -> str:
+    """
+    Args:
+        header: HTTP header name, e.g. `X-Query-Capture`.
+
+    Returns:
+        Key of `request.META`, e.g. `HTTP_X_QUERY_CAPTURE`.
+    """
+    return "HTTP_" + header.upper().replace("-", "_")
+
+
+def get_request_id(request) -> str:
+    """
+    Args:
+        request: `HttpRequest`
+
+    Returns:
+        The `REQUEST_ID_HEADER` header of [JSON_LINES](../home/settings.md) if the request has it, e.g. from a load balancer, otherwise a new id.
+    """
+    header = get_config()["JSON_LINES"]["REQUEST_ID_HEADER"]
+    if header:
+        value = request.META.get(get_header_meta_key(header))
+        if value:
+            return value
+    return uuid.uuid4().hex
+
+
+ROUTE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def resolve_route(
+    path_info: str, urlconf: typing.Any
+) -> typing.Tuple[str, typing.Optional[str]]:
+    """
+    Paths are kept in a bounded LRU cache, so a path requested before is not resolved again.
+
+    Args:
+        path_info: `request.path_info`
+        urlconf: `request.urlconf` or `ROOT_URLCONF`.
+
+    Returns:
+        `(route, view_name)` of the path, `route` is `<unresolved>` if no URL pattern matches.
+    """
+    try:
+        resolver_match = resolve(path_info, urlconf)
+    except Resolver404:
+        return UNRESOLVED_ROUTE, None
+    return resolver_match.route, resolver_match.view_name
+
+
+@receiver(setting_changed)
+def clear_resolved_routes(*, setting, **kwargs):
+    """
+    Resolve paths again when overriding the URLconf.
+    """
+    if setting == "ROOT_URLCONF":
+        resolve_route.cache_clear()
+
+
+def get_request_config(request) -> typing.Mapping[str, typing.Any]:
+    """
+    Args:
+        request: `HttpRequest` that has not been resolved yet.
+
+    Returns:
+        [get_route_config][settings.get_route_config] of the route of the request if [RULES](../home/settings.md) are set, otherwise [get_config][settings.get_config].<br>
+        The route is needed before the view, because the thresholds are used while the queries are captured.
+        It is taken from [resolve_route][middleware.resolve_route] and the settings from [get_route_config][settings.get_route_config], both cached,
+        so a path requested before costs two dict lookups.
+    """
+    config = get_config()
+    if not config["RULES"]:
+        return config
+    route, view_name = resolve_route(
+        request.path_info, getattr(request, "urlconf", None) or settings.ROOT_URLCONF
+    )
+    return get_route_config(route, view_name)
+
+
+def markcoroutinefunction(func: typing.Any) -> typing.Any:
+    """
+    Mark `func` so that `asyncio.iscoroutinefunction` is `True`, like `asgiref.sync.markcoroutinefunction` which older asgiref doesn't have.
+    """
+    try:
+        from asgiref.sync import markcoroutinefunction as asgiref_markcoroutinefunction
+    except ImportError:
+        func._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore
+        return func
+    return asgiref_markcoroutinefunction(func)
 
 
 class QueryCaptureMiddleware:
     """
-    Capture all queries that occur when one request occurs and output them to the console.
+    Capture all queries that occur when one request occurs and output them to the console.<br>
+    With [MIDDLEWARE](../home/settings.md) settings, only a sample of requests can be captured,
+    and with `TAIL_BASED`, only requests that went over the thresholds are output.<br>
+    With [RULES](../home/settings.md), the thresholds, the Presenter and the ignore patterns are those of the route of the request.<br>
+    With [AGGREGATE](../home/settings.md), captured requests are also added to the [EndpointAggregator][aggregate.EndpointAggregator] of the process,
+    and with [METRICS](../home/settings.md), to the [MetricsRegistry][metrics.MetricsRegistry].<br>
+    It is both sync and async capable. Under ASGI the capture follows the request through `contextvars`,
+    so queries run by `sync_to_async` are captured and concurrent requests are not mixed.<br>
+    The request id is kept in [request_id][export.request_id] while the request is captured, e.g. for [JsonLinesPresenter][presenter.json_lines.JsonLinesPresenter].
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def should_capture(self, request) -> bool:
+        """
+        Args:
+            request: `HttpRequest`
+
+        Returns:
+            Whether to capture the request, by the sample rate of the first matching `URL_SAMPLE_RATES`, or `SAMPLE_RATE`.<br>
+            A request that has the `FORCE_HEADER` header is always captured.
+        """
+        middleware_config = get_config()["MIDDLEWARE"]
+        sample_rate = middleware_config["SAMPLE_RATE"]
+        if middleware_config["URL_SAMPLE_RATES"]:
+            for regex, rate in compile_url_sample_rates(
+                tuple(middleware_config["URL_SAMPLE_RATES"].items())
+            ):
+                if regex.search(request.path_info):
+                    sample_rate = rate
+                    break
+        if sample_rate >= 1:
+            return True
+        force_header = middleware_config["FORCE_HEADER"]
+        if force_header and get_header_meta_key(force_header) in request.META:
+            return True
+        return sample_rate > 0 and random.random() < sample_rate  # nosec
+
+    @staticmethod
+    def get_capture(request) -> query_capture:
+        """
+        Args:
+            request: `HttpRequest`
+
+        Returns:
+            [query_capture][decorators.query_capture] with the settings of [get_request_config][middleware.get_request_config].
+        """
+        config = get_request_config(request)
+        return query_capture(
+            ignore_output=config["MIDDLEWARE"]["TAIL_BASED"],
+            ignore_patterns=config["IGNORE_SQL_PATTERNS"],
+            print_thresholds=config["PRINT_THRESHOLDS"],
+            presenter=config["PRESENTER"],
+        )
 
-    @query_capture()
     def __call__(self, request):
-        return self.get_response(request)
+        if self.is_async:
+            return self.__acall__(request)
+
+        if not self.should_capture(request):
+            return self.get_response(request)
+
+        capture = self.get_capture(request)
+        token = request_id.set(get_request_id(request))
+        try:
+            with capture:
+                response = self.get_response(request)
+            self.finish_capture(request, capture)
+        finally:
+            request_id.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        if not self.should_capture(request):
+            return await self.get_response(request)
+
+        capture = self.get_capture(request)
+        token = request_id.set(get_request_id(request))
+        try:
+            with capture:
+                response = await self.get_response(request)
+            self.finish_capture(request, capture)
+        finally:
+            request_id.reset(token)
+        return response
+
+    @staticmethod
+    def finish_capture(request, capture: query_capture) -> None:
+        """
+        With `TAIL_BASED`, the output was skipped, and it is only output if the request went over the thresholds.<br>
+        With ENABLED of `AGGREGATE` or `METRICS`, the queries that are not ignored are recorded by the endpoint of the request.
+
+        Args:
+            request: `HttpRequest` that has been resolved.
+            capture: [query_capture][decorators.query_capture] that has exited.
+        """
+        if capture.ignore_output and capture.classifier["has_over_threshold"]:
+            present(capture.presenter_cls, capture.classifier)
+        aggregate_enabled = get_config()["AGGREGATE"]["ENABLED"]
+        metrics_enabled = get_config()["METRICS"]["ENABLED"]
+        if not (aggregate_enabled or metrics_enabled):
+            return
+
+        is_allow_pattern = capture.captured_query_classifier.is_allow_pattern
+        captured_queries = [
+            captured_query
+            for captured_query in capture.classifier["captured_queries"]
+            if is_allow_pattern(captured_query["raw_sql"])
+        ]
+        route, method = get_endpoint_key(request)
+        if aggregate_enabled:
+            get_endpoint_aggregator().record(route, method, captured_queries)
+        if metrics_enabled:
+            record_request(route, method, capture.classifier, captured_queries)
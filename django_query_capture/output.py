@@ -0,0 +1,201 @@
+"""
+Output of [ClassifiedQuery][classify.ClassifiedQuery] through the Presenter.<br>
+With [ASYNC_OUTPUT](../home/settings.md), the Presenter runs on a background thread, so formatting and printing are not added to the response time.
+"""
+import typing
+
+import atexit
+import contextvars
+import sys
+import threading
+import traceback
+from collections import Counter, deque
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from django_query_capture.classify import ClassifiedQuery
+from django_query_capture.presenter import BasePresenter
+from django_query_capture.settings import get_config
+
+
+def snapshot_classified_query(classified_query: ClassifiedQuery) -> ClassifiedQuery:
+    """
+    Args:
+        classified_query: [ClassifiedQuery][classify.ClassifiedQuery] that may still be updated by the classifier.
+
+    Returns:
+        Copy of `classified_query` whose lists, counters and dicts are not shared with the classifier.
+    """
+    snapshot = typing.cast(ClassifiedQuery, dict(classified_query))
+    for key in (
+        "captured_queries",
+        "slow_captured_queries",
+        "unbounded_captured_queries",
+        "anomalous_captured_queries",
+    ):
+        snapshot[key] = list(classified_query[key])  # type: ignore
+    for key in (
+        "duplicates_counter",
+        "duplicates_counter_over_threshold",
+        "similar_counter",
+        "similar_counter_over_threshold",
+    ):
+        snapshot[key] = Counter(classified_query[key])  # type: ignore
+    snapshot["alias_stats"] = {
+        alias: typing.cast(typing.Any, dict(alias_stats))
+        for alias, alias_stats in classified_query["alias_stats"].items()
+    }
+    snapshot["query_plans"] = {
+        key: typing.cast(typing.Any, dict(query_plan))
+        for key, query_plan in classified_query["query_plans"].items()
+    }
+    return snapshot
+
+
+class BackgroundPresenterWriter:
+    """
+    A daemon thread that runs Presenters handed over by [submit][output.BackgroundPresenterWriter.submit].<br>
+    The queue is bounded, when it is full the oldest output is dropped and counted in `dropped_count`.
+    """
+
+    def __init__(self, queue_size: int):
+        """
+        Args:
+            queue_size: Maximum number of outputs waiting to be printed.
+        """
+        self.queue_size = queue_size
+        self.dropped_count = 0
+        self._queue: typing.Deque[
+            typing.Tuple[
+                typing.Type[BasePresenter], ClassifiedQuery, contextvars.Context
+            ]
+        ] = deque()
+        self._condition = threading.Condition()
+        self._running_count = 0
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="django-query-capture-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        presenter_cls: typing.Type[BasePresenter],
+        classified_query: ClassifiedQuery,
+    ) -> None:
+        """
+        The Presenter runs in a copy of the current context, so it can read context variables such as the request id.
+
+        Args:
+            presenter_cls: Presenter to print `classified_query` with.
+            classified_query: [ClassifiedQuery][classify.ClassifiedQuery], a snapshot of it is queued.
+        """
+        snapshot = snapshot_classified_query(classified_query)
+        context = contextvars.copy_context()
+        with self._condition:
+            if len(self._queue) >= self.queue_size:
+                self._queue.popleft()
+                self.dropped_count += 1
+            self._queue.append((presenter_cls, snapshot, context))
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                presenter_cls, classified_query, context = self._queue.popleft()
+                self._running_count += 1
+            try:
+                context.run(presenter_cls(classified_query).print)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self._condition:
+                    self._running_count -= 1
+                    self._condition.notify_all()
+
+    def flush(self, timeout: typing.Optional[float] = None) -> bool:
+        """
+        Wait until every queued output is printed.
+
+        Args:
+            timeout: Seconds to wait, `None` waits forever.
+
+        Returns:
+            `True` if everything is printed.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._running_count, timeout
+            )
+
+    def close(self, timeout: typing.Optional[float] = None) -> None:
+        """
+        Print what is left and stop the thread, and report dropped outputs to stderr.
+
+        Args:
+            timeout: Seconds to wait for the thread.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        if self.dropped_count:
+            print(
+                f"django_query_capture: {self.dropped_count} outputs were dropped because ASYNC_OUTPUT QUEUE_SIZE was exceeded.",
+                file=sys.stderr,
+            )
+
+
+_background_writer: typing.Optional[BackgroundPresenterWriter] = None
+_background_writer_lock = threading.Lock()
+
+
+def get_background_writer() -> BackgroundPresenterWriter:
+    """
+    Returns:
+        [BackgroundPresenterWriter][output.BackgroundPresenterWriter] shared by the process, it is started on first use and closed at interpreter exit.
+    """
+    global _background_writer
+    if _background_writer is None:
+        with _background_writer_lock:
+            if _background_writer is None:
+                _background_writer = BackgroundPresenterWriter(
+                    get_config()["ASYNC_OUTPUT"]["QUEUE_SIZE"]
+                )
+                atexit.register(_background_writer.close)
+    return _background_writer
+
+
+@receiver(setting_changed)
+def close_background_writer(*, setting, **kwargs):
+    """
+    Close the writer and build a new one when overriding settings, e.g. for another QUEUE_SIZE.
+    """
+    global _background_writer
+    if setting == "QUERY_CAPTURE":
+        with _background_writer_lock:
+            background_writer, _background_writer = _background_writer, None
+        if background_writer is not None:
+            atexit.unregister(background_writer.close)
+            background_writer.close()
+
+
+def present(
+    presenter_cls: typing.Type[BasePresenter], classified_query: ClassifiedQuery
+) -> None:
+    """
+    Print `classified_query` with `presenter_cls`, on the background thread if ENABLED of [ASYNC_OUTPUT](../home/settings.md).
+
+    Args:
+        presenter_cls: Class that inherited [BasePresenter][presenter.base.BasePresenter].
+        classified_query: [ClassifiedQuery][classify.ClassifiedQuery]
+    """
+    if get_config()["ASYNC_OUTPUT"]["ENABLED"]:
+        get_background_writer().submit(presenter_cls, classified_query)
+    else:
+        presenter_cls(classified_query).print()
@@ -1,4 +1,5 @@
 from django_query_capture.presenter.base import BasePresenter
+from django_query_capture.presenter.json_lines import JsonLinesPresenter
 from django_query_capture.presenter.only_slow_query import OnlySlowQueryPresenter
 from django_query_capture.presenter.pretty import PrettyPresenter
 from django_query_capture.presenter.raw_line import RawLinePresenter
@@ -10,4 +11,5 @@ __all__ = [
     "PrettyPresenter",
     "SimplePresenter",
     "OnlySlowQueryPresenter",
+    "JsonLinesPresenter",
 ]
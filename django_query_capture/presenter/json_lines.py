@@ -0,0 +1,16 @@
+from django_query_capture.export import (
+    get_json_lines_writer,
+    serialize_classified_query,
+)
+
+from .base import BasePresenter
+
+
+class JsonLinesPresenter(BasePresenter):
+    """
+    Write the [ClassifiedQuery][classify.ClassifiedQuery] and every query as one JSON Lines record instead of printing it, for offline analysis.<br>
+    The file, rotation and buffering are set by [JSON_LINES](../../home/settings.md), see [serialize_classified_query][export.serialize_classified_query] for the record.
+    """
+
+    def print(self) -> None:
+        get_json_lines_writer().write(serialize_classified_query(self.classified_query))
@@ -1,12 +1,10 @@
-import sqlparse
-from pygments import highlight
-from pygments.formatters.terminal256 import TerminalTrueColorFormatter
-from pygments.lexers.sql import SqlLexer
 from tabulate import tabulate
 
+from django_query_capture.capture import CapturedQuery
+from django_query_capture.explain import get_query_plan_key
 from django_query_capture.presenter.base import BasePresenter
 from django_query_capture.settings import get_config
-from django_query_capture.utils import colorize, get_stack_prefix
+from django_query_capture.utils import colorize, get_stack_prefix, highlight_sql
 
 
 class PrettyPresenter(BasePresenter):
@@ -19,15 +17,25 @@ class PrettyPresenter(BasePresenter):
 
     @staticmethod
     def print_sql(sql: str) -> None:
+        print(highlight_sql(sql, get_config()["PRETTY"]["SQL_COLOR_FORMAT"]))
+
+    def print_query_plan(self, captured_query: CapturedQuery) -> None:
+        """
+        Print the plan of the query taken with [EXPLAIN](../../home/settings.md), lines that scan a whole table are marked as warnings.
+        """
+        query_plan = self.classified_query["query_plans"].get(
+            get_query_plan_key(captured_query)
+        )
+        if query_plan is None:
+            return
         print(
-            highlight(
-                sqlparse.format(sql, reindent=True, keyword_case="upper"),
-                SqlLexer(),
-                TerminalTrueColorFormatter(
-                    style=get_config()["PRETTY"]["SQL_COLOR_FORMAT"]
-                ),
+            colorize(
+                f"Plan{' (full scan)' if query_plan['full_scans'] else ''}:",
+                bool(query_plan["full_scans"]),
             )
         )
+        for line in query_plan["plan"]:
+            print(f"  {colorize(line, line in query_plan['full_scans'])}")
 
     def get_stats_table(self, is_warning: bool = False) -> str:
         return colorize(
@@ -59,15 +67,47 @@ class PrettyPresenter(BasePresenter):
             is_warning,
         )
 
+    def get_alias_stats_table(self) -> str:
+        return tabulate(
+            [
+                [
+                    alias,
+                    alias_stats["read"],
+                    alias_stats["writes"],
+                    alias_stats["total"],
+                    f"{alias_stats['total_duration']:.2f}",
+                ]
+                for alias, alias_stats in self.classified_query["alias_stats"].items()
+            ],
+            ["alias", "read", "writes", "total", "total_duration"],
+            tablefmt=get_config()["PRETTY"]["TABLE_FORMAT"],
+        )
+
     def print(self) -> None:
         is_warning = self.classified_query["has_over_threshold"]
         print("\n" + self.get_stats_table(is_warning))
+        if len(self.classified_query["alias_stats"]) > 1:
+            print(self.get_alias_stats_table())
 
         for captured_query in self.classified_query["slow_captured_queries"]:
             print(
                 f'{get_stack_prefix(captured_query)} Slow {captured_query["duration"]:.2f} seconds'
             )
             self.print_sql(captured_query["sql"])
+            self.print_query_plan(captured_query)
+
+        for captured_query in self.classified_query["anomalous_captured_queries"]:
+            print(
+                f'{get_stack_prefix(captured_query)} Regressed {captured_query["duration"]:.4f} seconds, {captured_query["duration"] / captured_query["baseline_duration"]:.1f}x the baseline of {captured_query["baseline_duration"]:.4f} seconds'
+            )
+            self.print_sql(captured_query["sql"])
+            self.print_query_plan(captured_query)
+
+        for captured_query in self.classified_query["unbounded_captured_queries"]:
+            print(
+                f'{get_stack_prefix(captured_query)} Unbounded {captured_query["rows_fetched"]} rows fetched in {captured_query["fetch_duration"]:.2f} seconds, use .iterator() or pagination'
+            )
+            self.print_sql(captured_query["sql"])
 
         for captured_query, count in self.classified_query[
             "duplicates_counter_over_threshold"
@@ -79,4 +119,5 @@ class PrettyPresenter(BasePresenter):
             "similar_counter_over_threshold"
         ].items():
             print(f"{get_stack_prefix(captured_query)} Similar {count} times")
-            self.print_sql(captured_query["raw_sql"])
+            self.print_sql(captured_query["fingerprint"])
+            self.print_query_plan(captured_query)
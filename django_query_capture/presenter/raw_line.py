@@ -1,7 +1,5 @@
-import sqlparse
-
 from django_query_capture.presenter.base import BasePresenter
-from django_query_capture.utils import get_stack_prefix
+from django_query_capture.utils import format_sql, get_stack_prefix
 
 
 class RawLinePresenter(BasePresenter):
@@ -19,32 +17,33 @@ class RawLinePresenter(BasePresenter):
             f"most_common_similar: {self.classified_query['most_common_similar'][1] if self.classified_query['most_common_similar'] else 0}\n",
         )
 
+        if len(self.classified_query["alias_stats"]) > 1:
+            for alias, alias_stats in self.classified_query["alias_stats"].items():
+                print(
+                    f"{alias} - read: {alias_stats['read']}, writes: {alias_stats['writes']}, "
+                    f"total: {alias_stats['total']}, total_duration: {alias_stats['total_duration']:.2f}"
+                )
+
         for captured_query in self.classified_query["slow_captured_queries"]:
             print(
                 f'{get_stack_prefix(captured_query)} Slow {captured_query["duration"]:.2f} seconds'
             )
+            print(format_sql(captured_query["sql"]))
+
+        for captured_query in self.classified_query["anomalous_captured_queries"]:
             print(
-                sqlparse.format(
-                    captured_query["sql"], reindent=True, keyword_case="upper"
-                )
+                f'{get_stack_prefix(captured_query)} Regressed {captured_query["duration"]:.4f} seconds, baseline {captured_query["baseline_duration"]:.4f} seconds'
             )
+            print(format_sql(captured_query["sql"]))
 
         for captured_query, count in self.classified_query[
             "duplicates_counter_over_threshold"
         ].items():
             print(f"{get_stack_prefix(captured_query)} Repeated {count} times")
-            print(
-                sqlparse.format(
-                    captured_query["sql"], reindent=True, keyword_case="upper"
-                )
-            )
+            print(format_sql(captured_query["sql"]))
 
         for captured_query, count in self.classified_query[
             "similar_counter_over_threshold"
         ].items():
             print(f"{get_stack_prefix(captured_query)} Similar {count} times")
-            print(
-                sqlparse.format(
-                    captured_query["sql"], reindent=True, keyword_case="upper"
-                )
-            )
+            print(format_sql(captured_query["fingerprint"]))
@@ -0,0 +1,180 @@
+"""
+pytest plugin, enabled by the `pytest11` entry point when the package is installed, see [Test Util](../api_guide/test_util.md).
+
+- `query_capture` fixture: the [native_query_capture][capture.native_query_capture] of a `query_capture(ignore_output=True)` around the test.
+- `query_budget` marker: fail the test if its queries exceed the budget, see [check_query_budget][test_utils.check_query_budget].
+- `query_snapshot` marker: compare the queries of the test with `__query_snapshots__/<module>/<test>.json` next to the test module,
+  see [assert_query_snapshot][snapshot.assert_query_snapshot]. `--query-snapshot-update` rewrites the snapshots.
+- `--query-capture-summary=N`: capture every test and show the N heaviest tests at the end of the session.
+
+The statistics of each test are attached to its report as a user property,
+so that with pytest-xdist the reports of every worker are merged by the controller like any other report.
+"""
+import typing
+
+import os
+import re
+
+import pytest
+
+USER_PROPERTY = "query_capture"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("query_capture", "django-query-capture")
+    group.addoption(
+        "--query-capture-summary",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Capture the queries of every test and show the N heaviest tests at the end of the session.",
+    )
+    group.addoption(
+        "--query-snapshot-update",
+        action="store_true",
+        default=False,
+        help="Rewrite the query snapshots of the tests marked with query_snapshot.",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_queries=None, max_duplicates=None, max_similar=None, max_db_time=None): "
+        "fail the test if its queries exceed the budget.",
+    )
+    config.addinivalue_line(
+        "markers",
+        "query_snapshot(name=None): compare the queries of the test with its snapshot file.",
+    )
+    config.pluginmanager.register(
+        QueryCapturePlugin(
+            config.getoption("query_capture_summary"),
+            config.getoption("query_snapshot_update"),
+        ),
+        "django_query_capture_summary",
+    )
+
+
+def get_snapshot_path(item, name: typing.Optional[str] = None) -> str:
+    """
+    Returns:
+        `__query_snapshots__/<module>/<name>.json` next to the test module, `name` is the test name with its class by default.
+    """
+    from django_query_capture.snapshot import SNAPSHOT_DIRECTORY
+
+    name = name or ".".join(item.nodeid.split("::")[1:])
+    return os.path.join(
+        os.path.dirname(str(item.path)),
+        SNAPSHOT_DIRECTORY,
+        item.path.stem,
+        re.sub(r"[^\w.-]+", "_", name).strip("_") + ".json",
+    )
+
+
+@pytest.fixture(name="query_capture")
+def query_capture_fixture():
+    """
+    Returns:
+        [native_query_capture][capture.native_query_capture] that is capturing the test, `query_capture.classifier()` returns live statistics.
+    """
+    from django_query_capture.decorators import query_capture
+
+    with query_capture(ignore_output=True) as capture:
+        yield capture
+
+
+class QueryCapturePlugin:
+    """
+    Enforce `query_budget` markers and collect the statistics of every test for the summary.
+    """
+
+    def __init__(self, summary_size: int = 0, update_snapshots: bool = False):
+        """
+        Args:
+            summary_size: Number of the heaviest tests to show, `0` captures only tests with markers and shows no summary.
+            update_snapshots: Rewrite the snapshots of `query_snapshot` instead of comparing.
+        """
+        self.summary_size = summary_size
+        self.update_snapshots = update_snapshots
+        self.results: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item):
+        budget_marker = item.get_closest_marker("query_budget")
+        snapshot_marker = item.get_closest_marker("query_snapshot")
+        if budget_marker is None and snapshot_marker is None and not self.summary_size:
+            return (yield)
+
+        from django_query_capture.decorators import query_capture
+        from django_query_capture.snapshot import assert_query_snapshot
+        from django_query_capture.test_utils import assert_query_budget, get_query_stats
+
+        __tracebackhide__ = True
+        # Snapshots need every query, so they are never captured in streaming mode.
+        capture = query_capture(
+            ignore_output=True, streaming=False if snapshot_marker else None
+        )
+        try:
+            with capture:
+                result = yield
+        finally:
+            item.user_properties.append(
+                (USER_PROPERTY, dict(get_query_stats(capture.classifier)))
+            )
+        if budget_marker is not None:
+            assert_query_budget(
+                capture.classifier, *budget_marker.args, **budget_marker.kwargs
+            )
+        if snapshot_marker is not None:
+            classifier = capture.captured_query_classifier
+            assert_query_snapshot(
+                [
+                    captured_query
+                    for captured_query in classifier.captured_queries
+                    if classifier.is_allow_pattern(captured_query["raw_sql"])
+                ],
+                get_snapshot_path(
+                    item, *snapshot_marker.args, **snapshot_marker.kwargs
+                ),
+                update=self.update_snapshots or None,
+                root=str(item.config.rootpath),
+            )
+        return result
+
+    def pytest_runtest_logreport(self, report):
+        """
+        Runs in the controller for the reports of every xdist worker, and in the process itself without xdist.
+        """
+        if report.when != "call":
+            return
+        for name, value in report.user_properties:
+            if name == USER_PROPERTY:
+                self.results[report.nodeid] = value
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.summary_size or not self.results:
+            return
+        from tabulate import tabulate
+
+        heaviest = sorted(
+            self.results.items(),
+            key=lambda item: (item[1]["queries"], item[1]["db_time"]),
+            reverse=True,
+        )[: self.summary_size]
+        terminalreporter.write_sep("=", "query capture: heaviest tests")
+        terminalreporter.write_line(
+            tabulate(
+                [
+                    [
+                        nodeid,
+                        query_stats["queries"],
+                        query_stats["duplicates"],
+                        query_stats["similar"],
+                        f"{query_stats['db_time']:.3f}",
+                    ]
+                    for nodeid, query_stats in heaviest
+                ],
+                ["test", "queries", "duplicates", "similar", "db_time"],
+            )
+        )
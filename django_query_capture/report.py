@@ -0,0 +1,235 @@
+"""
+Offline report of the JSON Lines records written by [JsonLinesPresenter][presenter.json_lines.JsonLinesPresenter], used by the `querycapture_report` command.<br>
+Files are split into chunks that are read by a process pool, each chunk is streamed line by line,
+and the per-fingerprint counts and [LatencySketch][sketch.LatencySketch]es of the chunks are merged,
+so memory depends on the number of fingerprints rather than the size of the files.
+"""
+import typing
+
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django_query_capture.sketch import LatencySketch
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+CHUNK_SIZE = 64 * 1024 * 1024
+SORT_KEYS = ("total_duration", "count", "p95")
+
+Chunk = typing.Tuple[str, int, typing.Optional[int]]
+
+
+def loads(line: bytes) -> typing.Any:
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+class FingerprintReport:
+    """
+    Statistics of one [fingerprint][fingerprint.fingerprint] over every record.
+    """
+
+    __slots__ = ("fingerprint", "sketch", "raw_sql", "call_site")
+
+    def __init__(self, fingerprint: str, relative_accuracy: float):
+        self.fingerprint = fingerprint
+        self.sketch = LatencySketch(relative_accuracy)
+        self.raw_sql: typing.Optional[str] = None
+        self.call_site: typing.Optional[str] = None
+
+    @property
+    def count(self) -> int:
+        return self.sketch.count
+
+    @property
+    def total_duration(self) -> float:
+        return self.sketch.sum
+
+    @property
+    def p95(self) -> float:
+        return self.sketch.quantile(0.95)
+
+    def merge(self, other: "FingerprintReport") -> None:
+        self.sketch.merge(other.sketch)
+        if self.raw_sql is None:
+            self.raw_sql = other.raw_sql
+        if self.call_site is None:
+            self.call_site = other.call_site
+
+
+class QueryReport:
+    """
+    Mergeable statistics of JSON Lines records by fingerprint.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Args:
+            relative_accuracy: `relative_accuracy` of the sketches.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.record_count = 0
+        self.query_count = 0
+        self.total_duration = 0.0
+        self.invalid_line_count = 0
+        self.fingerprints: typing.Dict[str, FingerprintReport] = {}
+
+    def _get_fingerprint_report(self, fingerprint: str) -> FingerprintReport:
+        fingerprint_report = self.fingerprints.get(fingerprint)
+        if fingerprint_report is None:
+            fingerprint_report = self.fingerprints[fingerprint] = FingerprintReport(
+                fingerprint, self.relative_accuracy
+            )
+        return fingerprint_report
+
+    def add_record(self, record: typing.Mapping[str, typing.Any]) -> None:
+        """
+        Args:
+            record: Record of [serialize_classified_query][export.serialize_classified_query].
+        """
+        self.record_count += 1
+        for query in record.get("queries", ()):
+            duration = query["duration"]
+            self.query_count += 1
+            self.total_duration += duration
+            fingerprint_report = self._get_fingerprint_report(query["fingerprint"])
+            fingerprint_report.sketch.add(duration)
+            if fingerprint_report.call_site is None:
+                fingerprint_report.call_site = f'[{query["function_name"]}, {query["file_name"]}:{query["line_no"]}]'
+        for key in ("slow", "duplicates", "similars"):
+            for query in record.get(key, ()):
+                fingerprint_report = self.fingerprints.get(query["fingerprint"])
+                if (
+                    fingerprint_report is not None
+                    and fingerprint_report.raw_sql is None
+                ):
+                    fingerprint_report.raw_sql = query.get("raw_sql")
+
+    def merge(self, other: "QueryReport") -> None:
+        self.record_count += other.record_count
+        self.query_count += other.query_count
+        self.total_duration += other.total_duration
+        self.invalid_line_count += other.invalid_line_count
+        for fingerprint, fingerprint_report in other.fingerprints.items():
+            self._get_fingerprint_report(fingerprint).merge(fingerprint_report)
+
+    def top(
+        self, sort_key: str = "total_duration", limit: int = 20
+    ) -> typing.List[FingerprintReport]:
+        """
+        Args:
+            sort_key: One of `total_duration`, `count` and `p95`.
+            limit: Number of fingerprints to return.
+
+        Returns:
+            The top offenders by `sort_key`.
+        """
+        if sort_key not in SORT_KEYS:
+            raise ValueError(f"sort_key must be one of {', '.join(SORT_KEYS)}.")
+        return sorted(
+            self.fingerprints.values(),
+            key=lambda fingerprint_report: getattr(fingerprint_report, sort_key),
+            reverse=True,
+        )[:limit]
+
+
+def split_chunks(
+    paths: typing.Iterable[str], chunk_size: int = CHUNK_SIZE
+) -> typing.List[Chunk]:
+    """
+    Args:
+        paths: JSON Lines files, gzip files end with `.gz`.
+        chunk_size: Bytes of a chunk, gzip files can't be split and are one chunk.
+
+    Returns:
+        `(path, start, end)` of every chunk, `end` is `None` for the rest of the file.
+    """
+    chunks: typing.List[Chunk] = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if path.endswith(".gz") or size <= chunk_size:
+            chunks.append((path, 0, None))
+            continue
+        for start in range(0, size, chunk_size):
+            end = start + chunk_size
+            chunks.append((path, start, end if end < size else None))
+    return chunks
+
+
+def iter_chunk_lines(
+    path: str, start: int, end: typing.Optional[int]
+) -> typing.Iterator[bytes]:
+    """
+    Lines that start in `[start, end)`, so that each line of a file belongs to exactly one chunk.
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as file:
+            yield from file
+        return
+    with open(path, "rb") as file:
+        if start:
+            file.seek(start - 1)
+            # The line that contains `start` belongs to the previous chunk, unless it starts exactly at `start`.
+            file.readline()
+        while end is None or file.tell() < end:
+            line = file.readline()
+            if not line:
+                break
+            yield line
+
+
+def report_chunk(chunk: Chunk, relative_accuracy: float = 0.01) -> QueryReport:
+    """
+    Args:
+        chunk: `(path, start, end)` of [split_chunks][report.split_chunks].
+        relative_accuracy: `relative_accuracy` of the sketches.
+
+    Returns:
+        [QueryReport][report.QueryReport] of the chunk, lines that are not valid records are counted in `invalid_line_count`.
+    """
+    query_report = QueryReport(relative_accuracy)
+    for line in iter_chunk_lines(*chunk):
+        if not line.strip():
+            continue
+        try:
+            query_report.add_record(loads(line))
+        except (ValueError, KeyError, TypeError):
+            query_report.invalid_line_count += 1
+    return query_report
+
+
+def build_report(
+    paths: typing.Iterable[str],
+    workers: typing.Optional[int] = None,
+    relative_accuracy: float = 0.01,
+    chunk_size: int = CHUNK_SIZE,
+) -> QueryReport:
+    """
+    Args:
+        paths: JSON Lines files, gzip files end with `.gz`.
+        workers: Number of processes, `1` reads in this process, `None` uses every CPU.
+        relative_accuracy: `relative_accuracy` of the sketches.
+        chunk_size: Bytes of a chunk that one process reads.
+
+    Returns:
+        [QueryReport][report.QueryReport] of every file.
+    """
+    chunks = split_chunks(paths, chunk_size)
+    query_report = QueryReport(relative_accuracy)
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            query_report.merge(report_chunk(chunk, relative_accuracy))
+        return query_report
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_report in executor.map(
+            report_chunk, chunks, [relative_accuracy] * len(chunks)
+        ):
+            query_report.merge(chunk_report)
+    return query_report
@@ -4,9 +4,12 @@ You can adjust the threshold or change the shape of the output by referring to [
 """
 import typing
 
+from fnmatch import fnmatchcase
 from functools import lru_cache
+from types import MappingProxyType
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.signals import setting_changed
 from django.dispatch import receiver
 
@@ -20,20 +23,152 @@ CONFIG_DEFAULTS = {
     "PRESENTER": "django_query_capture.presenter.PrettyPresenter",
     "IGNORE_SQL_PATTERNS": [],
     "PRETTY": {"TABLE_FORMAT": "pretty", "SQL_COLOR_FORMAT": "paraiso-light"},
+    "LIBRARY_PATH_PREFIXES": None,
+    "PROJECT_PATH_PREFIXES": [],
+    "DATABASE_ALIASES": None,
+    "PROPAGATE_THREADS": False,
+    "STREAMING": {"ENABLED": False, "BUFFER_SIZE": 1000, "TOP_K": 100},
+    "MIDDLEWARE": {
+        "SAMPLE_RATE": 1.0,
+        "URL_SAMPLE_RATES": {},
+        "FORCE_HEADER": "X-Query-Capture",
+        "TAIL_BASED": False,
+    },
+    "ASYNC_OUTPUT": {"ENABLED": False, "QUEUE_SIZE": 100},
+    "AGGREGATE": {
+        "ENABLED": False,
+        "MAX_ENDPOINTS": 1000,
+        "MAX_FINGERPRINTS": 100,
+        "RELATIVE_ACCURACY": 0.01,
+    },
+    "JSON_LINES": {
+        "PATH": "query_capture-{pid}.jsonl",
+        "MAX_BYTES": 100 * 1024 * 1024,
+        "ROTATE_INTERVAL": None,
+        "BACKUP_COUNT": 5,
+        "COMPRESS": False,
+        "BUFFER_SIZE": 100,
+        "FLUSH_INTERVAL": 1.0,
+        "REQUEST_ID_HEADER": "X-Request-ID",
+    },
+    "METRICS": {
+        "ENABLED": False,
+        "MAX_SERIES": 1000,
+        "DURATION_BUCKETS": [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5],
+        "MULTIPROCESS_DIR": None,
+        "FLUSH_INTERVAL": 1.0,
+    },
+    "EXPLAIN": {"ENABLED": False, "CACHE_SIZE": 1000, "TTL": 3600},
+    "FETCH": {"ENABLED": False, "UNBOUNDED_MIN_ROWS": 1000},
+    "BASELINE": {
+        "ENABLED": False,
+        "MAX_FINGERPRINTS": 10000,
+        "ALPHA": 0.05,
+        "FACTOR": 3.0,
+        "DEVIATIONS": 3.0,
+        "MIN_SAMPLES": 20,
+        "MIN_DURATION": 0.001,
+    },
+    "RULES": [],
 }
 
+RULE_MATCH_KEYS = ("ROUTE", "VIEW")
+RULE_OVERRIDE_KEYS = ("PRINT_THRESHOLDS", "PRESENTER", "IGNORE_SQL_PATTERNS")
+
+
+def merge_config(
+    defaults: typing.Mapping[str, typing.Any],
+    overrides: typing.Mapping[str, typing.Any],
+) -> typing.Dict[str, typing.Any]:
+    """
+    Args:
+        defaults: Base settings.
+        overrides: Settings that take precedence over `defaults`.
+
+    Returns:
+        `defaults` updated with `overrides`, nested `dict`s are merged key by key so that setting one key keeps the others.
+    """
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        default = merged.get(key)
+        if isinstance(default, typing.Mapping) and isinstance(value, typing.Mapping):
+            merged[key] = merge_config(default, value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def freeze(value: typing.Any) -> typing.Any:
+    """
+    Returns:
+        `value` that can't be modified, `dict`s become read-only mappings and `list`s become `tuple`s.
+    """
+    if isinstance(value, typing.Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
 
 @lru_cache
-def get_config() -> typing.Dict[str, typing.Any]:
+def get_config() -> typing.Mapping[str, typing.Any]:
     """
-    Utilities that help you use the default settings if you don't use the user
+    Utilities that help you use the default settings if you don't use the user.<br>
+    The settings are compiled once: the user settings are deep-merged into the defaults and frozen, until the settings are overridden.
+
     Returns:
         Among the values of [settings](../home/settings.md), the existing value is returned.
     """
     USER_CONFIG = getattr(settings, "QUERY_CAPTURE", {})
-    CONFIG = CONFIG_DEFAULTS.copy()
-    CONFIG.update(USER_CONFIG)
-    return CONFIG
+    CONFIG = merge_config(CONFIG_DEFAULTS, USER_CONFIG)
+    for rule in CONFIG["RULES"]:
+        if not any(key in rule for key in RULE_MATCH_KEYS):
+            raise ImproperlyConfigured(
+                f"QUERY_CAPTURE RULES need ROUTE or VIEW, got {dict(rule)!r}."
+            )
+    return freeze(CONFIG)
+
+
+def match_rule(
+    rule: typing.Mapping[str, typing.Any], route: str, view_name: typing.Optional[str]
+) -> bool:
+    """
+    Args:
+        rule: One of [RULES](../home/settings.md).
+        route: URL pattern of the request, e.g. `articles/<int:pk>/`.
+        view_name: e.g. `news:article-detail`.
+
+    Returns:
+        Whether every `ROUTE` and `VIEW` of the rule matches, they are `fnmatch` patterns such as `api/*`.
+    """
+    if "ROUTE" in rule and not fnmatchcase(route, rule["ROUTE"]):
+        return False
+    if "VIEW" in rule and not (view_name and fnmatchcase(view_name, rule["VIEW"])):
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def get_route_config(
+    route: str, view_name: typing.Optional[str] = None
+) -> typing.Mapping[str, typing.Any]:
+    """
+    Settings of one resolved route. The rules are matched once per route, because routes are URL patterns rather than paths,
+    so their number is bounded and every later request is a dict lookup.
+
+    Args:
+        route: URL pattern of the request, e.g. `request.resolver_match.route`.
+        view_name: e.g. `request.resolver_match.view_name`.
+
+    Returns:
+        [get_config][settings.get_config] with `PRINT_THRESHOLDS`, `PRESENTER` and `IGNORE_SQL_PATTERNS` of the first matching rule of [RULES](../home/settings.md).
+    """
+    config = get_config()
+    for rule in config["RULES"]:
+        if match_rule(rule, route, view_name):
+            overrides = {key: rule[key] for key in RULE_OVERRIDE_KEYS if key in rule}
+            return freeze(merge_config(config, overrides))
+    return config
 
 
 @receiver(setting_changed)
@@ -43,3 +178,4 @@ def update_toolbar_config(*, setting, **kwargs):
     """
     if setting == "QUERY_CAPTURE":
         get_config.cache_clear()
+        get_route_config.cache_clear()
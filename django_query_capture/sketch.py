@@ -0,0 +1,190 @@
+"""
+Mergeable latency sketch, used to keep percentiles of query durations in constant memory.<br>
+It is a [DDSketch](https://arxiv.org/abs/1908.10693): values are counted in logarithmic buckets,
+so every quantile is within `relative_accuracy` of the exact value, and two sketches are merged by adding their buckets.
+"""
+import typing
+
+import math
+
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class LatencySketch:
+    """
+    Logarithmic histogram of positive values such as seconds.<br>
+    With the default `relative_accuracy` of 1%, durations from 1 microsecond to 1 hour take about 1,100 buckets at most,
+    and `max_buckets` bounds it in any case by collapsing the smallest buckets.
+
+    ```python
+    sketch = LatencySketch()
+    for duration in (0.001, 0.002, 0.5):
+        sketch.add(duration)
+    sketch.quantile(0.5)
+    # 0.002 within 1%
+    ```
+    """
+
+    __slots__ = (
+        "relative_accuracy",
+        "max_buckets",
+        "gamma",
+        "log_gamma",
+        "buckets",
+        "zero_count",
+        "count",
+        "sum",
+        "min",
+        "max",
+    )
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Args:
+            relative_accuracy: Maximum relative error of [quantile][sketch.LatencySketch.quantile].
+            max_buckets: Maximum number of buckets to keep.
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1.")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: typing.Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        """
+        Args:
+            value: Value to count, values smaller than `MIN_INDEXABLE_VALUE` are counted as zero.
+            count: Number of times to count `value`.
+        """
+        if value > MIN_INDEXABLE_VALUE:
+            index = self._index(value)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        else:
+            self.zero_count += count
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _collapse(self) -> None:
+        indexes = sorted(self.buckets)
+        collapsed = indexes[: len(indexes) - self.max_buckets + 1]
+        target = collapsed[-1]
+        self.buckets[target] = sum(self.buckets.pop(index) for index in collapsed)
+
+    def merge(self, other: "LatencySketch") -> None:
+        """
+        Add the counts of `other` to this sketch.
+
+        Args:
+            other: [LatencySketch][sketch.LatencySketch] with the same `relative_accuracy`.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                "Sketches with different relative_accuracy cannot be merged."
+            )
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """
+        Args:
+            q: Quantile between 0 and 1, e.g. 0.95.
+
+        Returns:
+            Value at the quantile within `relative_accuracy`, 0 if nothing is counted.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def percentiles(
+        self, percentiles: typing.Iterable[int] = (50, 95, 99)
+    ) -> typing.Dict[str, float]:
+        """
+        Returns:
+            e.g. `{"p50": 0.001, "p95": 0.01, "p99": 0.1}`
+        """
+        return {
+            f"p{percentile}": self.quantile(percentile / 100)
+            for percentile in percentiles
+        }
+
+    def copy(self) -> "LatencySketch":
+        sketch = LatencySketch(self.relative_accuracy, self.max_buckets)
+        sketch.merge(self)
+        return sketch
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns:
+            JSON serializable form, see [from_dict][sketch.LatencySketch.from_dict].
+        """
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(
+        cls, data: typing.Mapping[str, typing.Any], max_buckets: int = 2048
+    ) -> "LatencySketch":
+        """
+        Args:
+            data: Result of [to_dict][sketch.LatencySketch.to_dict].
+            max_buckets: Maximum number of buckets to keep.
+
+        Returns:
+            [LatencySketch][sketch.LatencySketch]
+        """
+        sketch = cls(data["relative_accuracy"], max_buckets)
+        sketch.buckets = {int(index): count for index, count in data["buckets"].items()}
+        if len(sketch.buckets) > max_buckets:
+            sketch._collapse()
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
+
+    def __repr__(self) -> str:
+        return f"<LatencySketch count={self.count} sum={self.sum:.6f}>"
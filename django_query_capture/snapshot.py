@@ -0,0 +1,194 @@
+"""
+Query snapshots, the ordered [fingerprints][fingerprint.fingerprint] of the queries of a test by call site, saved as JSON.<br>
+A later run is compared against the file, so that a change that swaps one query for another is caught even if the number of queries stays the same.<br>
+Call sites are `path:function`, with the path relative to `root`, and line numbers are left out so that unrelated edits above a query don't change the snapshot.
+Comparing is linear in the number of queries, fingerprints are cached and identical call sites are skipped with a list comparison.
+
+```json
+{
+  "version": 1,
+  "queries": {
+    "news/views.py:reporter_list": [
+      "select ... from news_reporter",
+      "select ... from news_article where reporter_id = ?"
+    ]
+  }
+}
+```
+"""
+import typing
+
+import json
+import os
+from collections import Counter
+
+from django_query_capture.capture import CapturedQuery
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIRECTORY = "__query_snapshots__"
+UPDATE_SNAPSHOTS_ENV = "QUERY_CAPTURE_UPDATE_SNAPSHOTS"
+
+Snapshot = typing.Dict[str, typing.List[str]]
+
+
+class QuerySnapshotMismatch(AssertionError):
+    """
+    Raised by [assert_query_snapshot][snapshot.assert_query_snapshot], it is an `AssertionError` so that test runners report a failure rather than an error.
+    """
+
+
+class CallSiteDiff(typing.TypedDict):
+    """
+    Difference of the fingerprints of one call site.
+
+    - `added`: Fingerprints that are not in the snapshot, in the order they ran.
+    - `removed`: Fingerprints of the snapshot that did not run.
+    - `reordered`: Whether the fingerprints that are in both ran in a different order.
+    """
+
+    added: typing.List[str]
+    removed: typing.List[str]
+    reordered: bool
+
+
+def get_call_site_key(file_name: str, function_name: str, root: str) -> str:
+    try:
+        file_name = os.path.relpath(file_name, root)
+    except ValueError:  # pragma: no cover
+        # On Windows, paths on another drive have no relative path.
+        pass
+    return f"{file_name.replace(os.sep, '/')}:{function_name}"
+
+
+def build_snapshot(
+    captured_queries: typing.Iterable[CapturedQuery], root: typing.Optional[str] = None
+) -> Snapshot:
+    """
+    Args:
+        captured_queries: [CapturedQuery][capture.CapturedQuery]s in the order they ran.
+        root: Directory that call sites are relative to, by default the current directory.
+
+    Returns:
+        Fingerprints in order by call site, call sites are in the order of their first query.
+    """
+    root = root or os.getcwd()
+    call_site_keys: typing.Dict[typing.Tuple[str, str], str] = {}
+    snapshot: Snapshot = {}
+    for captured_query in captured_queries:
+        call_site = (captured_query["file_name"], captured_query["function_name"])
+        call_site_key = call_site_keys.get(call_site)
+        if call_site_key is None:
+            call_site_key = call_site_keys[call_site] = get_call_site_key(
+                *call_site, root
+            )
+        snapshot.setdefault(call_site_key, []).append(captured_query["fingerprint"])
+    return snapshot
+
+
+def _take(
+    fingerprints: typing.List[str], counts: typing.Counter[str]
+) -> typing.List[str]:
+    """
+    Returns:
+        The first `counts[fingerprint]` occurrences of every fingerprint, in order.
+    """
+    remaining = counts.copy()
+    ordered = []
+    for fingerprint in fingerprints:
+        if remaining[fingerprint] > 0:
+            remaining[fingerprint] -= 1
+            ordered.append(fingerprint)
+    return ordered
+
+
+def diff_snapshots(
+    expected: Snapshot, actual: Snapshot
+) -> typing.Dict[str, CallSiteDiff]:
+    """
+    Args:
+        expected: Saved snapshot.
+        actual: Snapshot of this run.
+
+    Returns:
+        [CallSiteDiff][snapshot.CallSiteDiff] of every call site that differs, empty if the snapshots are the same.
+    """
+    diffs: typing.Dict[str, CallSiteDiff] = {}
+    for call_site_key in {**expected, **actual}:
+        expected_fingerprints = expected.get(call_site_key, [])
+        actual_fingerprints = actual.get(call_site_key, [])
+        if expected_fingerprints == actual_fingerprints:
+            continue
+        expected_counter = Counter(expected_fingerprints)
+        actual_counter = Counter(actual_fingerprints)
+        common = expected_counter & actual_counter
+        diffs[call_site_key] = {
+            "added": _take(actual_fingerprints, actual_counter - expected_counter),
+            "removed": _take(expected_fingerprints, expected_counter - actual_counter),
+            "reordered": _take(expected_fingerprints, common)
+            != _take(actual_fingerprints, common),
+        }
+    return diffs
+
+
+def format_diff(diffs: typing.Mapping[str, CallSiteDiff]) -> str:
+    lines = []
+    for call_site_key, diff in diffs.items():
+        lines.append(f"  {call_site_key}")
+        lines.extend(f"    + {fingerprint}" for fingerprint in diff["added"])
+        lines.extend(f"    - {fingerprint}" for fingerprint in diff["removed"])
+        if diff["reordered"]:
+            lines.append("    ~ queries ran in a different order")
+    return "\n".join(lines)
+
+
+def read_snapshot(path: str) -> Snapshot:
+    with open(path) as file:
+        return json.load(file)["queries"]
+
+
+def write_snapshot(path: str, snapshot: Snapshot) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({"version": SNAPSHOT_VERSION, "queries": snapshot}, file, indent=2)
+        file.write("\n")
+
+
+def should_update_snapshots() -> bool:
+    """
+    Returns:
+        Whether the `QUERY_CAPTURE_UPDATE_SNAPSHOTS` environment variable is set to a true value.
+    """
+    return os.environ.get(UPDATE_SNAPSHOTS_ENV, "").lower() in ("1", "true", "yes")
+
+
+def assert_query_snapshot(
+    captured_queries: typing.Iterable[CapturedQuery],
+    path: str,
+    update: typing.Optional[bool] = None,
+    root: typing.Optional[str] = None,
+) -> None:
+    """
+    Write the snapshot if `path` doesn't exist or `update` is set, otherwise compare against it.
+
+    Args:
+        captured_queries: [CapturedQuery][capture.CapturedQuery]s in the order they ran.
+        path: Snapshot file.
+        update: Overwrite the snapshot, by default [should_update_snapshots][snapshot.should_update_snapshots].
+        root: Directory that call sites are relative to, by default the current directory.
+
+    Raises:
+        QuerySnapshotMismatch: The queries differ from the snapshot, with the added, removed and reordered queries by call site.
+    """
+    __tracebackhide__ = True
+    snapshot = build_snapshot(captured_queries, root)
+    if update is None:
+        update = should_update_snapshots()
+    if update or not os.path.exists(path):
+        write_snapshot(path, snapshot)
+        return
+    diffs = diff_snapshots(read_snapshot(path), snapshot)
+    if diffs:
+        raise QuerySnapshotMismatch(
+            f"Queries differ from the snapshot {path}:\n{format_diff(diffs)}\n"
+            f"Set {UPDATE_SNAPSHOTS_ENV}=1, or run pytest with --query-snapshot-update, to update the snapshot."
+        )
@@ -0,0 +1,148 @@
+"""
+Bounded data structures used by [CapturedQueryClassifier][classify.CapturedQueryClassifier] in streaming mode.<br>
+Memory stays constant no matter how many queries run, see [STREAMING](../home/settings.md).
+"""
+import typing
+
+import heapq
+import itertools
+from collections import Counter
+
+KeyT = typing.TypeVar("KeyT", bound=typing.Hashable)
+ItemT = typing.TypeVar("ItemT")
+
+
+class SpaceSavingCounter(typing.Generic[KeyT]):
+    """
+    Approximate top-K counter with the Space-Saving algorithm.<br>
+    At most `capacity` keys are kept. When a new key comes in and the counter is full, the key with the smallest count is replaced,
+    and the new key inherits that count as its error.<br>
+    Counts are reported without the error, so they are a lower bound and a key is over the threshold only when it surely is.
+    A key that is counted more often than the smallest count is never replaced, so heavy hitters are counted exactly once they are in.<br>
+    Keys are kept in buckets by count, so that adding a key and finding the smallest count are O(1).
+    """
+
+    def __init__(self, capacity: int, min_count: typing.Optional[int] = None):
+        """
+        Args:
+            capacity: Maximum number of keys to keep.
+            min_count: Keys counted more than this are over the threshold.
+        """
+        self.capacity = capacity
+        self.min_count = min_count
+        self.counts: typing.Dict[KeyT, int] = {}
+        self.errors: typing.Dict[KeyT, int] = {}
+        # count -> keys with the count, `dict` is used as an ordered set so that the oldest key is replaced first.
+        self._buckets: typing.Dict[int, typing.Dict[KeyT, None]] = {}
+        self._smallest_count = 0
+
+    def _move(self, key: KeyT, old_count: int, new_count: int) -> None:
+        if old_count:
+            bucket = self._buckets[old_count]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[old_count]
+                if self._smallest_count == old_count:
+                    self._smallest_count = new_count
+        self._buckets.setdefault(new_count, {})[key] = None
+        self.counts[key] = new_count
+
+    def add(self, key: KeyT) -> typing.Tuple[KeyT, int]:
+        """
+        Args:
+            key: Key to count once.
+
+        Returns:
+            The key that is kept in the counter and its count.
+        """
+        count = self.counts.get(key)
+        if count is not None:
+            self._move(key, count, count + 1)
+            return key, count + 1 - self.errors[key]
+
+        if len(self.counts) < self.capacity:
+            self._move(key, 0, 1)
+            self.errors[key] = 0
+            self._smallest_count = 1
+            return key, 1
+
+        smallest_count = self._smallest_count
+        bucket = self._buckets[smallest_count]
+        replaced_key = next(iter(bucket))
+        del bucket[replaced_key]
+        del self.counts[replaced_key]
+        del self.errors[replaced_key]
+        if not bucket:
+            del self._buckets[smallest_count]
+            self._smallest_count = smallest_count + 1
+        self._move(key, 0, smallest_count + 1)
+        self.errors[key] = smallest_count
+        return key, 1
+
+    def get(self, key: KeyT) -> int:
+        """
+        Returns:
+            The count of `key` without the error, 0 if it is not kept.
+        """
+        count = self.counts.get(key)
+        if count is None:
+            return 0
+        return count - self.errors[key]
+
+    @property
+    def counter(self) -> typing.Counter[KeyT]:
+        """
+        Returns:
+            `Counter` of the kept keys.
+        """
+        return Counter({key: self.get(key) for key in self.counts})
+
+    def is_over_threshold(self, key: KeyT) -> bool:
+        return self.min_count is not None and self.get(key) > self.min_count
+
+    def over_threshold(self) -> typing.Iterator[typing.Tuple[KeyT, int]]:
+        """
+        Returns:
+            The kept keys counted more than `min_count` and their counts.
+        """
+        if self.min_count is None:
+            return
+        for key in self.counts:
+            count = self.get(key)
+            if count > self.min_count:
+                yield key, count
+
+
+class TopK(typing.Generic[ItemT]):
+    """
+    Keep the `k` items with the largest score in a heap.
+    """
+
+    def __init__(self, k: int):
+        """
+        Args:
+            k: Maximum number of items to keep.
+        """
+        self.k = k
+        self._heap: typing.List[typing.Tuple[float, int, ItemT]] = []
+        self._sequence = itertools.count()
+
+    def add(self, score: float, item: ItemT) -> None:
+        entry = (score, next(self._sequence), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def items(self) -> typing.List[ItemT]:
+        """
+        Returns:
+            The kept items in the order they were added.
+        """
+        return [item for _, _, item in sorted(self._heap, key=lambda entry: entry[1])]
@@ -1,5 +1,16 @@
 """
-Test utility to help you check Duplicate, Similar, and Slow queries in the test
+Test utility to help you check Duplicate, Similar, and Slow queries in the test.<br>
+Query budgets fail with the offending [fingerprints][fingerprint.fingerprint] and their call sites, so that an N+1 regression points at the code that caused it.
+They are used by the `query_budget` marker of the [pytest plugin][pytest_plugin], and query snapshots by its `query_snapshot` marker.
+
+```python
+from django_query_capture import query_capture
+from django_query_capture.test_utils import assert_query_budget
+
+with query_capture(ignore_output=True) as capture:
+    list_articles()
+assert_query_budget(capture.classifier(), max_queries=3, max_similar=1)
+```
 """
 import typing
 
@@ -9,8 +20,13 @@ from django.test import override_settings
 from django.utils.module_loading import import_string
 
 from django_query_capture import BasePresenter, query_capture
+from django_query_capture.capture import CapturedQuery
+from django_query_capture.classify import ClassifiedQuery
 from django_query_capture.settings import get_config
-from django_query_capture.utils import CaptureStdOutToString
+from django_query_capture.snapshot import assert_query_snapshot
+from django_query_capture.utils import CaptureStdOutToString, get_stack_prefix
+
+OFFENDER_LIMIT = 5
 
 
 class AssertInefficientQuery(ContextDecorator):
@@ -68,3 +84,188 @@ class AssertInefficientQuery(ContextDecorator):
             result = stdout.getvalue()
         if self.query_capture.classifier["has_over_threshold"]:
             raise AssertionError(result)
+
+
+class AssertQuerySnapshot(ContextDecorator):
+    """
+    Compare the queries of the block with a snapshot file, see [assert_query_snapshot][snapshot.assert_query_snapshot].<br>
+    The file is written on the first run, and when `update` or the `QUERY_CAPTURE_UPDATE_SNAPSHOTS` environment variable is set.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        update: typing.Optional[bool] = None,
+        ignore_patterns: typing.Optional[typing.List[str]] = None,
+        root: typing.Optional[str] = None,
+    ):
+        """
+        Args:
+            path: Snapshot file.
+            update: Overwrite the snapshot.
+            ignore_patterns: A list of patterns to ignore IGNORE_SQL_PATTERNS of settings.
+            root: Directory that call sites are relative to, by default the current directory.
+        """
+        self.path = path
+        self.update = update
+        self.ignore_patterns = ignore_patterns
+        self.root = root
+
+    def __enter__(self):
+        """
+        Run [query_capture.__enter__][decorators.query_capture] without output and streaming, so that every query is kept.
+        """
+        self.query_capture = query_capture(
+            ignore_output=True, ignore_patterns=self.ignore_patterns, streaming=False
+        )
+        return self.query_capture.__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        End the context of [query_capture][decorators.query_capture], and compare the queries that are not ignored unless the block raised.
+        """
+        self.query_capture.__exit__(exc_type, exc_val, exc_tb)
+        if exc_type is not None:
+            return
+        classifier = self.query_capture.captured_query_classifier
+        assert_query_snapshot(
+            [
+                captured_query
+                for captured_query in classifier.captured_queries
+                if classifier.is_allow_pattern(captured_query["raw_sql"])
+            ],
+            self.path,
+            update=self.update,
+            root=self.root,
+        )
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised by [assert_query_budget][test_utils.assert_query_budget], it is an `AssertionError` so that test runners report a failure rather than an error.
+    """
+
+
+class QueryStats(typing.TypedDict):
+    """
+    Summary of a [ClassifiedQuery][classify.ClassifiedQuery] that is compared against a budget.
+    """
+
+    queries: int
+    duplicates: int
+    similar: int
+    db_time: float
+
+
+def get_query_stats(classified_query: ClassifiedQuery) -> QueryStats:
+    """
+    Args:
+        classified_query: [ClassifiedQuery][classify.ClassifiedQuery]
+
+    Returns:
+        Number of queries, count of the most repeated query, count of the most common SQL with different parameters, and the sum of durations.
+    """
+    return {
+        "queries": classified_query["total"],
+        "duplicates": classified_query["most_common_duplicate"][1] or 0,
+        "similar": classified_query["most_common_similar"][1] or 0,
+        "db_time": classified_query["total_duration"],
+    }
+
+
+def format_offenders(
+    offenders: typing.Iterable[typing.Tuple[CapturedQuery, str]]
+) -> str:
+    return "".join(
+        f"\n    {label} {captured_query['fingerprint']}\n      at {get_stack_prefix(captured_query)}"
+        for captured_query, label in offenders
+    )
+
+
+def check_query_budget(
+    classified_query: ClassifiedQuery,
+    max_queries: typing.Optional[int] = None,
+    max_duplicates: typing.Optional[int] = None,
+    max_similar: typing.Optional[int] = None,
+    max_db_time: typing.Optional[float] = None,
+) -> typing.List[str]:
+    """
+    Args:
+        classified_query: [ClassifiedQuery][classify.ClassifiedQuery] to check.
+        max_queries: Maximum number of queries.
+        max_duplicates: Maximum number of times the same SQL may run with the same parameters.
+        max_similar: Maximum number of times the same SQL may run with any parameters, `1` catches N+1 queries.
+        max_db_time: Maximum sum of the durations in seconds.
+
+    Returns:
+        A message for every limit that is exceeded with the offending queries, empty if the budget is kept.
+    """
+    query_stats = get_query_stats(classified_query)
+    violations = []
+    if max_queries is not None and query_stats["queries"] > max_queries:
+        violations.append(
+            f"{query_stats['queries']} queries, the budget is {max_queries}:"
+            + format_offenders(
+                (captured_query, f"{count} x")
+                for captured_query, count in classified_query[
+                    "similar_counter"
+                ].most_common(OFFENDER_LIMIT)
+            )
+        )
+    if max_duplicates is not None and query_stats["duplicates"] > max_duplicates:
+        violations.append(
+            f"Duplicate queries over the budget of {max_duplicates}:"
+            + format_offenders(
+                (captured_query, f"{count} x")
+                for captured_query, count in classified_query[
+                    "duplicates_counter"
+                ].most_common()
+                if count > max_duplicates
+            )
+        )
+    if max_similar is not None and query_stats["similar"] > max_similar:
+        violations.append(
+            f"Similar queries over the budget of {max_similar}:"
+            + format_offenders(
+                (captured_query, f"{count} x")
+                for captured_query, count in classified_query[
+                    "similar_counter"
+                ].most_common()
+                if count > max_similar
+            )
+        )
+    if max_db_time is not None and query_stats["db_time"] > max_db_time:
+        violations.append(
+            f"{query_stats['db_time']:.3f} seconds in queries, the budget is {max_db_time:.3f}:"
+            + format_offenders(
+                (captured_query, f"{captured_query['duration']:.3f}s")
+                for captured_query in sorted(
+                    classified_query["captured_queries"],
+                    key=lambda captured_query: captured_query["duration"],
+                    reverse=True,
+                )[:OFFENDER_LIMIT]
+            )
+        )
+    return violations
+
+
+def assert_query_budget(
+    classified_query: ClassifiedQuery,
+    max_queries: typing.Optional[int] = None,
+    max_duplicates: typing.Optional[int] = None,
+    max_similar: typing.Optional[int] = None,
+    max_db_time: typing.Optional[float] = None,
+) -> None:
+    """
+    Raise [QueryBudgetExceeded][test_utils.QueryBudgetExceeded] with every message of [check_query_budget][test_utils.check_query_budget].
+    """
+    __tracebackhide__ = True
+    violations = check_query_budget(
+        classified_query,
+        max_queries=max_queries,
+        max_duplicates=max_duplicates,
+        max_similar=max_similar,
+        max_db_time=max_db_time,
+    )
+    if violations:
+        raise QueryBudgetExceeded("\n".join(violations))
@@ -1,12 +1,22 @@
+import typing
+
 import io
 import sys
 from contextlib import ContextDecorator
+from functools import lru_cache
 
+import sqlparse
 from django.utils import termcolors
+from pygments import highlight
+from pygments.formatter import Formatter
+from pygments.formatters.terminal256 import TerminalTrueColorFormatter
+from pygments.lexers.sql import SqlLexer
 
 from django_query_capture.capture import CapturedQuery
 from django_query_capture.settings import get_config
 
+SQL_CACHE_SIZE = 1024
+
 
 class CaptureStdOutToString(ContextDecorator):
     def __enter__(self) -> sys.stdout:
@@ -19,6 +29,18 @@ class CaptureStdOutToString(ContextDecorator):
         sys.stdout = self.old_stdout
 
 
+@lru_cache(maxsize=None)
+def get_warning_style(color: str) -> typing.Callable[[str], str]:
+    """
+    Args:
+        color: COLOR of [PRINT_THRESHOLDS](../home/settings.md).
+
+    Returns:
+        Style of `django.utils.termcolors`, built once per color rather than for every cell of a table.
+    """
+    return termcolors.make_style(fg=color)  # type: ignore
+
+
 def colorize(value: str, is_warning: bool) -> str:
     """
     Utility to set a color for the output string when it exceeds the threshold.
@@ -31,9 +53,7 @@ def colorize(value: str, is_warning: bool) -> str:
         colorized string output
     """
     if is_warning:
-        return termcolors.make_style(fg=get_config()["PRINT_THRESHOLDS"]["COLOR"])(  # type: ignore
-            value
-        )
+        return get_warning_style(get_config()["PRINT_THRESHOLDS"]["COLOR"])(value)
     return value
 
 
@@ -57,3 +77,70 @@ def truncate_string(value: str, length: int) -> str:
         truncated string
     """
     return (value[:length] + "..") if len(value) > length else value
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def format_sql(sql: str) -> str:
+    """
+    The same N+1 statements are output again and again, so formatted SQL is kept in a bounded LRU cache shared by every Presenter.
+
+    Args:
+        sql: SQL to format.
+
+    Returns:
+        SQL reindented with upper case keywords by `sqlparse`.
+    """
+    return sqlparse.format(sql, reindent=True, keyword_case="upper")
+
+
+@lru_cache(maxsize=None)
+def get_sql_lexer() -> SqlLexer:
+    """
+    Returns:
+        `SqlLexer` built once.
+    """
+    return SqlLexer()
+
+
+@lru_cache(maxsize=32)
+def get_sql_formatter(formatter_cls: typing.Type[Formatter], style: str) -> Formatter:
+    """
+    Args:
+        formatter_cls: pygments `Formatter` class.
+        style: pygments style, e.g. [SQL_COLOR_FORMAT](../home/settings.md).
+
+    Returns:
+        Formatter built once per class and style.
+    """
+    return formatter_cls(style=style)
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def highlight_sql(
+    sql: str,
+    style: str,
+    formatter_cls: typing.Type[Formatter] = TerminalTrueColorFormatter,
+) -> str:
+    """
+    Args:
+        sql: SQL to format and highlight.
+        style: pygments style, e.g. [SQL_COLOR_FORMAT](../home/settings.md).
+        formatter_cls: pygments `Formatter` class.
+
+    Returns:
+        [Formatted][utils.format_sql] and highlighted SQL, kept in a bounded LRU cache keyed by the arguments.
+    """
+    return highlight(
+        format_sql(sql), get_sql_lexer(), get_sql_formatter(formatter_cls, style)
+    )
+
+
+def get_sql_cache_info() -> typing.Dict[str, typing.Any]:
+    """
+    Returns:
+        `hits`, `misses`, `maxsize` and `currsize` of the [format_sql][utils.format_sql] and [highlight_sql][utils.highlight_sql] caches.
+    """
+    return {
+        "format_sql": format_sql.cache_info()._asdict(),
+        "highlight_sql": highlight_sql.cache_info()._asdict(),
+    }
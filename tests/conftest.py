@@ -1,5 +1,7 @@
 import django
 
+pytest_plugins = ["pytester"]
+
 
 def pytest_configure(config):
     from django.conf import settings
@@ -8,6 +10,7 @@ def pytest_configure(config):
         DEBUG_PROPAGATE_EXCEPTIONS=True,
         DATABASES={
             "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+            "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
         },
         SECRET_KEY="not very secret in tests",
         USE_I18N=True,
@@ -0,0 +1,122 @@
+from unittest.mock import Mock
+
+from django.test import RequestFactory, TestCase, override_settings
+from news.models import Reporter
+
+from django_query_capture import QueryCaptureMiddleware
+from django_query_capture.aggregate import (
+    OTHER_FINGERPRINT,
+    OTHER_ROUTE,
+    UNRESOLVED_ROUTE,
+    EndpointAggregator,
+    get_endpoint_aggregator,
+    get_endpoint_key,
+)
+from django_query_capture.capture import CapturedQuery
+
+
+def make_captured_query(raw_sql, duration=0.01):
+    return CapturedQuery(
+        raw_sql=raw_sql,
+        raw_params=None,
+        many=False,
+        duration=duration,
+        file_name=__file__,
+        function_name="make_captured_query",
+        line_no=0,
+        alias="default",
+    )
+
+
+class EndpointAggregatorTests(TestCase):
+    def test_record(self):
+        aggregator = EndpointAggregator()
+        for _ in range(3):
+            aggregator.record(
+                "reporters/<int:pk>/",
+                "GET",
+                [
+                    make_captured_query('SELECT * FROM "a" WHERE id = 1', 0.01),
+                    make_captured_query('SELECT * FROM "a" WHERE id = 2', 0.03),
+                ],
+            )
+        endpoint_stats = aggregator.snapshot()[("reporters/<int:pk>/", "GET")]
+        self.assertEqual(endpoint_stats.request_count, 3)
+        self.assertEqual(endpoint_stats.query_count, 6)
+        self.assertAlmostEqual(endpoint_stats.db_time, 0.12)
+        summary = endpoint_stats.to_dict()
+        self.assertAlmostEqual(summary["db_time_percentiles"]["p50"], 0.04, delta=0.001)
+        self.assertEqual(len(summary["fingerprints"]), 1)
+        self.assertEqual(summary["fingerprints"][0]["count"], 6)
+
+    def test_bounded(self):
+        aggregator = EndpointAggregator(max_endpoints=2, max_fingerprints=2)
+        for i in range(4):
+            aggregator.record(
+                f"route-{i}/",
+                "GET",
+                [make_captured_query(f'SELECT * FROM "table_{j}"') for j in range(4)],
+            )
+        snapshot = aggregator.snapshot()
+        self.assertEqual(
+            set(snapshot),
+            {("route-0/", "GET"), ("route-1/", "GET"), (OTHER_ROUTE, "GET")},
+        )
+        self.assertEqual(snapshot[(OTHER_ROUTE, "GET")].request_count, 2)
+        fingerprints = snapshot[("route-0/", "GET")].fingerprints
+        self.assertEqual(len(fingerprints), 3)
+        self.assertEqual(fingerprints[OTHER_FINGERPRINT].count, 2)
+
+    def test_snapshot_and_reset(self):
+        aggregator = EndpointAggregator()
+        aggregator.record("a/", "GET", [make_captured_query("SELECT 1")])
+        snapshot = aggregator.snapshot()
+        aggregator.record("a/", "GET", [make_captured_query("SELECT 1")])
+        self.assertEqual(snapshot[("a/", "GET")].request_count, 1)
+        self.assertEqual(
+            aggregator.snapshot(reset=True)[("a/", "GET")].request_count, 2
+        )
+        self.assertEqual(aggregator.snapshot(), {})
+
+    def test_merge(self):
+        left, right = EndpointAggregator(), EndpointAggregator()
+        left.record("a/", "GET", [make_captured_query("SELECT 1", 0.01)])
+        right.record("a/", "GET", [make_captured_query("SELECT 1", 0.02)])
+        endpoint_stats = left.snapshot()[("a/", "GET")]
+        endpoint_stats.merge(right.snapshot()[("a/", "GET")])
+        self.assertEqual(endpoint_stats.request_count, 2)
+        self.assertAlmostEqual(endpoint_stats.db_time, 0.03)
+
+    def test_get_endpoint_key(self):
+        request = RequestFactory().post("/reporters/1/")
+        self.assertEqual(get_endpoint_key(request), (UNRESOLVED_ROUTE, "POST"))
+        request.resolver_match = Mock(route="reporters/<int:pk>/")
+        self.assertEqual(get_endpoint_key(request), ("reporters/<int:pk>/", "POST"))
+
+
+def get_response(request):
+    request.resolver_match = Mock(route="reporters/")
+    list(Reporter.objects.all())
+    list(Reporter.objects.all())
+
+
+@override_settings(
+    QUERY_CAPTURE={
+        "PRESENTER": "django_query_capture.presenter.OnlySlowQueryPresenter",
+        "AGGREGATE": {
+            "ENABLED": True,
+            "MAX_ENDPOINTS": 10,
+            "MAX_FINGERPRINTS": 10,
+            "RELATIVE_ACCURACY": 0.01,
+        },
+    }
+)
+class AggregateMiddlewareTests(TestCase):
+    def test_middleware_aggregate(self):
+        middleware = QueryCaptureMiddleware(get_response)
+        middleware(RequestFactory().get("/reporters/"))
+        middleware(RequestFactory().get("/reporters/"))
+        snapshot = get_endpoint_aggregator().snapshot(reset=True)
+        endpoint_stats = snapshot[("reporters/", "GET")]
+        self.assertEqual(endpoint_stats.request_count, 2)
+        self.assertEqual(endpoint_stats.query_count, 4)
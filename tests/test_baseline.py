@@ -0,0 +1,122 @@
+from django.test import TestCase, override_settings
+from news.models import Reporter
+from test_presenter.utils import ConsoleOutputTestCaseMixin
+
+from django_query_capture import native_query_capture, query_capture
+from django_query_capture.baseline import (
+    BaselineStore,
+    QueryBaseline,
+    get_baseline_store,
+)
+from django_query_capture.export import serialize_classified_query
+
+BASELINE_SETTINGS = {
+    "BASELINE": {
+        "ENABLED": True,
+        "MAX_FINGERPRINTS": 100,
+        "ALPHA": 0.1,
+        "FACTOR": 3.0,
+        "DEVIATIONS": 3.0,
+        "MIN_SAMPLES": 5,
+        "MIN_DURATION": 0,
+    }
+}
+
+
+class BaselineStoreTests(TestCase):
+    def test_query_baseline(self):
+        baseline = QueryBaseline()
+        baseline.add(1.0, 0.5)
+        self.assertEqual((baseline.mean, baseline.variance), (1.0, 0.0))
+        baseline.add(3.0, 0.5)
+        self.assertEqual(baseline.mean, 2.0)
+        self.assertEqual(baseline.variance, 1.0)
+        self.assertEqual(baseline.stddev, 1.0)
+
+    def test_anomaly(self):
+        store = BaselineStore(alpha=0.1, min_samples=5, min_duration=0.001)
+        for _ in range(5):
+            self.assertIsNone(store.observe("select ?", 0.005))
+        self.assertIsNone(store.observe("select ?", 0.01))
+        self.assertAlmostEqual(store.observe("select ?", 0.08), 0.0055)
+        self.assertIsNone(store.observe("select ? from t", 0.08))
+
+    def test_zero_baseline(self):
+        store = BaselineStore(min_samples=1, min_duration=0)
+        for _ in range(5):
+            store.observe("select ?", 0.0)
+        self.assertIsNone(store.observe("select ?", 0.08))
+
+    def test_min_samples_and_duration(self):
+        store = BaselineStore(min_samples=5, min_duration=0.1)
+        for _ in range(4):
+            store.observe("select ?", 0.005)
+        self.assertIsNone(store.observe("select ?", 0.08))
+        self.assertIsNone(store.observe("select ?", 0.08))
+
+    def test_adapts(self):
+        store = BaselineStore(alpha=0.5, min_samples=1, min_duration=0)
+        store.observe("select ?", 0.005)
+        self.assertIsNotNone(store.observe("select ?", 0.08))
+        for _ in range(10):
+            store.observe("select ?", 0.08)
+        self.assertIsNone(store.observe("select ?", 0.08))
+
+    def test_lru_eviction(self):
+        store = BaselineStore(max_fingerprints=2)
+        store.observe("a", 0.1)
+        store.observe("b", 0.1)
+        store.observe("a", 0.1)
+        store.observe("c", 0.1)
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a").count, 2)
+
+    def test_invalid_alpha(self):
+        with self.assertRaises(ValueError):
+            BaselineStore(alpha=0)
+
+
+@override_settings(QUERY_CAPTURE=BASELINE_SETTINGS)
+class BaselineCaptureTests(ConsoleOutputTestCaseMixin, TestCase):
+    def prime(self) -> str:
+        with native_query_capture() as capture:
+            list(Reporter.objects.all())
+        fingerprint = capture.captured_queries[0]["fingerprint"]
+        get_baseline_store.cache_clear()
+        store = get_baseline_store()
+        for _ in range(5):
+            store.observe(fingerprint, 1e-9)
+        return fingerprint
+
+    def test_anomalous_captured_queries(self):
+        fingerprint = self.prime()
+        capture = query_capture()
+        with capture:
+            list(Reporter.objects.all())
+        classified_query = capture.classifier
+        (anomalous_query,) = classified_query["anomalous_captured_queries"]
+        self.assertEqual(anomalous_query["fingerprint"], fingerprint)
+        self.assertEqual(anomalous_query["baseline_duration"], 1e-9)
+        self.assertTrue(classified_query["has_over_threshold"])
+        self.assertIn("Regressed", self.capture_output.getvalue())
+        record = serialize_classified_query(classified_query)
+        self.assertEqual(record["anomalies"][0]["fingerprint"], fingerprint)
+
+    def test_nested_captures_observe_once(self):
+        fingerprint = self.prime()
+        count = get_baseline_store().get(fingerprint).count
+        with native_query_capture() as outer_capture, native_query_capture() as capture:
+            list(Reporter.objects.all())
+        self.assertEqual(get_baseline_store().get(fingerprint).count, count + 1)
+        self.assertIs(outer_capture.captured_queries[0], capture.captured_queries[0])
+
+    def test_disabled(self):
+        with override_settings(QUERY_CAPTURE={}):
+            capture = query_capture(ignore_output=True)
+            with capture:
+                list(Reporter.objects.all())
+        self.assertEqual(capture.classifier["anomalous_captured_queries"], [])
+        self.assertIsNone(
+            capture.classifier["captured_queries"][0]["baseline_duration"]
+        )
@@ -0,0 +1,59 @@
+import os
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from news.models import Reporter
+
+from django_query_capture import native_query_capture
+from django_query_capture.call_site import (
+    clear_call_site_cache,
+    get_call_site,
+    is_library_file,
+)
+
+
+class CallSiteTests(TestCase):
+    def test_capture_call_site(self):
+        with native_query_capture() as capture:
+            Reporter.objects.create(full_name="target")
+        captured_query = capture.captured_queries[0]
+        self.assertEqual(captured_query["function_name"], "test_capture_call_site")
+        self.assertEqual(captured_query["file_name"], __file__)
+
+    def test_get_call_site(self):
+        file_name, function_name, line_no = get_call_site()
+        self.assertEqual(function_name, "test_get_call_site")
+        self.assertEqual(file_name, __file__)
+        self.assertGreater(line_no, 0)
+
+    def test_library_file(self):
+        self.assertTrue(is_library_file(os.__file__))
+        self.assertFalse(is_library_file(__file__))
+
+    def test_site_packages(self):
+        with patch(
+            "django_query_capture.call_site.site.getsitepackages",
+            return_value=["/usr/lib/python3/dist-packages"],
+        ):
+            clear_call_site_cache()
+            try:
+                self.assertTrue(
+                    is_library_file("/usr/lib/python3/dist-packages/django/db.py")
+                )
+            finally:
+                clear_call_site_cache()
+
+    @override_settings(
+        QUERY_CAPTURE={"LIBRARY_PATH_PREFIXES": [os.path.dirname(__file__)]}
+    )
+    def test_library_path_prefixes(self):
+        self.assertTrue(is_library_file(__file__))
+
+    @override_settings(
+        QUERY_CAPTURE={
+            "LIBRARY_PATH_PREFIXES": [os.path.dirname(__file__)],
+            "PROJECT_PATH_PREFIXES": [__file__],
+        }
+    )
+    def test_project_path_prefixes(self):
+        self.assertFalse(is_library_file(__file__))
@@ -0,0 +1,104 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from news.models import Reporter
+
+from django_query_capture import CapturedQueryClassifier, native_query_capture
+from django_query_capture.capture import render_sql
+from django_query_capture.classify import (
+    IgnorePatternMatcher,
+    get_ignore_pattern_matcher,
+)
+
+
+class CapturedQueryClassifierTests(TestCase):
+    def test_duplicate_by_raw_sql_and_params(self):
+        with native_query_capture() as q:
+            [Reporter.objects.filter(full_name="target-1").exists() for i in range(3)]
+            [Reporter.objects.filter(full_name="target-2").exists() for i in range(2)]
+        with patch(
+            "django_query_capture.capture.render_sql", wraps=render_sql
+        ) as mock_render_sql:
+            classified_query = CapturedQueryClassifier(q.captured_queries)()
+        self.assertEqual(
+            sorted(classified_query["duplicates_counter"].values()), [2, 3]
+        )
+        self.assertEqual(list(classified_query["similar_counter"].values()), [5])
+        self.assertFalse(mock_render_sql.called)
+
+    def test_classify_online(self):
+        with native_query_capture() as q:
+            [Reporter.objects.create(full_name="target") for i in range(12)]
+            [list(Reporter.objects.all()) for i in range(3)]
+        batch = CapturedQueryClassifier(q.captured_queries)()
+
+        classifier = CapturedQueryClassifier()
+        for captured_query in q.captured_queries:
+            classifier.captured_queries.append(captured_query)
+            classifier.classify(captured_query)
+        online = classifier()
+
+        for key in ("read", "writes", "total", "total_duration", "has_over_threshold"):
+            self.assertEqual(online[key], batch[key])
+        self.assertEqual(online["duplicates_counter"], batch["duplicates_counter"])
+        self.assertEqual(
+            online["duplicates_counter_over_threshold"],
+            batch["duplicates_counter_over_threshold"],
+        )
+        self.assertEqual(online["most_common_duplicate"][1], 12)
+        self.assertIs(
+            online["most_common_duplicate"][0].captured_query, q.captured_queries[0]
+        )
+
+    def test_ignore_patterns(self):
+        with native_query_capture() as q:
+            Reporter.objects.create(full_name="target")
+            list(Reporter.objects.all())
+        classified_query = CapturedQueryClassifier(
+            q.captured_queries, ignore_patterns=["^INSERT"]
+        )()
+        self.assertEqual(classified_query["total"], 1)
+        self.assertEqual(classified_query["read"], 1)
+        self.assertEqual(len(classified_query["captured_queries"]), 2)
+
+
+class IgnorePatternMatcherTests(TestCase):
+    def test_combined_patterns(self):
+        matcher = IgnorePatternMatcher(["^INSERT", "django_session"])
+        self.assertEqual(len(matcher.regexes), 1)
+        self.assertTrue(matcher.is_ignored('INSERT INTO "news_reporter"'))
+        self.assertTrue(matcher.is_ignored('SELECT * FROM "django_session"'))
+        self.assertFalse(matcher.is_ignored('SELECT * FROM "news_reporter"'))
+
+    def test_patterns_with_global_flags(self):
+        matcher = IgnorePatternMatcher(["(?i)^insert", "django_session"])
+        self.assertEqual(len(matcher.regexes), 2)
+        self.assertTrue(matcher.is_ignored('INSERT INTO "news_reporter"'))
+        self.assertTrue(matcher.is_ignored('SELECT * FROM "django_session"'))
+
+    def test_patterns_with_backreferences(self):
+        matcher = IgnorePatternMatcher(["(django_session)", r"^SELECT (\w+) FROM \1"])
+        self.assertEqual(len(matcher.regexes), 2)
+        self.assertTrue(matcher.is_ignored("SELECT t FROM t"))
+        self.assertFalse(matcher.is_ignored("SELECT t FROM u"))
+
+    def test_verdict_cache(self):
+        matcher = IgnorePatternMatcher(["^INSERT"])
+        for i in range(3):
+            matcher.is_ignored('INSERT INTO "news_reporter"')
+        self.assertEqual(matcher.is_ignored.cache_info().hits, 2)
+
+    def test_shared_matcher(self):
+        self.assertIs(
+            get_ignore_pattern_matcher(("^INSERT",)),
+            get_ignore_pattern_matcher(("^INSERT",)),
+        )
+
+
+class SimilarFingerprintTests(TestCase):
+    def test_similar_in_lists(self):
+        with native_query_capture() as q:
+            [list(Reporter.objects.filter(pk__in=range(i))) for i in range(1, 12)]
+        classified_query = CapturedQueryClassifier(q.captured_queries)()
+        self.assertEqual(list(classified_query["similar_counter"].values()), [11])
+        self.assertEqual(len(classified_query["similar_counter_over_threshold"]), 1)
@@ -0,0 +1,153 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from news.models import Reporter
+from test_presenter.utils import ConsoleOutputTestCaseMixin
+
+from django_query_capture import (
+    QueryCaptureMiddleware,
+    native_query_capture,
+    query_capture,
+)
+from django_query_capture.explain import (
+    ExplainCache,
+    explain_query,
+    get_explain_cache,
+    get_explain_executor,
+)
+from django_query_capture.presenter import PrettyPresenter
+
+EXPLAIN_SETTINGS = {
+    "EXPLAIN": {"ENABLED": True, "CACHE_SIZE": 10, "TTL": 3600},
+    "PRINT_THRESHOLDS": {
+        "SLOW_MIN_SECOND": None,
+        "DUPLICATE_MIN_COUNT": None,
+        "SIMILAR_MIN_COUNT": 2,
+        "COLOR": "magenta",
+    },
+}
+
+
+class ExplainCacheTests(SimpleTestCase):
+    def test_lru_eviction(self):
+        explain_cache = ExplainCache(max_size=2)
+        explain_cache.set("a", None)
+        explain_cache.set("b", None)
+        explain_cache.get("a")
+        explain_cache.set("c", None)
+        self.assertEqual(explain_cache.get("a"), (True, None))
+        self.assertEqual(explain_cache.get("b"), (False, None))
+        self.assertEqual(len(explain_cache), 2)
+
+    def test_ttl(self):
+        explain_cache = ExplainCache(ttl=10)
+        with mock.patch("django_query_capture.explain.time.monotonic", return_value=0):
+            explain_cache.set("a", None)
+        with mock.patch("django_query_capture.explain.time.monotonic", return_value=5):
+            self.assertTrue(explain_cache.get("a")[0])
+        with mock.patch("django_query_capture.explain.time.monotonic", return_value=11):
+            self.assertFalse(explain_cache.get("a")[0])
+        self.assertEqual(len(explain_cache), 0)
+
+
+def run_similar_queries():
+    for i in range(3):
+        list(Reporter.objects.filter(full_name=f"reporter-{i}"))
+
+
+async def async_get_response(request):
+    await sync_to_async(run_similar_queries)()
+
+
+@override_settings(QUERY_CAPTURE=EXPLAIN_SETTINGS)
+class ExplainTests(ConsoleOutputTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        get_explain_cache.cache_clear()
+
+    def run_similar_queries(self, ignore_output=False):
+        capture = query_capture(ignore_output=ignore_output)
+        with capture:
+            run_similar_queries()
+        get_explain_executor().submit(lambda: None).result()
+        return capture.classifier
+
+    def test_full_scan(self):
+        with native_query_capture() as outer_capture:
+            self.assertEqual(self.run_similar_queries()["query_plans"], {})
+            classified_query = self.run_similar_queries()
+        self.assertEqual(len(outer_capture.captured_queries), 6)
+        ((key, query_plan),) = classified_query["query_plans"].items()
+        self.assertEqual(key, f'default:{query_plan["fingerprint"]}')
+        self.assertEqual(query_plan["alias"], "default")
+        self.assertTrue(query_plan["full_scans"])
+        self.assertIn("SCAN", query_plan["full_scans"][0])
+
+        PrettyPresenter(classified_query).print()
+        output = self.capture_output.getvalue()
+        self.assertIn("Plan (full scan):", output)
+        self.assertIn(query_plan["full_scans"][0], output)
+
+    def test_explained_once(self):
+        with mock.patch(
+            "django_query_capture.explain.explain_query", wraps=explain_query
+        ) as mocked_explain_query:
+            self.run_similar_queries()
+            self.run_similar_queries()
+        self.assertEqual(mocked_explain_query.call_count, 1)
+        self.assertEqual(len(get_explain_cache()), 1)
+
+    def test_not_explained_in_block(self):
+        with mock.patch(
+            "django_query_capture.explain.explain_query", wraps=explain_query
+        ) as mocked_explain_query:
+            capture = query_capture()
+            with capture:
+                run_similar_queries()
+            self.assertEqual(mocked_explain_query.call_count, 0)
+            get_explain_executor().submit(lambda: None).result()
+        self.assertEqual(mocked_explain_query.call_count, 1)
+
+    def test_ignore_output(self):
+        with mock.patch(
+            "django_query_capture.explain.explain_query", wraps=explain_query
+        ) as mocked_explain_query:
+            self.assertEqual(
+                self.run_similar_queries(ignore_output=True)["query_plans"], {}
+            )
+        self.assertEqual(mocked_explain_query.call_count, 0)
+
+    def test_index_search(self):
+        for _ in range(2):
+            capture = query_capture()
+            with capture:
+                for i in range(3):
+                    list(Reporter.objects.filter(pk=i))
+            get_explain_executor().submit(lambda: None).result()
+        (query_plan,) = capture.classifier["query_plans"].values()
+        self.assertEqual(query_plan["full_scans"], [])
+
+    def test_disabled(self):
+        with override_settings(QUERY_CAPTURE={}):
+            self.assertEqual(self.run_similar_queries()["query_plans"], {})
+
+    def test_async_middleware(self):
+        middleware = QueryCaptureMiddleware(async_get_response)
+        asyncio.run(middleware(RequestFactory().get("/")))
+        self.assertNotIn("Plan", self.capture_output.getvalue())
+        get_explain_executor().submit(lambda: None).result()
+        self.assertEqual(len(get_explain_cache()), 1)
+
+        asyncio.run(middleware(RequestFactory().get("/")))
+        self.assertIn("Plan (full scan):", self.capture_output.getvalue())
+
+    def test_explain_error_does_not_fail_block(self):
+        with mock.patch(
+            "django_query_capture.explain.transaction.atomic",
+            side_effect=RuntimeError,
+        ):
+            self.run_similar_queries()
+            classified_query = self.run_similar_queries()
+        self.assertEqual(classified_query["query_plans"], {})
@@ -0,0 +1,127 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from django_query_capture import export
+from django_query_capture.export import RotatingJsonLinesWriter, dumps
+
+
+class DumpsTests(SimpleTestCase):
+    def test_dumps(self):
+        self.assertEqual(
+            json.loads(dumps({"a": [1, 2.5, None]})), {"a": [1, 2.5, None]}
+        )
+        self.assertEqual(json.loads(dumps({"a": object})), {"a": str(object)})
+
+    def test_dumps_without_orjson(self):
+        with patch.object(export, "orjson", None):
+            self.assertEqual(dumps({"a": "b"}), b'{"a":"b"}')
+
+
+class RotatingJsonLinesWriterTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "capture-{pid}.jsonl")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_buffer(self):
+        writer = RotatingJsonLinesWriter(self.path, buffer_size=3, flush_interval=60)
+        self.assertIn(str(os.getpid()), writer.path)
+        writer.write({"i": 0})
+        writer.write({"i": 1})
+        self.assertFalse(os.path.exists(writer.path))
+        writer.write({"i": 2})
+        with open(writer.path) as file:
+            self.assertEqual([json.loads(line)["i"] for line in file], [0, 1, 2])
+        writer.write({"i": 3})
+        writer.close()
+        with open(writer.path) as file:
+            self.assertEqual(len(file.readlines()), 4)
+
+    def test_rotate_by_size(self):
+        writer = RotatingJsonLinesWriter(
+            self.path, max_bytes=1, backup_count=2, buffer_size=1
+        )
+        for i in range(4):
+            writer.write({"i": i})
+        writer.close()
+        self.assertFalse(os.path.exists(writer.path))
+        with open(writer.path + ".1") as file:
+            self.assertEqual(json.loads(file.read())["i"], 3)
+        with open(writer.path + ".2") as file:
+            self.assertEqual(json.loads(file.read())["i"], 2)
+        self.assertFalse(os.path.exists(writer.path + ".3"))
+
+    def test_truncate_without_backup(self):
+        writer = RotatingJsonLinesWriter(
+            self.path, max_bytes=20, backup_count=0, buffer_size=1
+        )
+        for i in range(3):
+            writer.write({"i": i})
+        self.assertEqual(os.path.getsize(writer.path), 0)
+        writer.write({"i": 3})
+        writer.close()
+        with open(writer.path) as file:
+            self.assertEqual([json.loads(line)["i"] for line in file], [3])
+        self.assertEqual(
+            os.listdir(self.directory.name), [os.path.basename(writer.path)]
+        )
+
+    def test_compress_without_lock(self):
+        writer = RotatingJsonLinesWriter(
+            self.path, max_bytes=1, compress=True, buffer_size=1
+        )
+        copyfileobj = export.shutil.copyfileobj
+        locked = []
+
+        def locked_copyfileobj(*args, **kwargs):
+            locked.append(writer._lock.locked())
+            return copyfileobj(*args, **kwargs)
+
+        with patch.object(export.shutil, "copyfileobj", locked_copyfileobj):
+            writer.write({"i": 0})
+            writer.write({"i": 1})
+        writer.close()
+        self.assertEqual(locked, [False, False])
+        with gzip.open(writer.path + ".1.gz", "rt") as file:
+            self.assertEqual(json.loads(file.read()), {"i": 1})
+        with gzip.open(writer.path + ".2.gz", "rt") as file:
+            self.assertEqual(json.loads(file.read()), {"i": 0})
+
+    def test_rotate_quiet_file_by_time(self):
+        writer = RotatingJsonLinesWriter(self.path, rotate_interval=60, buffer_size=1)
+        writer.write({"i": 0})
+        writer._opened_at -= 120
+        writer.flush()
+        self.assertFalse(os.path.exists(writer.path))
+        writer.write({"i": 1})
+        writer.close()
+        with open(writer.path + ".1") as file:
+            self.assertEqual(json.loads(file.read()), {"i": 0})
+        with open(writer.path) as file:
+            self.assertEqual(json.loads(file.read()), {"i": 1})
+
+    def test_forked_writer(self):
+        writer = RotatingJsonLinesWriter(self.path, buffer_size=10, flush_interval=60)
+        writer.write({"i": 0})
+        with patch.object(export.os, "getpid", return_value=1):
+            writer.write({"i": 1})
+            writer.close()
+            self.assertTrue(writer.path.endswith("capture-1.jsonl"))
+            with open(writer.path) as file:
+                self.assertEqual([json.loads(line)["i"] for line in file], [1])
+
+    def test_rotate_by_time_compressed(self):
+        writer = RotatingJsonLinesWriter(
+            self.path, rotate_interval=0, compress=True, buffer_size=1
+        )
+        writer.write({"i": 0})
+        writer.close()
+        with gzip.open(writer.path + ".1.gz", "rt") as file:
+            self.assertEqual(json.loads(file.read()), {"i": 0})
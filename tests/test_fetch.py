@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from news.models import Reporter
+from test_presenter.utils import ConsoleOutputTestCaseMixin
+
+from django_query_capture import native_query_capture, query_capture
+from django_query_capture.classify import CapturedQueryClassifier
+from django_query_capture.presenter import PrettyPresenter
+
+FETCH_SETTINGS = {"FETCH": {"ENABLED": True, "UNBOUNDED_MIN_ROWS": 5}}
+
+
+@override_settings(QUERY_CAPTURE=FETCH_SETTINGS)
+class FetchTests(ConsoleOutputTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Reporter.objects.bulk_create(
+            Reporter(full_name=f"reporter-{i}") for i in range(10)
+        )
+
+    def test_rows_fetched_and_affected(self):
+        with native_query_capture() as capture:
+            list(Reporter.objects.all())
+            Reporter.objects.update(full_name="reporter")
+        select, update = capture.captured_queries
+        self.assertEqual(select["rows_fetched"], 10)
+        self.assertGreaterEqual(select["fetch_duration"], 0)
+        self.assertIsNone(select["rows_affected"])
+        self.assertEqual(update["rows_fetched"], 0)
+        self.assertEqual(update["rows_affected"], 10)
+
+    def test_cursor_methods(self):
+        with native_query_capture() as outer_capture, native_query_capture() as capture:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT id FROM news_reporter")
+                cursor.fetchone()
+                cursor.fetchmany(3)
+                list(cursor)
+                cursor.execute("SELECT id FROM news_reporter")
+                cursor.fetchall()
+        self.assertEqual(
+            [
+                captured_query["rows_fetched"]
+                for captured_query in capture.captured_queries
+            ],
+            [10, 10],
+        )
+        self.assertEqual(
+            [
+                captured_query["rows_fetched"]
+                for captured_query in outer_capture.captured_queries
+            ],
+            [10, 10],
+        )
+
+    def test_uncaptured_query_on_same_cursor(self):
+        with connection.cursor() as cursor:
+            with native_query_capture() as capture:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            cursor.execute("SELECT id FROM news_reporter")
+            cursor.fetchall()
+        self.assertEqual(capture.captured_queries[0]["rows_fetched"], 1)
+
+    def test_unbounded(self):
+        capture = query_capture(ignore_output=True)
+        with capture:
+            list(Reporter.objects.all())
+            list(Reporter.objects.all()[:3])
+        (unbounded,) = capture.classifier["unbounded_captured_queries"]
+        self.assertEqual(unbounded["rows_fetched"], 10)
+        self.assertTrue(capture.classifier["has_over_threshold"])
+
+        PrettyPresenter(capture.classifier).print()
+        self.assertIn("Unbounded 10 rows fetched", self.capture_output.getvalue())
+
+    def test_unbounded_has_over_threshold(self):
+        with native_query_capture() as capture:
+            list(Reporter.objects.all())
+        classifier = CapturedQueryClassifier(capture.captured_queries)
+        self.assertTrue(classifier.has_over_threshold)
+        self.assertTrue(classifier()["has_over_threshold"])
+
+    def test_disabled(self):
+        with override_settings(QUERY_CAPTURE={}):
+            with native_query_capture() as capture:
+                list(Reporter.objects.all())
+            self.assertEqual(capture.captured_queries[0]["rows_fetched"], 0)
+            self.assertEqual(
+                CapturedQueryClassifier(capture.captured_queries)()[
+                    "unbounded_captured_queries"
+                ],
+                [],
+            )
@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase
+
+from django_query_capture.fingerprint import fingerprint
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_collapse_in_list(self):
+        self.assertEqual(
+            fingerprint('SELECT "id" FROM "news_reporter" WHERE "id" IN (%s, %s)'),
+            fingerprint('SELECT "id" FROM "news_reporter" WHERE "id" IN (%s, %s, %s)'),
+        )
+
+    def test_collapse_values_list(self):
+        self.assertEqual(
+            fingerprint('INSERT INTO "news_reporter" ("full_name") VALUES (%s)'),
+            fingerprint(
+                'INSERT INTO "news_reporter" ("full_name") VALUES (%s), (%s), (%s)'
+            ),
+        )
+
+    def test_normalize_literals(self):
+        self.assertEqual(
+            fingerprint(
+                "SELECT * FROM news_reporter WHERE id = 5 AND full_name = 'it''s'"
+            ),
+            "select * from news_reporter where id = ? and full_name = ?",
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM news_reporter2 WHERE id = 1.5e3"),
+            "select * from news_reporter2 where id = ?",
+        )
+
+    def test_normalize_whitespace_comments_and_quoting(self):
+        self.assertEqual(
+            fingerprint('SELECT  "id"\n FROM `news_reporter` /* comment */ -- end'),
+            "select id from news_reporter",
+        )
+
+    def test_different_queries(self):
+        self.assertNotEqual(
+            fingerprint('SELECT "id" FROM "news_reporter"'),
+            fingerprint('SELECT "id" FROM "news_article"'),
+        )
@@ -2,7 +2,13 @@ from django.test import TestCase
 from news.models import Reporter
 from test_presenter.utils import ConsoleOutputTestCaseMixin
 
-from django_query_capture.test_utils import AssertInefficientQuery
+from django_query_capture import query_capture
+from django_query_capture.test_utils import (
+    AssertInefficientQuery,
+    QueryBudgetExceeded,
+    assert_query_budget,
+    check_query_budget,
+)
 
 
 class AssertInefficientQueryTests(ConsoleOutputTestCaseMixin, TestCase):
@@ -11,3 +17,31 @@ class AssertInefficientQueryTests(ConsoleOutputTestCaseMixin, TestCase):
             with AssertInefficientQuery(199, 0):
                 [list(Reporter.objects.all()) for i in range(200)]
                 [Reporter.objects.create(full_name=f"reporter-{i}") for i in range(200)]
+
+
+class QueryBudgetTests(TestCase):
+    def test_within_budget(self):
+        with query_capture(ignore_output=True) as capture:
+            [Reporter.objects.create(full_name=f"reporter-{i}") for i in range(3)]
+        self.assertEqual(
+            check_query_budget(
+                capture.classifier(), max_queries=3, max_duplicates=1, max_db_time=1
+            ),
+            [],
+        )
+
+    def test_over_budget(self):
+        with query_capture(ignore_output=True) as capture:
+            [list(Reporter.objects.all()) for i in range(3)]
+            Reporter.objects.create(full_name="reporter")
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            assert_query_budget(
+                capture.classifier(), max_queries=2, max_duplicates=2, max_db_time=0
+            )
+        message = str(context.exception)
+        self.assertIn("4 queries, the budget is 2:", message)
+        self.assertIn("Duplicate queries over the budget of 2:", message)
+        self.assertIn("3 x select", message)
+        self.assertIn("seconds in queries, the budget is 0.000:", message)
+        self.assertIn("test_over_budget", message)
+        self.assertNotIn("Similar", message)
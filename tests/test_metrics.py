@@ -0,0 +1,258 @@
+import json
+import os
+import tempfile
+import threading
+import urllib.request
+from unittest.mock import Mock, patch
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.test import RequestFactory, TestCase, override_settings
+from news.models import Reporter
+from test_presenter.utils import ConsoleOutputTestCaseMixin
+
+from django_query_capture import QueryCaptureMiddleware, query_capture
+from django_query_capture.metrics import (
+    CONTENT_TYPE,
+    MetricsRegistry,
+    MultiProcessWriter,
+    collect_multiprocess,
+    get_metrics_registry,
+    get_multiprocess_writer,
+    get_verb,
+    mark_process_dead,
+    metrics_app,
+    metrics_view,
+    reset_after_fork,
+)
+
+METRICS_CONFIG = {
+    "ENABLED": True,
+    "MAX_SERIES": 1000,
+    "DURATION_BUCKETS": [0.001, 0.01, 0.1, 1],
+    "MULTIPROCESS_DIR": None,
+    "FLUSH_INTERVAL": 1.0,
+}
+
+
+def get_response(request):
+    request.resolver_match = Mock(route="reporters/")
+    [Reporter.objects.create(full_name="target") for _ in range(3)]
+    list(Reporter.objects.all())
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class MetricsRegistryTests(TestCase):
+    def record(self, registry, endpoint="reporters/"):
+        with query_capture(ignore_output=True) as capture:
+            get_response(Mock())
+        registry.record(endpoint, "GET", capture.classifier(), capture.captured_queries)
+
+    def test_get_verb(self):
+        self.assertEqual(get_verb('SELECT "id" FROM "a"'), "SELECT")
+        self.assertEqual(get_verb("  insert into a values (1)"), "INSERT")
+        self.assertEqual(get_verb("PRAGMA foreign_keys"), "OTHER")
+
+    def test_expose(self):
+        registry = MetricsRegistry(buckets=[0.001, 0.01, 1])
+        self.record(registry)
+        output = registry.expose()
+        self.assertIn("# TYPE django_query_capture_queries counter", output)
+        self.assertIn(
+            'django_query_capture_queries_total{alias="default",verb="INSERT",endpoint="reporters/",method="GET"} 3.0',
+            output,
+        )
+        self.assertIn(
+            'django_query_capture_requests_total{endpoint="reporters/",method="GET"} 1.0',
+            output,
+        )
+        self.assertIn(
+            'django_query_capture_duplicate_queries_total{endpoint="reporters/",method="GET"} 2.0',
+            output,
+        )
+        self.assertIn(
+            'django_query_capture_query_duration_seconds_bucket{alias="default",le="+Inf"} 4',
+            output,
+        )
+        self.assertIn(
+            'django_query_capture_query_duration_seconds_count{alias="default"} 4',
+            output,
+        )
+        self.assertTrue(output.endswith("# EOF\n"))
+
+    def test_bounded_series(self):
+        registry = MetricsRegistry(max_series=2, buckets=[1])
+        for i in range(4):
+            self.record(registry, endpoint=f'route-{i}/"')
+        self.assertEqual(len(registry.requests.values), 3)
+        self.assertEqual(registry.requests.values[("other", "other")], 2)
+        self.assertIn('endpoint="route-0/\\""', registry.expose())
+
+    def test_multiprocess(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for pid in range(2):
+                registry = MetricsRegistry(buckets=METRICS_CONFIG["DURATION_BUCKETS"])
+                self.record(registry)
+                with open(
+                    os.path.join(directory, f"django_query_capture_{pid}.json"), "w"
+                ) as file:
+                    json.dump(registry.to_dict(), file)
+            with override_settings(QUERY_CAPTURE={"METRICS": METRICS_CONFIG}):
+                merged = collect_multiprocess(directory)
+        self.assertEqual(merged.requests.values[("reporters/", "GET")], 2)
+        self.assertEqual(
+            sum(merged.query_duration_seconds.values[("default",)][:-1]), 8
+        )
+
+    def test_multiprocess_writer(self):
+        registry = MetricsRegistry(buckets=METRICS_CONFIG["DURATION_BUCKETS"])
+        with tempfile.TemporaryDirectory() as directory:
+            writer = MultiProcessWriter(registry, directory, 60)
+            writer.maybe_flush()
+            self.assertEqual(os.listdir(directory), [os.path.basename(writer.path)])
+            self.record(registry)
+            writer.maybe_flush()
+            with open(writer.path) as file:
+                self.assertEqual(json.load(file)["django_query_capture_requests"], [])
+            writer.flush()
+            with open(writer.path) as file:
+                self.assertEqual(
+                    json.load(file)["django_query_capture_requests"],
+                    [[["reporters/", "GET"], 1]],
+                )
+
+    def test_idle_writer(self):
+        registry = MetricsRegistry(buckets=METRICS_CONFIG["DURATION_BUCKETS"])
+        with tempfile.TemporaryDirectory() as directory:
+            writer = MultiProcessWriter(registry, directory, 0.05)
+            writer.maybe_flush()
+            self.record(registry)
+            writer.maybe_flush()
+            writer._timer.join()
+            with open(writer.path) as file:
+                self.assertEqual(
+                    json.load(file)["django_query_capture_requests"],
+                    [[["reporters/", "GET"], 1]],
+                )
+
+    def test_forked_writer(self):
+        registry = MetricsRegistry(buckets=METRICS_CONFIG["DURATION_BUCKETS"])
+        with tempfile.TemporaryDirectory() as directory:
+            writer = MultiProcessWriter(registry, directory, 60)
+            path = writer.path
+            with patch("django_query_capture.metrics.os.getpid", return_value=1):
+                self.assertNotEqual(writer.path, path)
+                self.assertTrue(
+                    os.path.basename(writer.path).startswith("django_query_capture_1_")
+                )
+
+    def test_reset_after_fork(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                QUERY_CAPTURE={
+                    "METRICS": {**METRICS_CONFIG, "MULTIPROCESS_DIR": directory}
+                }
+            ):
+                registry = get_metrics_registry()
+                self.record(registry)
+                writer = get_multiprocess_writer()
+                writer._lock.acquire()
+                reset_after_fork()
+                self.assertIs(get_metrics_registry(), registry)
+                self.assertEqual(
+                    registry.to_dict()["django_query_capture_requests"], []
+                )
+                with patch("django_query_capture.metrics.os.getpid", return_value=1):
+                    writer.flush()
+                    with open(writer.path) as file:
+                        self.assertEqual(
+                            json.load(file)["django_query_capture_requests"], []
+                        )
+
+    @override_settings(QUERY_CAPTURE={"METRICS": METRICS_CONFIG})
+    def test_mark_process_dead(self):
+        registry = MetricsRegistry(buckets=METRICS_CONFIG["DURATION_BUCKETS"])
+        self.record(registry)
+        with tempfile.TemporaryDirectory() as directory:
+            # A process that reuses the pid writes another file.
+            for _ in range(2):
+                MultiProcessWriter(registry, directory, 60).flush()
+            self.assertEqual(len(os.listdir(directory)), 2)
+            with patch("django_query_capture.metrics.os.remove", side_effect=OSError):
+                mark_process_dead(os.getpid(), directory)
+            self.assertEqual(len(os.listdir(directory)), 3)
+            self.assertEqual(
+                collect_multiprocess(directory).requests.values[("reporters/", "GET")],
+                2,
+            )
+            mark_process_dead(os.getpid(), directory)
+            self.assertEqual(len(os.listdir(directory)), 3)
+            for file_name in os.listdir(directory):
+                if file_name != "django_query_capture_dead.json":
+                    os.remove(os.path.join(directory, file_name))
+            MultiProcessWriter(registry, directory, 60).flush()
+            mark_process_dead(os.getpid(), directory)
+            self.assertEqual(os.listdir(directory), ["django_query_capture_dead.json"])
+            self.assertEqual(
+                collect_multiprocess(directory).requests.values[("reporters/", "GET")],
+                3,
+            )
+
+
+@override_settings(QUERY_CAPTURE={"METRICS": METRICS_CONFIG})
+class MetricsExpositionTests(ConsoleOutputTestCaseMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        get_metrics_registry.cache_clear()
+        QueryCaptureMiddleware(get_response)(RequestFactory().get("/reporters/"))
+
+    def test_middleware_record(self):
+        self.assertEqual(
+            get_metrics_registry().requests.values[("reporters/", "GET")], 1
+        )
+
+    def test_metrics_view(self):
+        response = metrics_view(RequestFactory().get("/metrics"))
+        self.assertEqual(response["Content-Type"], CONTENT_TYPE)
+        self.assertIn(
+            'django_query_capture_requests_total{endpoint="reporters/",method="GET"} 1.0',
+            response.content.decode(),
+        )
+
+    def test_metrics_app(self):
+        server = make_server("127.0.0.1", 0, metrics_app, handler_class=QuietHandler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{server.server_port}/metrics"
+            ) as response:
+                self.assertEqual(response.headers["Content-Type"], CONTENT_TYPE)
+                body = response.read().decode()
+        finally:
+            thread.join()
+            server.server_close()
+        self.assertIn(
+            'django_query_capture_requests_total{endpoint="reporters/",method="GET"} 1.0',
+            body,
+        )
+
+    def test_multiprocess_dir(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                QUERY_CAPTURE={
+                    "METRICS": {**METRICS_CONFIG, "MULTIPROCESS_DIR": directory}
+                }
+            ):
+                QueryCaptureMiddleware(get_response)(
+                    RequestFactory().get("/reporters/")
+                )
+                self.assertEqual(len(os.listdir(directory)), 1)
+                response = metrics_view(RequestFactory().get("/metrics"))
+        self.assertIn(
+            'django_query_capture_requests_total{endpoint="reporters/",method="GET"} 1.0',
+            response.content.decode(),
+        )
@@ -1,6 +1,9 @@
-from unittest.mock import Mock
+import asyncio
+from unittest.mock import Mock, patch
 
-from django.test import TestCase, modify_settings
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import RequestFactory, TestCase, modify_settings, override_settings
 from news.models import Reporter
 from test_presenter.utils import ConsoleOutputTestCaseMixin
 
@@ -12,6 +15,16 @@ def get_response(request):
     [list(Reporter.objects.all()) for i in range(11)]
 
 
+def select_one_many_times():
+    with connection.cursor() as cursor:
+        for _ in range(11):
+            cursor.execute("SELECT 1")
+
+
+async def async_get_response(request):
+    await sync_to_async(select_one_many_times)()
+
+
 @modify_settings(
     MIDDLEWARE={
         "append": "django_query_capture.middleware.QueryCaptureMiddleware",
@@ -29,3 +42,85 @@ class QueryCaptureMiddlewareTests(ConsoleOutputTestCaseMixin, TestCase):
         middleware(Mock())
         output = self.capture_output.getvalue()
         self.assertTrue("Similar 12 times" in output, output)
+
+    def test_query_capture_async(self):
+        middleware = QueryCaptureMiddleware(async_get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        asyncio.run(middleware(Mock()))
+        output = self.capture_output.getvalue()
+        self.assertTrue("Repeated 11 times" in output, output)
+
+
+def get_small_response(request):
+    list(Reporter.objects.all())
+
+
+class QueryCaptureMiddlewareSamplingTests(ConsoleOutputTestCaseMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.factory = RequestFactory()
+
+    @override_settings(
+        QUERY_CAPTURE={
+            "MIDDLEWARE": {
+                "SAMPLE_RATE": 0,
+                "URL_SAMPLE_RATES": {},
+                "FORCE_HEADER": "X-Query-Capture",
+                "TAIL_BASED": False,
+            }
+        }
+    )
+    def test_not_sampled(self):
+        middleware = QueryCaptureMiddleware(get_response)
+        with patch("django_query_capture.middleware.query_capture") as mock_capture:
+            middleware(self.factory.get("/"))
+        self.assertFalse(mock_capture.called)
+        self.assertEqual(self.capture_output.getvalue(), "")
+
+    @override_settings(
+        QUERY_CAPTURE={
+            "MIDDLEWARE": {
+                "SAMPLE_RATE": 0,
+                "URL_SAMPLE_RATES": {},
+                "FORCE_HEADER": "X-Query-Capture",
+                "TAIL_BASED": False,
+            }
+        }
+    )
+    def test_force_header(self):
+        middleware = QueryCaptureMiddleware(get_response)
+        middleware(self.factory.get("/", HTTP_X_QUERY_CAPTURE="1"))
+        self.assertIn("Repeated 11 times", self.capture_output.getvalue())
+
+    @override_settings(
+        QUERY_CAPTURE={
+            "MIDDLEWARE": {
+                "SAMPLE_RATE": 0,
+                "URL_SAMPLE_RATES": {"^/api/": 1, "^/": 0},
+                "FORCE_HEADER": None,
+                "TAIL_BASED": False,
+            }
+        }
+    )
+    def test_url_sample_rates(self):
+        middleware = QueryCaptureMiddleware(get_response)
+        middleware(self.factory.get("/admin/"))
+        self.assertEqual(self.capture_output.getvalue(), "")
+        middleware(self.factory.get("/api/reporters/"))
+        self.assertIn("Repeated 11 times", self.capture_output.getvalue())
+
+    @override_settings(
+        QUERY_CAPTURE={
+            "MIDDLEWARE": {
+                "SAMPLE_RATE": 1,
+                "URL_SAMPLE_RATES": {},
+                "FORCE_HEADER": None,
+                "TAIL_BASED": True,
+            }
+        }
+    )
+    def test_tail_based(self):
+        QueryCaptureMiddleware(get_small_response)(self.factory.get("/"))
+        self.assertEqual(self.capture_output.getvalue(), "")
+        QueryCaptureMiddleware(get_response)(self.factory.get("/"))
+        self.assertIn("Repeated 11 times", self.capture_output.getvalue())
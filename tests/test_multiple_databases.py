@@ -0,0 +1,51 @@
+from django.test import TestCase, override_settings
+from news.models import Reporter
+from test_presenter.utils import ConsoleOutputTestCaseMixin
+
+from django_query_capture import native_query_capture, query_capture
+
+
+class MultipleDatabasesTests(ConsoleOutputTestCaseMixin, TestCase):
+    databases = {"default", "replica"}
+
+    def test_capture_all_databases(self):
+        with native_query_capture() as q:
+            Reporter.objects.create(full_name="target")
+            list(Reporter.objects.using("replica").all())
+        self.assertEqual(
+            [captured_query["alias"] for captured_query in q.captured_queries],
+            ["default", "replica"],
+        )
+
+    def test_capture_given_databases(self):
+        with native_query_capture(databases=["replica"]) as q:
+            Reporter.objects.create(full_name="target")
+            list(Reporter.objects.using("replica").all())
+        self.assertEqual(len(q), 1)
+        self.assertEqual(q.captured_queries[0]["alias"], "replica")
+
+    @override_settings(QUERY_CAPTURE={"DATABASE_ALIASES": ["default"]})
+    def test_capture_database_aliases_setting(self):
+        with native_query_capture() as q:
+            Reporter.objects.create(full_name="target")
+            list(Reporter.objects.using("replica").all())
+        self.assertEqual(len(q), 1)
+        self.assertEqual(q.captured_queries[0]["alias"], "default")
+
+    def test_print_alias_stats(self):
+        with query_capture():
+            Reporter.objects.create(full_name="target")
+            [list(Reporter.objects.using("replica").all()) for i in range(2)]
+        output = self.capture_output.getvalue()
+        self.assertIn("replica", output)
+
+    def test_alias_stats_of_classified_query(self):
+        capture = query_capture(ignore_output=True)
+        with capture:
+            Reporter.objects.create(full_name="target")
+            [list(Reporter.objects.using("replica").all()) for i in range(2)]
+        alias_stats = capture.classifier["alias_stats"]
+        self.assertEqual(alias_stats["default"]["writes"], 1)
+        self.assertEqual(alias_stats["default"]["read"], 0)
+        self.assertEqual(alias_stats["replica"]["read"], 2)
+        self.assertEqual(alias_stats["replica"]["total"], 2)
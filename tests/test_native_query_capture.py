@@ -1,10 +1,29 @@
-from unittest.mock import Mock
+import asyncio
+import contextvars
+import threading
+import weakref
+from unittest.mock import Mock, patch
 
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
 from django.test import TestCase
 from django.utils import timezone
 from news.models import Article, Reporter
 
 from django_query_capture import native_query_capture
+from django_query_capture.capture import (
+    CapturedQuery,
+    PropagatingThreadPoolExecutor,
+    active_captures,
+    dispatch_query,
+    propagate_capture,
+    render_sql,
+)
+
+
+def execute_select_one():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
 
 
 class NativeQueryCaptureTests(TestCase):
@@ -27,3 +46,232 @@ class NativeQueryCaptureTests(TestCase):
         func = Mock()
         native_query_capture()(func)()
         self.assertTrue(func.called)
+
+    def test_sql_is_rendered_lazily(self):
+        with native_query_capture() as q:
+            Reporter.objects.create(full_name="100% target")
+        captured_query = q.captured_queries[0]
+        with patch(
+            "django_query_capture.capture.render_sql", wraps=render_sql
+        ) as mock_render_sql:
+            self.assertIn("'100% target'", captured_query["sql"])
+            self.assertIn("'100% target'", captured_query["sql"])
+        self.assertEqual(mock_render_sql.call_count, 1)
+
+    def test_sql_rendered_before_cursor_is_reused(self):
+        default_connection = connections["default"]
+
+        def remember_statement(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            # Like `cursor.query` of PostgreSQL, the statement the cursor ran last.
+            context["cursor"].cursor.query = (
+                sql % tuple(f"'{param}'" for param in params)
+            ).encode()
+            return result
+
+        def last_executed_query(cursor, sql, params):
+            return cursor.query.decode()
+
+        with patch.object(default_connection, "vendor", "postgresql"), patch.object(
+            default_connection.ops, "last_executed_query", last_executed_query
+        ), patch(
+            "django_query_capture.capture.render_sql", wraps=render_sql
+        ) as mock_render_sql:
+            default_connection.execute_wrappers.append(remember_statement)
+            try:
+                with native_query_capture() as q:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT %s", ["first"])
+                        cursor.execute("SELECT %s", ["second"])
+            finally:
+                default_connection.execute_wrappers.remove(remember_statement)
+            self.assertEqual(mock_render_sql.call_count, 0)
+            self.assertEqual(
+                [captured_query["sql"] for captured_query in q.captured_queries],
+                ["SELECT 'first'", "SELECT 'second'"],
+            )
+
+    def test_render_sql_fallback_quotes_params(self):
+        context = {
+            "connection": Mock(
+                ops=Mock(last_executed_query=Mock(side_effect=Exception))
+            ),
+            "cursor": None,
+        }
+        self.assertEqual(
+            render_sql(
+                "SELECT %s, %s, %s, %s", ["it's", None, 1, b"\x01"], False, context
+            ),
+            "SELECT 'it''s', NULL, 1, X'01'",
+        )
+        self.assertEqual(
+            render_sql("SELECT %(name)s", {"name": "a"}, False, context), "SELECT 'a'"
+        )
+
+    def test_sql_of_executemany(self):
+        with native_query_capture() as q:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO news_reporter (full_name) VALUES (%s)",
+                    [["target-1"], ["target-2"]],
+                )
+        captured_query = q.captured_queries[0]
+        self.assertTrue(captured_query["many"])
+        self.assertEqual(captured_query["sql"], captured_query["raw_sql"])
+
+    def test_captured_query_record(self):
+        with native_query_capture() as q:
+            Reporter.objects.create(full_name="target-1")
+        captured_query = q.captured_queries[0]
+        self.assertIsInstance(captured_query, CapturedQuery)
+        self.assertFalse(hasattr(captured_query, "__dict__"))
+        self.assertEqual(captured_query["alias"], "default")
+        self.assertEqual(captured_query["context"]["connection"], connection)
+        self.assertEqual(set(dict(captured_query)), set(CapturedQuery.KEYS))
+        with self.assertRaises(KeyError):
+            captured_query["unknown"]
+
+    def test_captured_query_identity(self):
+        with native_query_capture() as q:
+            Reporter.objects.create(full_name="target-1")
+            Reporter.objects.create(full_name="target-1")
+        first, second = q.captured_queries
+        with patch(
+            "django_query_capture.capture.render_sql", wraps=render_sql
+        ) as mock_render_sql:
+            self.assertEqual(first, first)
+            self.assertNotEqual(first, second)
+            self.assertEqual(len({first, second, first}), 2)
+        self.assertEqual(mock_render_sql.call_count, 0)
+
+    def test_captured_query_holds_cursor_weakly(self):
+        with native_query_capture() as q:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            cursor_ref = weakref.ref(cursor)
+            del cursor
+        self.assertIsNone(cursor_ref())
+        self.assertIsNone(q.captured_queries[0]["context"]["cursor"])
+
+    def test_capture_is_scoped_to_context(self):
+        with native_query_capture() as q:
+            thread = threading.Thread(
+                target=contextvars.copy_context().run, args=(execute_select_one,)
+            )
+            thread.start()
+            thread.join()
+            other_thread = threading.Thread(target=execute_select_one)
+            other_thread.start()
+            other_thread.join()
+        self.assertEqual(len(q), 1)
+
+    def test_nested_captures_share_one_record(self):
+        with patch(
+            "django_query_capture.capture.get_call_site",
+            return_value=(__file__, "test", 0),
+        ) as get_call_site:
+            with native_query_capture() as outer, native_query_capture() as middle:
+                with native_query_capture(databases=["replica"]) as other:
+                    with native_query_capture() as inner:
+                        execute_select_one()
+        self.assertEqual(get_call_site.call_count, 1)
+        self.assertEqual(len(other), 0)
+        self.assertIs(outer.captured_queries[0], inner.captured_queries[0])
+        self.assertIs(middle.captured_queries[0], inner.captured_queries[0])
+
+    def test_concurrent_async_captures(self):
+        async def request(count):
+            with native_query_capture() as q:
+                for _ in range(count):
+                    await sync_to_async(execute_select_one, thread_sensitive=False)()
+            return len(q)
+
+        async def main():
+            return await asyncio.gather(request(2), request(5), request(3))
+
+        self.assertEqual(asyncio.run(main()), [2, 5, 3])
+
+    def test_capture_query_in_async_decorator(self):
+        @native_query_capture()
+        async def view(count):
+            (capture,) = active_captures.get()
+            for _ in range(count):
+                await sync_to_async(execute_select_one, thread_sensitive=False)()
+            return capture
+
+        async def main():
+            return await asyncio.gather(view(2), view(5), view(3))
+
+        self.assertEqual([len(capture) for capture in asyncio.run(main())], [2, 5, 3])
+
+    def test_query_dispatcher_survives_execute_wrapper(self):
+        if dispatch_query in connection.execute_wrappers:
+            connection.execute_wrappers.remove(dispatch_query)
+        with connection.execute_wrapper(lambda execute, *args: execute(*args)):
+            with native_query_capture() as q:
+                execute_select_one()
+        with native_query_capture() as q:
+            execute_select_one()
+        self.assertEqual(len(q), 1)
+
+    def test_propagate_threads(self):
+        with native_query_capture(propagate_threads=True) as q:
+            execute_select_one()
+            with PropagatingThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(lambda _: execute_select_one(), range(8)))
+            self.assertEqual(len(q), 1)
+        self.assertEqual(len(q), 9)
+        thread_ids = {
+            captured_query["thread_id"] for captured_query in q.captured_queries
+        }
+        self.assertIn(threading.get_ident(), thread_ids)
+        self.assertGreater(len(thread_ids), 1)
+        started_at = [
+            captured_query["started_at"] for captured_query in q.captured_queries[1:]
+        ]
+        self.assertEqual(started_at, sorted(started_at))
+
+    def test_context_connection_of_other_thread(self):
+        def worker_connection():
+            execute_select_one()
+            return connections["default"]
+
+        with native_query_capture(propagate_threads=True) as q:
+            with PropagatingThreadPoolExecutor(max_workers=1) as executor:
+                worker_connection = executor.submit(worker_connection).result()
+        self.assertIsNot(worker_connection, connections["default"])
+        self.assertIs(q.captured_queries[0]["context"]["connection"], worker_connection)
+
+    def test_thread_outliving_capture(self):
+        entered = threading.Event()
+        exited = threading.Event()
+
+        def late_query():
+            entered.wait()
+            execute_select_one()
+            exited.wait()
+            execute_select_one()
+
+        with PropagatingThreadPoolExecutor(max_workers=1) as executor:
+            with native_query_capture(propagate_threads=True) as q:
+                future = executor.submit(late_query)
+                entered.set()
+                while not q._thread_buffers:
+                    threading.Event().wait(0.001)
+            exited.set()
+            future.result()
+        self.assertEqual(len(q), 1)
+        self.assertIsNone(q._thread_buffers)
+
+    def test_propagate_capture(self):
+        with native_query_capture(propagate_threads=True) as q:
+            thread = threading.Thread(target=propagate_capture(execute_select_one))
+            thread.start()
+            thread.join()
+        self.assertEqual(len(q), 1)
+
+    def test_not_propagate_threads(self):
+        with native_query_capture(propagate_threads=False) as q:
+            with PropagatingThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(lambda _: execute_select_one(), range(4)))
+        self.assertEqual(len(q), 0)
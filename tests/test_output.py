@@ -0,0 +1,107 @@
+import io
+import threading
+from contextlib import redirect_stderr
+
+from django.test import TestCase, override_settings
+from news.models import Reporter
+from test_presenter.utils import ConsoleOutputTestCaseMixin
+
+from django_query_capture import query_capture
+from django_query_capture.output import (
+    BackgroundPresenterWriter,
+    get_background_writer,
+)
+from django_query_capture.presenter import BasePresenter, SimplePresenter
+
+printed = []
+release = threading.Event()
+
+
+class BlockingPresenter(BasePresenter):
+    def print(self) -> None:
+        release.wait(5)
+        printed.append(self.classified_query["total"])
+
+
+class CapturedQueriesPresenter(BasePresenter):
+    def print(self) -> None:
+        release.wait(5)
+        printed.append(
+            (
+                len(self.classified_query["captured_queries"]),
+                len(self.classified_query["anomalous_captured_queries"]),
+                self.classified_query["query_plans"]["default:select ?"]["plan"],
+            )
+        )
+
+
+class BackgroundPresenterWriterTests(ConsoleOutputTestCaseMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        printed.clear()
+        release.clear()
+
+    def get_classified_query(self, total: int):
+        capture = query_capture(ignore_output=True)
+        with capture:
+            [Reporter.objects.create(full_name="target") for i in range(total)]
+        return capture.classifier
+
+    def test_print_on_background(self):
+        writer = BackgroundPresenterWriter(10)
+        writer.submit(SimplePresenter, self.get_classified_query(2))
+        self.assertTrue(writer.flush(5))
+        writer.close(5)
+        self.assertIn("total: 2 queries", self.capture_output.getvalue())
+
+    def test_drop_oldest(self):
+        writer = BackgroundPresenterWriter(2)
+        for total in range(1, 6):
+            writer.submit(BlockingPresenter, self.get_classified_query(total))
+        release.set()
+        self.assertTrue(writer.flush(5))
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            writer.close(5)
+        # The first output may already be running when the others are submitted.
+        self.assertEqual(printed[-2:], [4, 5])
+        self.assertEqual(writer.dropped_count, 5 - len(printed))
+        self.assertIn(f"{writer.dropped_count} outputs were dropped", stderr.getvalue())
+
+    def test_snapshot(self):
+        classified_query = self.get_classified_query(1)
+        classified_query["anomalous_captured_queries"].append(
+            classified_query["captured_queries"][0]
+        )
+        classified_query["query_plans"]["default:select ?"] = {"plan": ["SCAN"]}
+        writer = BackgroundPresenterWriter(10)
+        writer.submit(CapturedQueriesPresenter, classified_query)
+        classified_query["captured_queries"].clear()
+        classified_query["anomalous_captured_queries"].clear()
+        classified_query["query_plans"]["default:select ?"]["plan"] = []
+        classified_query["query_plans"].clear()
+        release.set()
+        writer.close(5)
+        self.assertEqual(printed, [(1, 1, ["SCAN"])])
+
+    @override_settings(
+        QUERY_CAPTURE={
+            "ASYNC_OUTPUT": {"ENABLED": True, "QUEUE_SIZE": 10},
+            "PRESENTER": "django_query_capture.presenter.SimplePresenter",
+        }
+    )
+    def test_query_capture_async_output(self):
+        with query_capture():
+            Reporter.objects.create(full_name="target")
+        self.assertTrue(get_background_writer().flush(5))
+        self.assertIn("total: 1 queries", self.capture_output.getvalue())
+
+    def test_rebuilt_on_setting_changed(self):
+        with override_settings(
+            QUERY_CAPTURE={"ASYNC_OUTPUT": {"ENABLED": True, "QUEUE_SIZE": 3}}
+        ):
+            self.assertEqual(get_background_writer().queue_size, 3)
+        with override_settings(
+            QUERY_CAPTURE={"ASYNC_OUTPUT": {"ENABLED": True, "QUEUE_SIZE": 7}}
+        ):
+            self.assertEqual(get_background_writer().queue_size, 7)
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+
+from django.test import RequestFactory, TestCase, override_settings
+from news.models import Reporter
+
+from django_query_capture import QueryCaptureMiddleware, query_capture
+from django_query_capture.export import get_json_lines_writer
+
+
+def get_json_lines_config(path):
+    return {
+        "PATH": path,
+        "MAX_BYTES": None,
+        "ROTATE_INTERVAL": None,
+        "BACKUP_COUNT": 5,
+        "COMPRESS": False,
+        "BUFFER_SIZE": 100,
+        "FLUSH_INTERVAL": 60,
+        "REQUEST_ID_HEADER": "X-Request-ID",
+    }
+
+
+class JsonLinesPresenterTests(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "capture.jsonl")
+        self.override_settings = override_settings(
+            QUERY_CAPTURE={
+                "PRESENTER": "django_query_capture.presenter.JsonLinesPresenter",
+                "JSON_LINES": get_json_lines_config(self.path),
+            }
+        )
+        self.override_settings.enable()
+
+    def tearDown(self) -> None:
+        self.override_settings.disable()
+        self.directory.cleanup()
+
+    def read_records(self):
+        get_json_lines_writer().flush()
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_print_json_lines(self):
+        with query_capture():
+            [Reporter.objects.create(full_name="target") for _ in range(11)]
+        self.assertFalse(os.path.exists(self.path))
+        [record] = self.read_records()
+        self.assertEqual(record["total"], 11)
+        self.assertEqual(len(record["queries"]), 11)
+        self.assertEqual(record["duplicates"][0]["count"], 11)
+        self.assertIn("INSERT", record["duplicates"][0]["raw_sql"])
+        query = record["queries"][0]
+        self.assertEqual(query["function_name"], "<listcomp>")
+        self.assertEqual(query["alias"], "default")
+        self.assertIn("fingerprint", query)
+        self.assertIsNone(record["request_id"])
+
+    def test_request_id(self):
+        def get_response(request):
+            list(Reporter.objects.all())
+
+        middleware = QueryCaptureMiddleware(get_response)
+        middleware(RequestFactory().get("/", HTTP_X_REQUEST_ID="request-1"))
+        middleware(RequestFactory().get("/"))
+        records = self.read_records()
+        self.assertEqual(records[0]["request_id"], "request-1")
+        self.assertEqual(len(records[1]["request_id"]), 32)
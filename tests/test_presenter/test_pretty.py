@@ -3,6 +3,7 @@ from news.models import Reporter
 from test_presenter.utils import ConsoleOutputTestCaseMixin
 
 from django_query_capture import query_capture
+from django_query_capture.utils import get_sql_cache_info, highlight_sql
 
 
 @override_settings(
@@ -25,3 +26,13 @@ class PrettyPresenterTests(ConsoleOutputTestCaseMixin, TestCase):
             [Reporter.objects.create(full_name=f"target-{i}") for i in range(11)]
         output = self.capture_output.getvalue()
         self.assertTrue("Similar 11 times" in output, output)
+
+    def test_print_pretty_sql_highlight_is_cached(self):
+        highlight_sql.cache_clear()
+        with query_capture():
+            [Reporter.objects.create(full_name=f"target-i") for i in range(11)]
+        with query_capture():
+            [Reporter.objects.create(full_name=f"target-i") for i in range(11)]
+        cache_info = get_sql_cache_info()["highlight_sql"]
+        self.assertEqual(cache_info["misses"], 1)
+        self.assertEqual(cache_info["hits"], 1)
@@ -0,0 +1,156 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from django_query_capture.pytest_plugin import USER_PROPERTY, QueryCapturePlugin
+
+pytestmark = pytest.mark.django_db
+
+TESTS = """
+import pytest
+from django.db import connection
+
+
+def select(number):
+    with connection.cursor() as cursor:
+        for i in range(number):
+            cursor.execute("SELECT %s", [i])
+
+
+@pytest.mark.query_budget(max_similar=1)
+def test_n_plus_one():
+    select(3)
+
+
+@pytest.mark.query_budget(max_queries=3, max_duplicates=1)
+def test_within_budget():
+    select(3)
+
+
+def test_fixture(query_capture):
+    select(2)
+    assert len(query_capture.captured_queries) == 2
+    assert query_capture.classifier()["total"] == 2
+"""
+
+
+@pytest.fixture
+def run_tests(pytester, monkeypatch):
+    # The plugin is enabled explicitly, so that it is not registered twice when the package is installed.
+    monkeypatch.setenv("PYTEST_DISABLE_PLUGIN_AUTOLOAD", "1")
+    pytester.makepyfile(test_queries=TESTS)
+
+    def inner(*args):
+        return pytester.runpytest_inprocess(
+            "-p",
+            "django_query_capture.pytest_plugin",
+            "-W",
+            "ignore::pytest.PytestAssertRewriteWarning",
+            *args,
+        )
+
+    return inner
+
+
+def test_query_budget(run_tests):
+    result = run_tests()
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*QueryBudgetExceeded: Similar queries over the budget of 1:",
+            "*3 x select ?",
+            "*at [[]select, *test_queries.py:8]",
+        ]
+    )
+    result.stdout.no_fnmatch_line("*heaviest tests*")
+
+
+def test_summary(run_tests):
+    result = run_tests("--query-capture-summary=2")
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*query capture: heaviest tests*",
+            "test*queries*duplicates*similar*db_time",
+            "*",
+            "test_queries.py::test_n_plus_one*3*1*3*",
+            "test_queries.py::test_within_budget*3*1*3*",
+        ]
+    )
+    result.stdout.no_fnmatch_line("test_queries.py::test_fixture*")
+
+
+SNAPSHOT_TESTS = """
+import os
+
+import pytest
+from django.db import connection
+
+
+@pytest.mark.query_snapshot
+def test_snapshot():
+    with connection.cursor() as cursor:
+        cursor.execute(os.environ["SNAPSHOT_SQL"])
+"""
+
+
+def test_query_snapshot(pytester, monkeypatch):
+    monkeypatch.setenv("PYTEST_DISABLE_PLUGIN_AUTOLOAD", "1")
+    pytester.makepyfile(test_snapshot_queries=SNAPSHOT_TESTS)
+    args = (
+        "-p",
+        "django_query_capture.pytest_plugin",
+        "-W",
+        "ignore::pytest.PytestAssertRewriteWarning",
+    )
+    snapshot_path = (
+        pytester.path
+        / "__query_snapshots__"
+        / "test_snapshot_queries"
+        / "test_snapshot.json"
+    )
+
+    monkeypatch.setenv("SNAPSHOT_SQL", "SELECT 1")
+    pytester.runpytest_inprocess(*args).assert_outcomes(passed=1)
+    assert json.loads(snapshot_path.read_text())["queries"] == {
+        "test_snapshot_queries.py:test_snapshot": ["select ?"]
+    }
+
+    monkeypatch.setenv("SNAPSHOT_SQL", "SELECT 1, 2")
+    result = pytester.runpytest_inprocess(*args)
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*QuerySnapshotMismatch: Queries differ from the snapshot*",
+            "*test_snapshot_queries.py:test_snapshot",
+            "*+ select ?, ?",
+            "*- select ?",
+        ]
+    )
+
+    pytester.runpytest_inprocess(*args, "--query-snapshot-update").assert_outcomes(
+        passed=1
+    )
+    pytester.runpytest_inprocess(*args).assert_outcomes(passed=1)
+
+
+def test_merge_worker_reports():
+    plugin = QueryCapturePlugin(summary_size=10)
+    query_stats = {"queries": 1, "duplicates": 1, "similar": 1, "db_time": 0.1}
+    for worker, nodeid in (("gw0", "test_a.py::test"), ("gw1", "test_b.py::test")):
+        for when in ("setup", "call", "teardown"):
+            plugin.pytest_runtest_logreport(
+                SimpleNamespace(
+                    when=when,
+                    nodeid=nodeid,
+                    node=SimpleNamespace(gateway=SimpleNamespace(id=worker)),
+                    user_properties=[(USER_PROPERTY, query_stats)]
+                    if when == "call"
+                    else [],
+                )
+            )
+    assert plugin.results == {
+        "test_a.py::test": query_stats,
+        "test_b.py::test": query_stats,
+    }
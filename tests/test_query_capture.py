@@ -1,7 +1,9 @@
+from django.db import connection
 from django.test import TestCase, override_settings
 from news.models import Reporter
 
 from django_query_capture import query_capture
+from django_query_capture.capture import PropagatingThreadPoolExecutor
 
 
 class QueryCaptureTestCases(TestCase):
@@ -11,3 +13,25 @@ class QueryCaptureTestCases(TestCase):
             self.assertEqual(len(capture.captured_queries), 1)
             Reporter.objects.create(full_name=f"target-2")
             self.assertEqual(len(capture.captured_queries), 2)
+
+    def test_live_statistics(self):
+        with query_capture(ignore_output=True) as capture:
+            [Reporter.objects.create(full_name="target") for i in range(11)]
+            classified_query = capture.classifier()
+            self.assertEqual(classified_query["writes"], 11)
+            self.assertTrue(classified_query["has_over_threshold"])
+            list(Reporter.objects.all())
+            self.assertEqual(capture.classifier()["read"], 1)
+
+    @override_settings(QUERY_CAPTURE={"PROPAGATE_THREADS": True})
+    def test_propagate_threads_setting(self):
+        def execute_select_one(_):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+
+        capture = query_capture(ignore_output=True)
+        with capture:
+            with PropagatingThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(execute_select_one, range(11)))
+        self.assertEqual(len(capture.classifier["captured_queries"]), 11)
+        self.assertTrue(capture.classifier["has_over_threshold"])
@@ -0,0 +1,152 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from news.models import Reporter
+
+from django_query_capture import query_capture
+from django_query_capture.export import get_json_lines_writer
+from django_query_capture.management.commands.querycapture_report import Command
+from django_query_capture.report import build_report, split_chunks
+
+
+def make_record(queries):
+    return {
+        "version": 1,
+        "queries": [
+            {
+                "fingerprint": fingerprint,
+                "duration": duration,
+                "file_name": "views.py",
+                "function_name": "view",
+                "line_no": line_no,
+                "alias": "default",
+                "thread_id": 1,
+            }
+            for line_no, (fingerprint, duration) in enumerate(queries)
+        ],
+        "slow": [],
+        "duplicates": [],
+        "similars": [{"fingerprint": "select ?", "raw_sql": "SELECT 1", "count": 11}],
+    }
+
+
+class ReportTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "capture.jsonl")
+        with open(self.path, "w") as file:
+            for i in range(100):
+                file.write(
+                    json.dumps(
+                        make_record([("select ?", 0.01), ("update ?", 0.001 * i)])
+                    )
+                    + "\n"
+                )
+            file.write("not json\n")
+        self.gzip_path = os.path.join(self.directory.name, "capture.jsonl.1.gz")
+        with gzip.open(self.gzip_path, "wt") as file:
+            file.write(json.dumps(make_record([("select ?", 0.5)])) + "\n")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_build_report(self):
+        query_report = build_report([self.path, self.gzip_path], workers=1)
+        self.assertEqual(query_report.record_count, 101)
+        self.assertEqual(query_report.query_count, 201)
+        self.assertEqual(query_report.invalid_line_count, 1)
+        select = query_report.fingerprints["select ?"]
+        self.assertEqual(select.count, 101)
+        self.assertEqual(select.raw_sql, "SELECT 1")
+        self.assertEqual(select.call_site, "[view, views.py:0]")
+        self.assertAlmostEqual(select.total_duration, 1.5)
+        self.assertAlmostEqual(
+            query_report.fingerprints["update ?"].p95, 0.094, delta=0.002
+        )
+        self.assertEqual(
+            [report.fingerprint for report in query_report.top("total_duration")],
+            ["update ?", "select ?"],
+        )
+        self.assertEqual(
+            [report.fingerprint for report in query_report.top("count", limit=1)],
+            ["select ?"],
+        )
+
+    def test_chunks(self):
+        chunks = split_chunks([self.path, self.gzip_path], chunk_size=1000)
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual(chunks[-1], (self.gzip_path, 0, None))
+        whole = build_report([self.path], workers=1)
+        chunked = build_report([self.path], workers=1, chunk_size=1000)
+        self.assertEqual(chunked.record_count, whole.record_count)
+        self.assertEqual(chunked.invalid_line_count, whole.invalid_line_count)
+        self.assertAlmostEqual(
+            chunked.fingerprints["update ?"].total_duration,
+            whole.fingerprints["update ?"].total_duration,
+        )
+
+    def test_process_pool(self):
+        query_report = build_report(
+            [self.path, self.gzip_path], workers=2, chunk_size=5000
+        )
+        self.assertEqual(query_report.record_count, 101)
+        self.assertEqual(query_report.fingerprints["select ?"].count, 101)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command(
+            Command(),
+            os.path.join(self.directory.name, "capture.jsonl*"),
+            "--workers=1",
+            "--sort=count",
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+        output = stdout.getvalue()
+        self.assertIn("101 records, 201 queries", output)
+        self.assertLess(output.index("select ?"), output.index("update ?"))
+
+        stdout = StringIO()
+        call_command(
+            Command(), self.path, "--workers=1", "--format=json", stdout=stdout
+        )
+        output = json.loads(stdout.getvalue())
+        self.assertEqual(output["fingerprints"][0]["fingerprint"], "update ?")
+
+        with self.assertRaises(CommandError):
+            call_command(Command(), os.path.join(self.directory.name, "missing*"))
+
+
+class ReportJsonLinesPresenterTests(TestCase):
+    def test_report_exported_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "capture.jsonl")
+            with override_settings(
+                QUERY_CAPTURE={
+                    "PRESENTER": "django_query_capture.presenter.JsonLinesPresenter",
+                    "JSON_LINES": {
+                        "PATH": path,
+                        "MAX_BYTES": None,
+                        "ROTATE_INTERVAL": None,
+                        "BACKUP_COUNT": 5,
+                        "COMPRESS": False,
+                        "BUFFER_SIZE": 100,
+                        "FLUSH_INTERVAL": 60,
+                        "REQUEST_ID_HEADER": None,
+                    },
+                }
+            ):
+                for _ in range(2):
+                    with query_capture():
+                        [Reporter.objects.create(full_name="target") for _ in range(11)]
+                get_json_lines_writer().flush()
+            query_report = build_report([path], workers=1)
+        self.assertEqual(query_report.record_count, 2)
+        [fingerprint_report] = query_report.fingerprints.values()
+        self.assertEqual(fingerprint_report.count, 22)
+        self.assertIn("INSERT", fingerprint_report.raw_sql)
@@ -0,0 +1,117 @@
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import path, resolve
+from news.models import Reporter
+from test_presenter.utils import ConsoleOutputTestCaseMixin
+
+from django_query_capture import QueryCaptureMiddleware
+from django_query_capture.settings import (
+    CONFIG_DEFAULTS,
+    get_config,
+    get_route_config,
+    merge_config,
+)
+
+
+def reporters_view(request):
+    [list(Reporter.objects.all()) for _ in range(3)]
+
+
+urlpatterns = [
+    path("reporters/<int:pk>/", reporters_view, name="reporter-detail"),
+    path("reporters/", reporters_view, name="reporter-list"),
+]
+
+RULES = [
+    {
+        "VIEW": "reporter-detail",
+        "PRINT_THRESHOLDS": {"DUPLICATE_MIN_COUNT": 2},
+        "PRESENTER": "django_query_capture.presenter.RawLinePresenter",
+    },
+    {"ROUTE": "reporters/*", "IGNORE_SQL_PATTERNS": ["SELECT .*"]},
+]
+
+
+class ConfigTests(TestCase):
+    def test_merge_config(self):
+        merged = merge_config(
+            {"A": {"B": 1, "C": 2}, "D": [1]}, {"A": {"B": 3}, "D": [2]}
+        )
+        self.assertEqual(merged, {"A": {"B": 3, "C": 2}, "D": [2]})
+
+    @override_settings(QUERY_CAPTURE={"PRINT_THRESHOLDS": {"SLOW_MIN_SECOND": 0}})
+    def test_deep_merge(self):
+        print_thresholds = get_config()["PRINT_THRESHOLDS"]
+        self.assertEqual(print_thresholds["SLOW_MIN_SECOND"], 0)
+        self.assertEqual(
+            print_thresholds["DUPLICATE_MIN_COUNT"],
+            CONFIG_DEFAULTS["PRINT_THRESHOLDS"]["DUPLICATE_MIN_COUNT"],
+        )
+
+    def test_immutable(self):
+        config = get_config()
+        self.assertIs(get_config(), config)
+        with self.assertRaises(TypeError):
+            config["PRESENTER"] = "no.module"  # type: ignore
+        with self.assertRaises(TypeError):
+            config["PRINT_THRESHOLDS"]["COLOR"] = "red"  # type: ignore
+        self.assertIsInstance(config["IGNORE_SQL_PATTERNS"], tuple)
+
+    @override_settings(QUERY_CAPTURE={"RULES": [{"PRESENTER": "no.module"}]})
+    def test_rule_without_match(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_config()
+
+
+@override_settings(QUERY_CAPTURE={"RULES": RULES})
+class RouteConfigTests(TestCase):
+    def test_first_matching_rule(self):
+        config = get_route_config("reporters/<int:pk>/", "reporter-detail")
+        self.assertEqual(config["PRINT_THRESHOLDS"]["DUPLICATE_MIN_COUNT"], 2)
+        self.assertEqual(config["PRINT_THRESHOLDS"]["SIMILAR_MIN_COUNT"], 10)
+        self.assertEqual(
+            config["PRESENTER"], "django_query_capture.presenter.RawLinePresenter"
+        )
+        self.assertEqual(config["IGNORE_SQL_PATTERNS"], ())
+
+    def test_route_pattern(self):
+        config = get_route_config("reporters/", "reporter-list")
+        self.assertEqual(config["IGNORE_SQL_PATTERNS"], ("SELECT .*",))
+        self.assertEqual(config["PRESENTER"], get_config()["PRESENTER"])
+
+    def test_no_matching_rule(self):
+        self.assertIs(get_route_config("articles/", None), get_config())
+
+    def test_compiled_once_per_route(self):
+        self.assertIs(
+            get_route_config("reporters/", "reporter-list"),
+            get_route_config("reporters/", "reporter-list"),
+        )
+
+
+@override_settings(ROOT_URLCONF=__name__, QUERY_CAPTURE={"RULES": RULES})
+class RouteMiddlewareTests(ConsoleOutputTestCaseMixin, TestCase):
+    def test_route_thresholds_and_presenter(self):
+        middleware = QueryCaptureMiddleware(reporters_view)
+        middleware(RequestFactory().get("/reporters/1/"))
+        output = self.capture_output.getvalue()
+        self.assertIn("Repeated 3 times", output)
+        self.assertIn("read: 3", output)
+
+    def test_route_ignore_patterns(self):
+        middleware = QueryCaptureMiddleware(reporters_view)
+        middleware(RequestFactory().get("/reporters/"))
+        output = self.capture_output.getvalue()
+        self.assertNotIn("Repeated", output)
+        self.assertNotIn("SELECT", output)
+
+    def test_path_resolved_once(self):
+        middleware = QueryCaptureMiddleware(reporters_view)
+        with patch(
+            "django_query_capture.middleware.resolve", wraps=resolve
+        ) as mock_resolve:
+            middleware(RequestFactory().get("/reporters/2/"))
+            middleware(RequestFactory().get("/reporters/2/"))
+        self.assertEqual(mock_resolve.call_count, 1)
@@ -0,0 +1,69 @@
+import random
+
+from django.test import SimpleTestCase
+
+from django_query_capture.sketch import LatencySketch
+
+
+class LatencySketchTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.values = [random.lognormvariate(-6, 1.5) for _ in range(10000)]
+
+    def assert_quantiles(self, sketch, values):
+        sorted_values = sorted(values)
+        for q in (0.5, 0.95, 0.99):
+            expected = sorted_values[int(q * (len(sorted_values) - 1))]
+            self.assertAlmostEqual(
+                sketch.quantile(q),
+                expected,
+                delta=expected * sketch.relative_accuracy * 1.01,
+            )
+
+    def test_quantile(self):
+        sketch = LatencySketch()
+        for value in self.values:
+            sketch.add(value)
+        self.assertEqual(sketch.count, len(self.values))
+        self.assertAlmostEqual(sketch.sum, sum(self.values))
+        self.assert_quantiles(sketch, self.values)
+        self.assertEqual(set(sketch.percentiles()), {"p50", "p95", "p99"})
+
+    def test_merge(self):
+        left, right = LatencySketch(), LatencySketch()
+        for value in self.values[:3000]:
+            left.add(value)
+        for value in self.values[3000:]:
+            right.add(value)
+        left.merge(right)
+        self.assertEqual(left.count, len(self.values))
+        self.assert_quantiles(left, self.values)
+        with self.assertRaises(ValueError):
+            left.merge(LatencySketch(relative_accuracy=0.05))
+
+    def test_bounded_buckets(self):
+        sketch = LatencySketch(max_buckets=10)
+        for value in self.values:
+            sketch.add(value)
+        self.assertLessEqual(len(sketch.buckets), 10)
+        self.assertEqual(sketch.count, len(self.values))
+        self.assertAlmostEqual(
+            sketch.quantile(1), max(self.values), delta=max(self.values) * 0.02
+        )
+
+    def test_zero_and_empty(self):
+        sketch = LatencySketch()
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        sketch.add(0.0)
+        sketch.add(0.0)
+        sketch.add(1.0)
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertAlmostEqual(sketch.quantile(1), 1.0, delta=0.01)
+
+    def test_to_dict(self):
+        sketch = LatencySketch()
+        for value in self.values:
+            sketch.add(value)
+        restored = LatencySketch.from_dict(sketch.to_dict())
+        self.assertEqual(restored.count, sketch.count)
+        self.assertEqual(restored.quantile(0.95), sketch.quantile(0.95))
+        self.assertEqual(LatencySketch.from_dict(LatencySketch().to_dict()).count, 0)
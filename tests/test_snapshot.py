@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase, TestCase
+from news.models import Reporter
+
+from django_query_capture.capture import CapturedQuery
+from django_query_capture.snapshot import (
+    QuerySnapshotMismatch,
+    assert_query_snapshot,
+    build_snapshot,
+    diff_snapshots,
+)
+from django_query_capture.test_utils import AssertQuerySnapshot
+
+
+def make_captured_query(raw_sql: str, function_name: str = "view") -> CapturedQuery:
+    return CapturedQuery(
+        raw_sql=raw_sql,
+        raw_params=(),
+        many=False,
+        duration=0.0,
+        file_name="/project/news/views.py",
+        function_name=function_name,
+        line_no=1,
+        alias="default",
+    )
+
+
+class SnapshotTests(SimpleTestCase):
+    def test_build_snapshot(self):
+        snapshot = build_snapshot(
+            [
+                make_captured_query("SELECT * FROM reporter WHERE id = 1"),
+                make_captured_query("SELECT * FROM article", "helper"),
+                make_captured_query("SELECT * FROM reporter WHERE id = 2"),
+            ],
+            root="/project",
+        )
+        self.assertEqual(
+            snapshot,
+            {
+                "news/views.py:view": [
+                    "select * from reporter where id = ?",
+                    "select * from reporter where id = ?",
+                ],
+                "news/views.py:helper": ["select * from article"],
+            },
+        )
+
+    def test_diff_snapshots(self):
+        expected = {"a": ["x", "y", "z"], "b": ["x"], "c": ["x"]}
+        actual = {"a": ["y", "x", "w"], "b": ["x"], "d": ["x", "x"]}
+        self.assertEqual(
+            diff_snapshots(expected, actual),
+            {
+                "a": {"added": ["w"], "removed": ["z"], "reordered": True},
+                "c": {"added": [], "removed": ["x"], "reordered": False},
+                "d": {"added": ["x", "x"], "removed": [], "reordered": False},
+            },
+        )
+
+    def test_swapped_query_is_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshot.json")
+            assert_query_snapshot(
+                [make_captured_query("SELECT * FROM reporter WHERE id = 1")],
+                path,
+                root="/project",
+            )
+            with open(path) as file:
+                self.assertEqual(json.load(file)["version"], 1)
+
+            swapped = [make_captured_query("SELECT * FROM reporter, article")]
+            with self.assertRaises(QuerySnapshotMismatch) as context:
+                assert_query_snapshot(swapped, path, root="/project")
+            message = str(context.exception)
+            self.assertIn("news/views.py:view", message)
+            self.assertIn("+ select * from reporter, article", message)
+            self.assertIn("- select * from reporter where id = ?", message)
+
+            assert_query_snapshot(swapped, path, update=True, root="/project")
+            assert_query_snapshot(swapped, path, root="/project")
+
+
+class AssertQuerySnapshotTests(TestCase):
+    def test_assert_query_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshot.json")
+            with AssertQuerySnapshot(path):
+                Reporter.objects.create(full_name="reporter")
+            with AssertQuerySnapshot(path):
+                Reporter.objects.create(full_name="reporter")
+            with self.assertRaises(QuerySnapshotMismatch):
+                with AssertQuerySnapshot(path):
+                    list(Reporter.objects.all())
+
+            path = os.path.join(directory, "ignored.json")
+            with AssertQuerySnapshot(path, ignore_patterns=["news_reporter"]):
+                Reporter.objects.create(full_name="reporter")
+            with AssertQuerySnapshot(path, ignore_patterns=["news_reporter"]):
+                list(Reporter.objects.all())
@@ -0,0 +1,93 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from news.models import Reporter
+
+from django_query_capture import query_capture
+from django_query_capture.capture import PropagatingThreadPoolExecutor
+from django_query_capture.streaming import SpaceSavingCounter, TopK
+
+
+class SpaceSavingCounterTests(SimpleTestCase):
+    def test_exact_under_capacity(self):
+        counter = SpaceSavingCounter(3)
+        for key in "aabbbc":
+            counter.add(key)
+        self.assertEqual(counter.counts, {"a": 2, "b": 3, "c": 1})
+
+    def test_replace_smallest(self):
+        counter = SpaceSavingCounter(2, min_count=2)
+        for key in "aaaabc":
+            counter.add(key)
+        self.assertEqual(len(counter.counts), 2)
+        self.assertEqual(counter.counts["c"], 2)
+        self.assertEqual(counter.errors["c"], 1)
+        self.assertNotIn("b", counter.counts)
+        self.assertEqual(counter.counter, {"a": 4, "c": 1})
+        self.assertEqual(list(counter.over_threshold()), [("a", 4)])
+
+    def test_heavy_hitter_is_kept(self):
+        counter = SpaceSavingCounter(10)
+        for i in range(1000):
+            counter.add("heavy")
+            counter.add(f"light-{i}")
+        self.assertEqual(counter.counter.most_common(1), [("heavy", 1000)])
+
+
+class TopKTests(SimpleTestCase):
+    def test_keep_largest(self):
+        top_k = TopK(2)
+        for score, item in [(1, "a"), (3, "b"), (2, "c"), (0, "d")]:
+            top_k.add(score, item)
+        self.assertEqual(top_k.items(), ["b", "c"])
+
+
+@override_settings(
+    QUERY_CAPTURE={
+        "PRINT_THRESHOLDS": {
+            "SLOW_MIN_SECOND": 0,
+            "DUPLICATE_MIN_COUNT": 10,
+            "SIMILAR_MIN_COUNT": 10,
+            "COLOR": "yellow",
+        },
+        "STREAMING": {"ENABLED": True, "BUFFER_SIZE": 5, "TOP_K": 3},
+    }
+)
+class StreamingQueryCaptureTests(TestCase):
+    def test_bounded_capture(self):
+        capture = query_capture(ignore_output=True)
+        with capture as q:
+            [Reporter.objects.create(full_name=f"target-{i}") for i in range(20)]
+            [Reporter.objects.filter(full_name="target-1").exists() for i in range(12)]
+            self.assertEqual(len(q), 5)
+        classified_query = capture.classifier
+        self.assertEqual(classified_query["total"], 32)
+        self.assertEqual(len(classified_query["captured_queries"]), 5)
+        self.assertEqual(len(classified_query["slow_captured_queries"]), 3)
+        self.assertLessEqual(len(classified_query["duplicates_counter"]), 3)
+        self.assertEqual(classified_query["most_common_duplicate"][1], 12)
+        self.assertEqual(
+            list(classified_query["duplicates_counter_over_threshold"].values()), [12]
+        )
+        self.assertTrue(classified_query["has_over_threshold"])
+
+    def test_bounded_propagated_threads(self):
+        def select(i):
+            with connection.cursor() as cursor:
+                for _ in range(10):
+                    cursor.execute("SELECT %s", [i])
+
+        capture = query_capture(ignore_output=True, propagate_threads=True)
+        with capture as q:
+            with PropagatingThreadPoolExecutor(max_workers=3) as executor:
+                list(executor.map(select, range(3)))
+            self.assertEqual(q.classifier()["total"], 30)
+            self.assertEqual(len(q), 5)
+            self.assertEqual(q._thread_buffers, {})
+        self.assertEqual(capture.classifier["total"], 30)
+        self.assertEqual(len(capture.classifier["captured_queries"]), 5)
+
+    def test_streaming_argument(self):
+        capture = query_capture(ignore_output=True, streaming=False)
+        with capture as q:
+            [Reporter.objects.create(full_name=f"target-{i}") for i in range(20)]
+        self.assertEqual(len(q), 20)